@@ -0,0 +1,309 @@
+import itertools
+import os
+import threading
+import time
+from metrics import ADMISSION_WAIT_SECONDS
+
+try:
+    import tomllib
+except ImportError:
+    tomllib = None
+
+# Admission limits used unless overridden in .streamlit/config.toml or the environment (0 disables a limit)
+DEFAULT_SESSION_REQUESTS_PER_MINUTE = 10
+DEFAULT_SESSION_TOKENS_PER_MINUTE = 60000
+DEFAULT_GLOBAL_REQUESTS_PER_MINUTE = 0
+DEFAULT_GLOBAL_TOKENS_PER_MINUTE = 0
+DEFAULT_MAX_WAIT = 120
+# Seconds between position/ETA updates for a queued request
+STATUS_INTERVAL = 1.0
+
+CONFIG_PATH = os.path.join(".streamlit", "config.toml")
+
+# Settings as keys of the [admission] table in CONFIG_PATH, with the environment variable that overrides each
+SETTINGS = {
+    "enabled": "ADMISSION_CONTROL",
+    "session_requests_per_minute": "SESSION_REQUESTS_PER_MINUTE",
+    "session_tokens_per_minute": "SESSION_TOKENS_PER_MINUTE",
+    "global_requests_per_minute": "GLOBAL_REQUESTS_PER_MINUTE",
+    "global_tokens_per_minute": "GLOBAL_TOKENS_PER_MINUTE",
+    "max_wait": "ADMISSION_MAX_WAIT",
+}
+
+
+class AdmissionTimeout(Exception):
+    """Raised when a queued request waits longer than max_wait"""
+
+    def __init__(self, waited):
+        super().__init__(f"The AI service is very busy right now. Please try again in a minute (waited {round(waited)}s).")
+        self.waited = waited
+
+
+class TokenBucket:
+    """Allows bursts of up to capacity, refilling at rate per second"""
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def cost(self, amount, requests=1):
+        # A request bigger than the whole bucket would never fit, so it takes a full bucket instead
+        return min(amount, self.capacity * requests)
+
+    def wait_time(self, amount, requests=1):
+        """Seconds until amount, spread over requests requests, is available as of the last refill"""
+        missing = self.cost(amount, requests) - self.tokens
+        return max(0.0, missing / self.rate) if self.rate else 0.0
+
+    def take(self, amount):
+        self.tokens -= self.cost(amount)
+
+    def give_back(self, amount):
+        self.tokens = min(self.capacity, self.tokens + self.cost(amount))
+
+
+class Limits:
+    """A requests-per-minute and a tokens-per-minute bucket, either of which may be unlimited"""
+
+    def __init__(self, requests_per_minute, tokens_per_minute, clock=time.monotonic):
+        self.buckets = []
+        if requests_per_minute:
+            self.buckets.append((TokenBucket(requests_per_minute / 60, requests_per_minute, clock), False))
+        if tokens_per_minute:
+            self.buckets.append((TokenBucket(tokens_per_minute / 60, tokens_per_minute, clock), True))
+
+    def wait_time(self, tokens, now, requests=1):
+        """Seconds until a request of tokens (or requests requests totalling tokens) fits every bucket"""
+        wait = 0.0
+        for bucket, counts_tokens in self.buckets:
+            bucket.refill(now)
+            wait = max(wait, bucket.wait_time(tokens if counts_tokens else requests, requests))
+        return wait
+
+    def take(self, tokens):
+        for bucket, counts_tokens in self.buckets:
+            bucket.take(tokens if counts_tokens else 1)
+
+    def give_back(self, tokens):
+        for bucket, counts_tokens in self.buckets:
+            bucket.give_back(tokens if counts_tokens else 1)
+
+    def full(self, now):
+        """Check whether every bucket has refilled, so the limits can be forgotten"""
+        for bucket, _ in self.buckets:
+            bucket.refill(now)
+        return all(bucket.tokens >= bucket.capacity for bucket, _ in self.buckets)
+
+
+class Ticket:
+    """A request waiting for admission, ordered by its weighted-fair finish tag"""
+
+    __slots__ = ("session_id", "tokens", "start", "finish", "order")
+
+    def __init__(self, session_id, tokens, start, finish, order):
+        self.session_id = session_id
+        self.tokens = tokens
+        self.start = start
+        self.finish = finish
+        self.order = order
+
+    def key(self):
+        return self.finish, self.order
+
+
+class Grant:
+    """An admitted request, which can be given back if it never reaches the model"""
+
+    __slots__ = ("session_id", "tokens")
+
+    def __init__(self, session_id, tokens):
+        self.session_id = session_id
+        self.tokens = tokens
+
+
+class AdmissionController:
+    """Per-session and global token buckets in front of the model, with a weighted-fair queue
+
+    A request that fits its session's and the global buckets goes straight
+    through. Otherwise it waits in a queue ordered by weighted-fair finish tags:
+    each session's requests are tagged with the estimated tokens it has
+    asked for so far divided by its weight, so a session sending many or
+    large requests falls behind lighter ones instead of starving them. A
+    session that is over its own limit never holds up other sessions.
+
+    Session IDs come from the client (the API accepts any well-formed one), so
+    a client can get fresh session limits by changing its ID; only the global
+    limits bound the total load on the model, and they are off by default.
+    """
+
+    def __init__(self, session_requests_per_minute=DEFAULT_SESSION_REQUESTS_PER_MINUTE,
+                 session_tokens_per_minute=DEFAULT_SESSION_TOKENS_PER_MINUTE,
+                 global_requests_per_minute=DEFAULT_GLOBAL_REQUESTS_PER_MINUTE,
+                 global_tokens_per_minute=DEFAULT_GLOBAL_TOKENS_PER_MINUTE,
+                 max_wait=DEFAULT_MAX_WAIT, clock=time.monotonic):
+        self.session_limits = (session_requests_per_minute, session_tokens_per_minute)
+        self.global_limits = Limits(global_requests_per_minute, global_tokens_per_minute, clock)
+        self.max_wait = max_wait
+        self.clock = clock
+        self.admitted = 0
+        self.queued = 0
+        self.timed_out = 0
+        self._sessions = {}
+        # Requests without a session (benchmarks, scripts) only count against the global limits
+        self._unlimited = Limits(0, 0)
+        self._finish_tags = {}
+        self._virtual_time = 0.0
+        self._waiting = []
+        self._order = itertools.count()
+        self._condition = threading.Condition()
+
+    def session(self, session_id):
+        if session_id is None:
+            return self._unlimited
+        limits = self._sessions.get(session_id)
+        if limits is None:
+            limits = self._sessions[session_id] = Limits(*self.session_limits, self.clock)
+        return limits
+
+    def acquire(self, session_id, tokens, weight=1.0, on_wait=None):
+        """Wait until a request of about tokens tokens may go to the model and return its Grant
+
+        While queued, on_wait(position, eta_seconds) is called about every
+        STATUS_INTERVAL seconds, and on_wait(None, 0) once the request is admitted.
+        Raises AdmissionTimeout after max_wait seconds in the queue.
+        """
+        started = self.clock()
+        with self._condition:
+            start = max(self._virtual_time, self._finish_tags.get(session_id, 0.0))
+            ticket = Ticket(session_id, tokens, start, start + tokens / weight, next(self._order))
+            self._finish_tags[session_id] = ticket.finish
+            self._waiting.append(ticket)
+            self._waiting.sort(key=Ticket.key)
+            admitted = self._try_admit(ticket, started)
+            if not admitted:
+                self.queued += 1
+        if admitted:
+            return Grant(session_id, tokens)
+
+        while True:
+            with self._condition:
+                now = self.clock()
+                if self._try_admit(ticket, now):
+                    break
+                if now - started >= self.max_wait:
+                    self._remove(ticket)
+                    self.timed_out += 1
+                    ADMISSION_WAIT_SECONDS.observe(now - started, outcome="timeout")
+                    raise AdmissionTimeout(now - started)
+                position, eta = self._status(ticket, now)
+                self._condition.wait(min(STATUS_INTERVAL, max(eta, 0.05), self.max_wait - (now - started)))
+            # Report outside the lock; the callback may render UI
+            if on_wait is not None:
+                on_wait(position, eta)
+        ADMISSION_WAIT_SECONDS.observe(self.clock() - started, outcome="admitted")
+        if on_wait is not None:
+            on_wait(None, 0)
+        return Grant(session_id, tokens)
+
+    def release(self, grant):
+        """Give back a grant whose request never reached the model, e.g. one answered by a shared call"""
+        with self._condition:
+            if grant.session_id in self._sessions:
+                self._sessions[grant.session_id].give_back(grant.tokens)
+            self.global_limits.give_back(grant.tokens)
+            self._condition.notify_all()
+
+    def waiting(self):
+        """Number of requests in the queue"""
+        with self._condition:
+            return len(self._waiting)
+
+    def _next_ticket(self, now):
+        """The first queued request whose session has room, in fair order"""
+        for ticket in self._waiting:
+            if self.session(ticket.session_id).wait_time(ticket.tokens, now) == 0:
+                return ticket
+        return None
+
+    def _try_admit(self, ticket, now):
+        candidate = self._next_ticket(now)
+        if candidate is None or self.global_limits.wait_time(candidate.tokens, now) > 0:
+            return False
+        if candidate is not ticket:
+            # Someone else is next; make sure they notice
+            self._condition.notify_all()
+            return False
+        self.session(ticket.session_id).take(ticket.tokens)
+        self.global_limits.take(ticket.tokens)
+        self._virtual_time = max(self._virtual_time, ticket.start)
+        self._remove(ticket)
+        self.admitted += 1
+        return True
+
+    def _remove(self, ticket):
+        self._waiting.remove(ticket)
+        if not self._waiting:
+            # Nothing is contended, so fairness can start afresh; forget idle sessions
+            self._finish_tags.clear()
+            self._virtual_time = 0.0
+            now = self.clock()
+            for session_id in [key for key, limits in self._sessions.items() if limits.full(now)]:
+                del self._sessions[session_id]
+        self._condition.notify_all()
+
+    def _status(self, ticket, now):
+        """Queue position and estimated seconds until admission"""
+        ahead = self._waiting[:self._waiting.index(ticket) + 1]
+        tokens = sum(waiting.tokens for waiting in ahead)
+        eta = max(
+            self.session(ticket.session_id).wait_time(ticket.tokens, now),
+            self.global_limits.wait_time(tokens, now, requests=len(ahead)),
+        )
+        return len(ahead), eta
+
+
+def load_settings(path=CONFIG_PATH):
+    """Admission settings from the [admission] table of the Streamlit config, overridden by the environment"""
+    settings = {}
+    if tomllib is not None:
+        try:
+            with open(path, "rb") as f:
+                settings = tomllib.load(f).get("admission", {})
+        except (FileNotFoundError, tomllib.TOMLDecodeError):
+            pass
+    for key, env_var in SETTINGS.items():
+        if os.getenv(env_var) is not None:
+            settings[key] = os.getenv(env_var)
+    return settings
+
+
+# Process-wide admission controller, configured on first use
+_admission_controller = None
+_admission_configured = False
+_admission_lock = threading.Lock()
+
+
+def get_admission_controller():
+    """Get the shared admission controller, or None when admission control is disabled"""
+    global _admission_controller, _admission_configured
+    with _admission_lock:
+        if not _admission_configured:
+            _admission_configured = True
+            settings = load_settings()
+            if str(settings.get("enabled", True)).lower() in ("0", "false", "no"):
+                return None
+            _admission_controller = AdmissionController(
+                session_requests_per_minute=float(settings.get("session_requests_per_minute", DEFAULT_SESSION_REQUESTS_PER_MINUTE)),
+                session_tokens_per_minute=float(settings.get("session_tokens_per_minute", DEFAULT_SESSION_TOKENS_PER_MINUTE)),
+                global_requests_per_minute=float(settings.get("global_requests_per_minute", DEFAULT_GLOBAL_REQUESTS_PER_MINUTE)),
+                global_tokens_per_minute=float(settings.get("global_tokens_per_minute", DEFAULT_GLOBAL_TOKENS_PER_MINUTE)),
+                max_wait=float(settings.get("max_wait", DEFAULT_MAX_WAIT)),
+            )
+        return _admission_controller
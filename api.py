@@ -0,0 +1,344 @@
+"""Headless HTTP API for the Clash Royale chat engine
+
+A plain ASGI application, served with uvicorn:
+    python api.py
+    uvicorn api:app --host 0.0.0.0 --port 8000
+
+Endpoints:
+    POST   /v1/chat                         {"message", "session_id"?, "personality"?, "stream"?}
+    GET    /v1/sessions/{session_id}/messages
+    DELETE /v1/sessions/{session_id}
+    GET    /v1/personas
+    GET    /healthz
+    GET    /readyz                          503 until the background warm-up has finished
+    GET    /metrics
+
+Chat replies stream as Server-Sent Events by default: one "start" event with
+the session ID and intent, "queued" events with the queue position and ETA
+while over a rate limit, a "chunk" event per piece of text and a final
+"done" (or "error") event. Set "stream" to false for a single JSON response
+instead. Failed turns are not answers: JSON replies get 429 while the rate
+limit queue is full, 503 while the circuit breaker is open and 502 for other
+model errors; streams end with an "error" event carrying the same status.
+
+Per-session rate limits key on the client's session_id, which a client can
+change at will; set GLOBAL_REQUESTS_PER_MINUTE or GLOBAL_TOKENS_PER_MINUTE to
+bound the total load when serving untrusted clients.
+"""
+import asyncio
+import json
+import os
+import re
+import threading
+import uuid
+from dotenv import load_dotenv
+from personas import DEFAULT_PERSONA, PERSONAS
+from intent_router import route_prompt
+from metrics import REGISTRY, start_exporters
+from model_pool import get_model_pool
+from chat_engine import get_chat_engine
+from warmup import get_warmup
+from popular_topics import get_topic_answers
+from generation_policy import get_generation_policy
+from history import valid_session_id
+from admission import AdmissionTimeout
+from resilience import CircuitOpenError
+
+# Load environment variables
+load_dotenv()
+
+# Server settings used unless overridden in the environment
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+DEFAULT_KEEP_ALIVE = 75
+DEFAULT_PING_INTERVAL = 15
+
+# Request limits
+MAX_BODY_BYTES = 64 * 1024
+MAX_MESSAGE_CHARS = 4000
+
+SESSION_PATH_PATTERN = re.compile(r"/v1/sessions/([^/]+)(/messages)?")
+
+SSE_HEADERS = [
+    (b"content-type", b"text/event-stream; charset=utf-8"),
+    (b"cache-control", b"no-cache"),
+    # Stop nginx-style proxies from buffering the stream
+    (b"x-accel-buffering", b"no"),
+]
+
+
+class ApiError(Exception):
+    """An error returned to the client as {"error": message} with an HTTP status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def error_status(error):
+    """HTTP status for a chat turn that failed with error"""
+    if isinstance(error, AdmissionTimeout):
+        return 429
+    if isinstance(error, CircuitOpenError):
+        return 503
+    return 502
+
+
+def sse_event(event, data):
+    """One Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode()
+
+
+async def send_response(send, status, body, content_type=b"application/json"):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_json(send, status, payload):
+    await send_response(send, status, json.dumps(payload, ensure_ascii=False).encode())
+
+
+async def read_json(receive):
+    """The request body parsed as a JSON object"""
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise ApiError(400, "Client disconnected")
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if len(body) > MAX_BODY_BYTES:
+            raise ApiError(413, "Request body too large")
+    try:
+        payload = json.loads(body or b"{}")
+    except ValueError:
+        raise ApiError(400, "Request body must be JSON")
+    if not isinstance(payload, dict):
+        raise ApiError(400, "Request body must be a JSON object")
+    return payload
+
+
+def check_session_id(session_id):
+    if not valid_session_id(session_id):
+        raise ApiError(400, "session_id must be 1-64 letters, digits, '-' or '_'")
+    return session_id
+
+
+async def iterate_in_thread(produce, ping_interval):
+    """Run a blocking chunk generator on its own thread and yield its chunks
+
+    produce(notify) is called on the thread and returns the generator;
+    notify(event, data) passes an extra event along, yielded as an (event, data)
+    tuple. Yields None whenever ping_interval passes without anything else.
+    Closing this generator stops the worker after its current chunk.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stopped = threading.Event()
+
+    def put(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            # The event loop is gone, nobody is listening any more
+            stopped.set()
+
+    def run():
+        chunks = produce(lambda event, data: put(("event", (event, data))))
+        try:
+            for chunk in chunks:
+                put(("chunk", chunk))
+                if stopped.is_set():
+                    break
+        except Exception as e:
+            put(("error", e))
+        else:
+            put(("done", None))
+        finally:
+            chunks.close()
+
+    threading.Thread(target=run, name="api-turn", daemon=True).start()
+    try:
+        while True:
+            try:
+                kind, value = await asyncio.wait_for(queue.get(), ping_interval)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if kind == "done":
+                return
+            if kind == "error":
+                raise value
+            yield value
+    finally:
+        stopped.set()
+
+
+class ChatApi:
+    """ASGI application exposing the chat engine over HTTP"""
+
+    def __init__(self, ping_interval=DEFAULT_PING_INTERVAL):
+        self.ping_interval = ping_interval
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        try:
+            await self.route(scope, receive, send)
+        except ApiError as e:
+            await send_json(send, e.status, {"error": e.message})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    # Fail at startup rather than on the first request if the key is missing
+                    await asyncio.to_thread(get_chat_engine)
+                    start_exporters()
+                    # Serve health checks right away; /readyz reports when the models are built
+                    get_warmup()
+                    topic_answers = get_topic_answers()
+                    if topic_answers is not None:
+                        topic_answers.start()
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def route(self, scope, receive, send):
+        method, path = scope["method"], scope["path"]
+        if path == "/v1/chat":
+            if method != "POST":
+                raise ApiError(405, "Use POST")
+            await self.chat(receive, send)
+        elif path == "/healthz":
+            pool = get_model_pool()
+            topic_answers = get_topic_answers()
+            await send_json(send, 200, {
+                "status": "ok",
+                "model_pool": pool.report() if pool is not None else None,
+                "popular_topics": topic_answers.report() if topic_answers is not None else None,
+                "generation_policy": get_generation_policy().report(),
+            })
+        elif path == "/readyz":
+            warmup = get_warmup()
+            report = warmup.report() if warmup is not None else {"ready": True}
+            await send_json(send, 200 if report["ready"] else 503, report)
+        elif path == "/metrics":
+            await send_response(send, 200, REGISTRY.render().encode(), b"text/plain; version=0.0.4; charset=utf-8")
+        elif path == "/v1/personas":
+            await send_json(send, 200, {
+                "default": DEFAULT_PERSONA,
+                "personas": [{"name": persona.name, "icon": persona.icon} for persona in PERSONAS.values()],
+            })
+        elif match := SESSION_PATH_PATTERN.fullmatch(path):
+            await self.session(method, check_session_id(match.group(1)), bool(match.group(2)), send)
+        else:
+            raise ApiError(404, "Not found")
+
+    async def session(self, method, session_id, messages, send):
+        engine = get_chat_engine()
+        if messages and method == "GET":
+            conversation = await asyncio.to_thread(engine.get_conversation, session_id)
+            history = await asyncio.to_thread(engine.load_messages, conversation)
+            await send_json(send, 200, {"session_id": session_id, "messages": history})
+        elif not messages and method == "DELETE":
+            conversation = await asyncio.to_thread(engine.get_conversation, session_id)
+            await asyncio.to_thread(engine.clear, conversation)
+            await send({"type": "http.response.start", "status": 204, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+        else:
+            raise ApiError(405, "Method not allowed")
+
+    async def chat(self, receive, send):
+        payload = await read_json(receive)
+        message = payload.get("message")
+        if not isinstance(message, str) or not message.strip():
+            raise ApiError(400, "message is required")
+        if len(message) > MAX_MESSAGE_CHARS:
+            raise ApiError(413, f"message is longer than {MAX_MESSAGE_CHARS} characters")
+        personality = payload.get("personality", DEFAULT_PERSONA)
+        if personality not in PERSONAS:
+            raise ApiError(400, f"Unknown personality, choose one of: {', '.join(PERSONAS)}")
+        session_id = check_session_id(payload.get("session_id") or uuid.uuid4().hex)
+
+        engine = get_chat_engine()
+        route = route_prompt(message)
+        conversation = await asyncio.to_thread(engine.get_conversation, session_id)
+        if not payload.get("stream", True):
+            try:
+                reply = await asyncio.to_thread(engine.reply, conversation, message, personality, route, raise_errors=True)
+            except Exception as e:
+                raise ApiError(error_status(e), str(e)) from e
+            await send_json(send, 200, {"session_id": session_id, "intent": route.intent, "reply": reply})
+            return
+
+        # The request body is read, so the next message can only be the client going away
+        disconnected = asyncio.Event()
+
+        async def watch_disconnect():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
+
+        watcher = asyncio.create_task(watch_disconnect())
+
+        def produce(notify):
+            def on_queued(position, eta):
+                if position is not None:
+                    notify("queued", {"position": position, "eta": round(eta, 1)})
+
+            return engine.stream_turn(conversation, message, personality, route, on_queued, raise_errors=True)
+
+        chunks = iterate_in_thread(produce, self.ping_interval)
+        try:
+            await send({"type": "http.response.start", "status": 200, "headers": SSE_HEADERS})
+            await send({"type": "http.response.body", "body": sse_event("start", {"session_id": session_id, "intent": route.intent}), "more_body": True})
+            try:
+                async for text in chunks:
+                    if disconnected.is_set():
+                        return
+                    if text is None:
+                        # A comment line keeps idle connections open through proxies while the model thinks
+                        body = b": ping\n\n"
+                    elif isinstance(text, tuple):
+                        body = sse_event(*text)
+                    else:
+                        body = sse_event("chunk", {"text": text})
+                    await send({"type": "http.response.body", "body": body, "more_body": True})
+            except Exception as e:
+                # Headers are already sent, so report the failure in the stream
+                await send({"type": "http.response.body", "body": sse_event("error", {"error": str(e), "status": error_status(e)})})
+                return
+            await send({"type": "http.response.body", "body": sse_event("done", {"session_id": session_id})})
+        finally:
+            await chunks.aclose()
+            watcher.cancel()
+
+
+app = ChatApi(ping_interval=float(os.getenv("API_PING_INTERVAL", DEFAULT_PING_INTERVAL)))
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(
+        app,
+        host=os.getenv("API_HOST", DEFAULT_HOST),
+        port=int(os.getenv("API_PORT", DEFAULT_PORT)),
+        # Let clients reuse one connection across turns
+        timeout_keep_alive=int(os.getenv("API_KEEP_ALIVE", DEFAULT_KEEP_ALIVE)),
+    )
@@ -0,0 +1,89 @@
+import asyncio
+import concurrent.futures
+import os
+import queue
+import threading
+
+# Maximum number of model requests in flight per server process
+DEFAULT_MAX_CONCURRENT_REQUESTS = 8
+
+# Background event loop shared by every Streamlit script thread
+_loop = None
+_semaphore = None
+_loop_lock = threading.Lock()
+_DONE = object()
+_CANCELLED = object()
+
+
+class StreamCancelled(Exception):
+    """Raised by iterate_sync when its cancellation is set while the caller waits for an item"""
+
+
+def async_backend_enabled():
+    """Check whether model calls should go through the async backend"""
+    return os.getenv("ASYNC_BACKEND", "true").lower() not in ("0", "false", "no")
+
+
+def get_event_loop():
+    """Start the background event loop on first use and return it"""
+    global _loop, _semaphore
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="model-event-loop", daemon=True).start()
+            limit = int(os.getenv("MAX_CONCURRENT_REQUESTS", DEFAULT_MAX_CONCURRENT_REQUESTS))
+            _semaphore = asyncio.Semaphore(limit)
+            _loop = loop
+        return _loop
+
+
+def request_slot():
+    """Semaphore capping concurrent in-flight model requests; use with `async with`"""
+    get_event_loop()
+    return _semaphore
+
+
+def run_sync(coro, timeout=None):
+    """Run a coroutine on the background loop and wait for its result"""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result(timeout)
+
+
+def iterate_sync(agen, cancellation=None):
+    """Iterate an async generator on the background loop from synchronous code
+
+    Items are handed over through a queue as soon as they are produced, so
+    streamed chunks reach the caller without waiting for the whole response.
+    Exceptions raised by the generator are re-raised in the caller. When
+    cancellation (see single_flight.Cancellation) is set from another thread,
+    the generator is cancelled and the caller gets StreamCancelled right away.
+    """
+    items = queue.Queue()
+
+    async def pump():
+        try:
+            async for item in agen:
+                items.put((item, None))
+            items.put((_DONE, None))
+        except Exception as e:
+            items.put((None, e))
+        finally:
+            await agen.aclose()
+
+    future = asyncio.run_coroutine_threadsafe(pump(), get_event_loop())
+    if cancellation is not None:
+        cancellation.add_callback(lambda: (future.cancel(), items.put((_CANCELLED, None))))
+    try:
+        while True:
+            item, error = items.get()
+            if error is not None:
+                raise error
+            if item is _DONE:
+                return
+            if item is _CANCELLED:
+                # Let the generator unwind on the loop before the caller cleans up after it
+                concurrent.futures.wait([future], timeout=5)
+                raise StreamCancelled("Nobody is reading the stream any more")
+            yield item
+    finally:
+        # Stop the upstream request if the caller stops reading early
+        future.cancel()
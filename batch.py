@@ -0,0 +1,187 @@
+"""Answer a file of questions in bulk through the chat engine
+
+Reads JSONL questions, one object per line:
+    {"id": "hog-rider", "question": "How do I counter Hog Rider?", "personality": "Friendly"}
+"id" defaults to the line number and "personality" to every persona (or --personas).
+Each answer is appended to the output JSONL as soon as it is ready, and the
+output doubles as the checkpoint: rerunning the same command skips questions
+already answered and retries the ones that failed.
+
+    python batch.py questions.jsonl -o answers.jsonl --workers 8 --rate 2
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from personas import PERSONAS
+from conversation_store import Conversation
+from intent_router import route_prompt
+from chat_engine import get_chat_engine
+
+# Batch settings used unless overridden on the command line
+DEFAULT_WORKERS = 4
+DEFAULT_RATE = 0
+
+
+class Job:
+    """One question to answer in one persona"""
+
+    __slots__ = ("id", "personality", "question")
+
+    def __init__(self, id, personality, question):
+        self.id = id
+        self.personality = personality
+        self.question = question
+
+    @property
+    def key(self):
+        return f"{self.id}:{self.personality}"
+
+
+class RateLimiter:
+    """Spaces out calls to at most rate per second across threads (0 means unlimited)"""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        time.sleep(start - now)
+
+
+def read_jobs(path, personalities):
+    """Jobs for every question in a JSONL file, one per requested persona"""
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                raise SystemExit(f"{path}:{line_number}: not valid JSON")
+            question = item.get("question", "").strip()
+            if not question:
+                raise SystemExit(f"{path}:{line_number}: missing \"question\"")
+            personality = item.get("personality")
+            if personality is not None and personality not in PERSONAS:
+                raise SystemExit(f"{path}:{line_number}: unknown personality {personality!r}")
+            for name in [personality] if personality else personalities:
+                yield Job(str(item.get("id", line_number)), name, question)
+
+
+def read_checkpoint(path):
+    """Keys of the jobs already answered successfully in an earlier run's output"""
+    done = set()
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash; the job simply runs again
+                    continue
+                if result.get("status") == "ok":
+                    done.add(result["key"])
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def answer(engine, job):
+    """Answer a job in a fresh conversation, so every answer stands alone"""
+    started = time.perf_counter()
+    route = route_prompt(job.question)
+    try:
+        text = engine.reply(Conversation(job.key), job.question, job.personality, route)
+    except Exception as e:
+        text = f"Error: {str(e)}"
+    return {
+        "key": job.key,
+        "id": job.id,
+        "personality": job.personality,
+        "question": job.question,
+        "intent": route.intent,
+        "answer": text,
+        # Failures are reported as an "Error: ..." answer, like in the chat
+        "status": "error" if text.startswith("Error:") else "ok",
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def run_batch(jobs, output, workers=DEFAULT_WORKERS, rate=DEFAULT_RATE, progress=None):
+    """Answer jobs with a bounded worker pool, appending each result to output as it finishes
+
+    At most workers jobs run at once and new ones start at no more than rate
+    per second. Returns (answered, failed) counts.
+    """
+    engine = get_chat_engine()
+    limiter = RateLimiter(rate)
+    # Queue only a few jobs ahead of the workers, so Ctrl-C doesn't wait for the whole backlog
+    slots = threading.BoundedSemaphore(workers * 2)
+    write_lock = threading.Lock()
+    counts = {"ok": 0, "error": 0}
+
+    def run(job):
+        try:
+            limiter.wait()
+            result = answer(engine, job)
+            with write_lock:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+                f.flush()
+                counts[result["status"]] += 1
+                if progress is not None:
+                    progress(counts["ok"], counts["error"], result)
+        finally:
+            slots.release()
+
+    with open(output, "a", encoding="utf-8") as f, ThreadPoolExecutor(max_workers=workers) as pool:
+        for job in jobs:
+            slots.acquire()
+            pool.submit(run, job)
+    return counts["ok"], counts["error"]
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL file of questions")
+    parser.add_argument("-o", "--output", help="JSONL file of answers and checkpoint (default: <input>.answers.jsonl)")
+    parser.add_argument("--personas", help=f"comma-separated personas for questions without one (default: {','.join(PERSONAS)})")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="questions answered at once")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="max questions started per second (0 for no limit)")
+    args = parser.parse_args()
+
+    output = args.output or f"{os.path.splitext(args.input)[0]}.answers.jsonl"
+    personalities = args.personas.split(",") if args.personas else list(PERSONAS)
+    unknown = [name for name in personalities if name not in PERSONAS]
+    if unknown:
+        parser.error(f"unknown personas: {', '.join(unknown)}")
+
+    done = read_checkpoint(output)
+    jobs = [job for job in read_jobs(args.input, personalities) if job.key not in done]
+    print(f"{len(done)} already answered, {len(jobs)} to go -> {output}", file=sys.stderr)
+
+    def progress(answered, failed, result):
+        print(f"[{answered + failed}/{len(jobs)}] {result['status']:5} {result['key']} ({result['seconds']:.1f}s)", file=sys.stderr)
+
+    try:
+        answered, failed = run_batch(jobs, output, args.workers, args.rate, progress)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    print(f"answered {answered}, failed {failed}" + (" (rerun to retry)" if failed else ""), file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
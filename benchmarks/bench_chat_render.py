@@ -0,0 +1,59 @@
+"""Measure Streamlit rerun time for long transcripts, full vs windowed rendering
+
+Run from the repository root (no API calls are made):
+    python benchmarks/bench_chat_render.py
+"""
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Set before any app code is imported, so a .env file can't switch on the live API or background work
+os.environ["MODEL_BACKEND"] = "fake"
+os.environ["WARMUP"] = "false"
+os.environ["POPULAR_TOPICS"] = "false"
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-placeholder")
+# Keep the transcript in session state so the benchmark can seed it directly
+os.environ["CONVERSATION_STORE"] = "none"
+
+from streamlit.testing.v1 import AppTest
+
+from conversation_store import Conversation
+
+APP_PATH = os.path.join(ROOT, "app.py")
+SIZES = (10, 100, 1000)
+RERUNS = 5
+
+
+def make_messages(count):
+    """Alternating user/assistant messages with answer-sized markdown"""
+    answer = "**Hog Rider 2.6** cycles Ice Spirit, Skeletons and The Log.\n\n" + "- Keep elixir even on defense\n" * 20
+    return [
+        {"role": "user", "content": f"Question {i}?"} if i % 2 == 0 else {"role": "assistant", "content": answer}
+        for i in range(count)
+    ]
+
+
+def time_reruns(count, window):
+    """Median seconds per rerun of the app with count messages in the session"""
+    os.environ["CHAT_RENDER_WINDOW"] = str(window)
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    at.session_state["session_id"] = f"bench-{count}"
+    at.session_state["conversation"] = Conversation(f"bench-{count}", make_messages(count))
+    at.run()
+    timings = []
+    for _ in range(RERUNS):
+        start = time.perf_counter()
+        at.run()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+if __name__ == "__main__":
+    print(f"{'messages':>8} {'full (ms)':>10} {'window 20 (ms)':>15}")
+    for count in SIZES:
+        full = time_reruns(count, 0)
+        windowed = time_reruns(count, 20)
+        print(f"{count:>8} {full * 1000:>10.1f} {windowed * 1000:>15.1f}")
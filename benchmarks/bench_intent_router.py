@@ -0,0 +1,36 @@
+"""Replay a sample of chat prompts through the intent router and report how much traffic stays local
+
+Run from the repository root:
+    python benchmarks/bench_intent_router.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_router import format_report, get_intent_stats, route_prompt
+
+# A mix of prompts in roughly the proportions seen in chat sessions
+SAMPLE_PROMPTS = [
+    "hi", "hello!", "hey there", "thanks", "thank you so much", "ok", "help", "clear",
+    "How much elixir does Sparky cost?", "what rarity is the log", "elixir cost of mega knight",
+    "Hog Rider, Musketeer, Cannon, Ice Golem, Ice Spirit, Fireball, The Log, Skeletons",
+    "golem night witch baby dragon tornado lightning lumberjack mega minion skeletons avg elixir?",
+    "how do I counter mega knight", "what beats lava hound?", "how do I deal with goblin barrel",
+    "best deck for arena 5", "what should I replace wizard with in my deck", "give me a hog cycle deck",
+    "how do I push trophies", "tips for elixir management", "how do I defend against a double push",
+    "is sparky good?", "when should I use the log", "who made this game", "what are the game modes",
+]
+ROUNDS = 100
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for prompt in SAMPLE_PROMPTS:
+            route_prompt(prompt)
+    elapsed = time.perf_counter() - start
+    calls = ROUNDS * len(SAMPLE_PROMPTS)
+    print(f"{calls} prompts routed, {elapsed / calls * 1e6:.0f} µs per prompt\n")
+    print(format_report(get_intent_stats().report()))
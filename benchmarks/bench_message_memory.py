@@ -0,0 +1,136 @@
+"""Memory report for in-memory chat sessions: plain message dicts vs compact Message records
+
+Builds the same sessions both ways through Conversation (1,000 sessions of 50
+turns by default, answers sampled from the knowledge base so they compress
+like real ones) and reports the memory tracemalloc sees them hold, plus the
+time to add every message, read each session's visible window and read every
+message back as starting a chat session does. Run from the repository root
+(no API calls are made):
+    python benchmarks/bench_message_memory.py
+    python benchmarks/bench_message_memory.py --sessions 200 --turns 100 --answer-chars 6000 --json memory.json
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from conversation_store import Conversation
+from personas import CLASH_ROYALE_CONTEXT
+
+# Distinct answers to draw from; each message still gets its own string
+ANSWER_POOL = 500
+
+
+def make_answers(count, chars, seed=0):
+    """Answer-sized markdown made of random knowledge base lines"""
+    rng = random.Random(seed)
+    lines = [line for line in CLASH_ROYALE_CONTEXT.splitlines() if line.strip()]
+    answers = []
+    for _ in range(count):
+        parts, size = [], 0
+        while size < chars:
+            line = rng.choice(lines)
+            parts.append(line)
+            size += len(line) + 1
+        answers.append("\n".join(parts))
+    return answers
+
+
+def add_plain(conversation, role, content):
+    """Append a message the way Conversation.add did before Message records"""
+    conversation.messages.append({"role": role, "content": content})
+
+
+def add_compact(conversation, role, content):
+    conversation.add(role, content)
+
+
+def build(add, sessions, turns, answers):
+    """sessions Conversations of turns question/answer pairs, and the seconds taken to add the messages"""
+    conversations = []
+    elapsed = 0.0
+    for session in range(sessions):
+        conversation = Conversation(f"bench-{session}")
+        for turn in range(turns):
+            question = f"Question {turn} in session {session}: how do I counter a Hog Rider push?"
+            answer = f"{answers[(session * turns + turn) % len(answers)]}\n\n_Answer {session}-{turn}_"
+            started = time.perf_counter()
+            add(conversation, "user", question)
+            add(conversation, "assistant", answer)
+            elapsed += time.perf_counter() - started
+        conversations.append(conversation)
+    return conversations, elapsed
+
+
+def read_seconds(conversations, window):
+    """Seconds to read each session's visible window, and to read every message"""
+    started = time.perf_counter()
+    for conversation in conversations:
+        for message in conversation.messages[-window:]:
+            message["role"], message["content"]
+    visible = time.perf_counter() - started
+    started = time.perf_counter()
+    for conversation in conversations:
+        for message in conversation.messages:
+            message["role"], message["content"]
+    return visible, time.perf_counter() - started
+
+
+def measure(add, sessions, turns, answers, window):
+    """Bytes held by the built sessions and the timings for one message layout"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    conversations, add_seconds = build(add, sessions, turns, answers)
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    visible, full = read_seconds(conversations, window)
+    messages = sessions * turns * 2
+    return {
+        "mb": held / 1e6,
+        "kb_per_session": held / sessions / 1e3,
+        "bytes_per_message": held / messages,
+        "add_us_per_message": add_seconds / messages * 1e6,
+        "visible_read_ms": visible * 1000,
+        "full_read_ms": full * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=1000, help="sessions to build")
+    parser.add_argument("--turns", type=int, default=50, help="question/answer pairs per session")
+    parser.add_argument("--answer-chars", type=int, default=3000, help="approximate length of each answer")
+    parser.add_argument("--window", type=int, default=20, help="CHAT_RENDER_WINDOW: messages kept as text")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    os.environ["CHAT_RENDER_WINDOW"] = str(args.window)
+    answers = make_answers(ANSWER_POOL, args.answer_chars)
+    results = {}
+    for name, add in (("dicts", add_plain), ("compact", add_compact)):
+        results[name] = measure(add, args.sessions, args.turns, answers, args.window)
+        gc.collect()
+
+    print(f"{args.sessions} sessions x {args.turns} turns, ~{args.answer_chars} character answers, window {args.window}")
+    print(f"{'layout':>8} {'MB':>9} {'KB/session':>11} {'B/message':>10} {'add (us)':>9} {'visible (ms)':>13} {'full (ms)':>10}")
+    for name, result in results.items():
+        print(f"{name:>8} {result['mb']:>9.1f} {result['kb_per_session']:>11.1f} {result['bytes_per_message']:>10.0f}"
+              f" {result['add_us_per_message']:>9.1f} {result['visible_read_ms']:>13.1f} {result['full_read_ms']:>10.1f}")
+    print(f"compact layout holds {results['compact']['mb'] / results['dicts']['mb']:.0%} of the dicts' memory")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Compare per-call allocations of rebuilding persona prompts vs registry lookup
+
+Run from the repository root:
+    python benchmarks/bench_persona_prompts.py
+"""
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from personas import CLASH_ROYALE_CONTEXT, PERSONAS, get_system_prompt
+
+CALLS = 1000
+GUIDELINES = {name: persona.guidelines for name, persona in PERSONAS.items()}
+
+
+def rebuild_prompt(personality):
+    """Old behaviour: concatenate the knowledge into every persona on each call"""
+    personality_prompts = {name: CLASH_ROYALE_CONTEXT + text for name, text in GUIDELINES.items()}
+    return personality_prompts.get(personality, personality_prompts["Friendly"])
+
+
+def measure(func):
+    """Return the average peak bytes allocated by one call to func"""
+    tracemalloc.start()
+    total = 0
+    for _ in range(CALLS):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        func("Professional")
+        total += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return total / CALLS
+
+
+if __name__ == "__main__":
+    for label, func in (("rebuild per call", rebuild_prompt), ("registry lookup", get_system_prompt)):
+        print(f"{label:>18}: {measure(func):10.0f} bytes allocated per call")
@@ -0,0 +1,85 @@
+"""Startup-time report: how long a fresh process takes to import each entry point, from python -X importtime
+
+Every run is a new interpreter, so nothing is cached in sys.modules. Heavy
+libraries that should only load on the first model call (or in the background
+warm-up) are flagged if an entry point imports them eagerly. Run from the
+repository root:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 5 --top 15 --max-ms 300 --json startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules each process type imports before it can serve anything
+ENTRY_POINTS = ("chat_engine", "api", "batch")
+# Libraries that must stay out of the import path (see lazy_imports)
+DEFERRED = ("google.generativeai", "google.api_core.exceptions", "grpc")
+
+
+def import_times(module):
+    """{module: (self_us, cumulative_us)} for everything a fresh interpreter imports with module"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, env=dict(os.environ, MODEL_BACKEND="fake"),
+    )
+    if result.returncode:
+        raise SystemExit(f"importing {module} failed:\n{result.stderr}")
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def measure(module, runs, top):
+    """Median total import time of module over runs, its slowest imports and any deferred library it loaded"""
+    samples = [import_times(module) for _ in range(runs)]
+    totals = [times[module][1] / 1000 for times in samples]
+    last = samples[-1]
+    slowest = sorted(last.items(), key=lambda item: item[1][0], reverse=True)[:top]
+    return {
+        "total_ms": statistics.median(totals),
+        "slowest": [{"module": name, "self_ms": self_us / 1000, "cumulative_ms": cumulative_us / 1000}
+                    for name, (self_us, cumulative_us) in slowest],
+        "eager": [name for name in DEFERRED if name in last],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=list(ENTRY_POINTS), help=f"modules to import (default: {' '.join(ENTRY_POINTS)})")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per module; the median is reported")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list by self time")
+    parser.add_argument("--max-ms", type=float, help="exit with an error if any module takes longer, or imports a deferred library")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = {module: measure(module, args.runs, args.top) for module in args.modules}
+    failed = False
+    for module, result in results.items():
+        print(f"{module}: {result['total_ms']:.0f} ms (median of {args.runs})")
+        for item in result["slowest"]:
+            print(f"  {item['self_ms']:8.1f} ms self {item['cumulative_ms']:8.1f} ms total  {item['module']}")
+        if result["eager"]:
+            print(f"  imported eagerly: {', '.join(result['eager'])}")
+        if args.max_ms is not None and (result["total_ms"] > args.max_ms or result["eager"]):
+            failed = True
+        print()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if failed:
+        raise SystemExit(f"startup budget of {args.max_ms:g} ms exceeded")
+
+
+if __name__ == "__main__":
+    main()
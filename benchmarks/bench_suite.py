@@ -0,0 +1,187 @@
+"""Offline benchmark suite: drive get_ai_response and the Streamlit app against the fake model backend
+
+No API key or network is needed, so this runs in CI. Run from the repository root:
+    python benchmarks/bench_suite.py
+    python benchmarks/bench_suite.py --sessions 50 --turns 4 --ttft 0.5 --error-rate 0.05 --json results.json
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["MODEL_BACKEND"] = "fake"
+# Background pre-generation of the popular topics would compete with the measured turns
+os.environ["POPULAR_TOPICS"] = "false"
+os.environ.setdefault("CONVERSATION_DB", os.path.join(tempfile.mkdtemp(prefix="bench-"), "conversations.db"))
+
+from streamlit.testing.v1 import AppTest
+
+from chat_engine import build_model, get_ai_response, start_chat
+from fake_model import FakeModelConfig
+from model_backend import FakeBackend, set_model_backend
+
+APP_PATH = os.path.join(ROOT, "app.py")
+PERSONALITY = "Friendly"
+
+
+def make_prompt(session, turn):
+    """A distinct model-bound question per session and turn, so nothing is cached or shared"""
+    return f"How should I defend against Hog Rider in ladder match {session}-{turn}?"
+
+
+def percentiles(values):
+    """p50, p95 and p99 of a list of values"""
+    if len(values) < 2:
+        value = values[0] if values else 0.0
+        return value, value, value
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return cuts[49], cuts[94], cuts[98]
+
+
+def run_session(session, turns, results):
+    """Ask turns questions in one chat session, recording time to first chunk and total latency"""
+    chat = start_chat(build_model(PERSONALITY))
+    for turn in range(turns):
+        start = time.perf_counter()
+        first = None
+        chunks = []
+        for text in get_ai_response(chat, make_prompt(session, turn), PERSONALITY, stream=True):
+            if first is None:
+                first = time.perf_counter() - start
+            chunks.append(text)
+        total = time.perf_counter() - start
+        results.append((first or total, total, "".join(chunks).startswith("Error:")))
+    return chat
+
+
+def bench_engine(sessions, turns):
+    """Concurrent sessions calling get_ai_response; returns latency and throughput stats"""
+    results = []
+    threads = [threading.Thread(target=run_session, args=(i, turns, results)) for i in range(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": len(results),
+        "errors": sum(1 for _, _, error in results if error),
+        "throughput_rps": len(results) / elapsed,
+        "ttft": percentiles([first for first, _, _ in results]),
+        "latency": percentiles([total for _, total, _ in results]),
+    }
+
+
+def engine_memory_per_session(sessions, turns):
+    """Bytes retained per chat session after turns exchanges, with the fake model answering instantly"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    results = []
+    chats = [run_session(1_000_000 + i, turns, results) for i in range(sessions)]
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del chats
+    return retained / sessions
+
+
+def run_app_session(session, turns, timings):
+    """Chat through the Streamlit script for turns questions, timing each rerun"""
+    at = AppTest.from_file(APP_PATH, default_timeout=120).run()
+    for turn in range(turns):
+        start = time.perf_counter()
+        at.chat_input[0].set_value(make_prompt(session, turn)).run()
+        timings.append(time.perf_counter() - start)
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+    return at
+
+
+def bench_app(sessions, turns):
+    """Run the Streamlit script with AppTest, timing each chat turn's rerun"""
+    timings = []
+    # One unmeasured run so first-time imports and cached resources aren't counted
+    AppTest.from_file(APP_PATH, default_timeout=120).run()
+    for session in range(sessions):
+        run_app_session(2_000_000 + session, turns, timings)
+
+    # Memory is traced on a separate session so tracing overhead doesn't skew the timings
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    at = run_app_session(3_000_000, turns, [])
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del at
+    return {
+        "reruns": len(timings),
+        "rerun": percentiles(timings),
+        "memory_per_session": retained,
+    }
+
+
+def format_ms(values):
+    return " / ".join(f"{value * 1000:.0f}" for value in values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent get_ai_response sessions")
+    parser.add_argument("--turns", type=int, default=5, help="questions per session")
+    parser.add_argument("--app-sessions", type=int, default=3, help="AppTest sessions (0 to skip)")
+    parser.add_argument("--ttft", type=float, default=0.3, help="fake model time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0, help="fake model output rate")
+    parser.add_argument("--response-tokens", type=int, default=120, help="fake answer length")
+    parser.add_argument("--block-rate", type=float, default=0.0, help="share of blocked candidates")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of 503 errors")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    config = FakeModelConfig(
+        ttft=args.ttft,
+        tokens_per_second=args.tokens_per_second,
+        response_tokens=args.response_tokens,
+        block_rate=args.block_rate,
+        error_rate=args.error_rate,
+    )
+    set_model_backend(FakeBackend(config))
+    engine = bench_engine(args.sessions, args.turns)
+
+    # Memory is measured with an instant model so tracing overhead doesn't skew the latency run
+    set_model_backend(FakeBackend(config._replace(ttft=0, tokens_per_second=0, error_rate=0, block_rate=0)))
+    engine["memory_per_session"] = engine_memory_per_session(min(args.sessions, 20), args.turns)
+
+    set_model_backend(FakeBackend(config))
+    app = bench_app(args.app_sessions, args.turns) if args.app_sessions else None
+
+    print(f"fake model: ttft {config.ttft}s, {config.tokens_per_second:g} tok/s, {config.response_tokens} tokens, "
+          f"block {config.block_rate:.0%}, errors {config.error_rate:.0%}\n")
+    print(f"get_ai_response: {args.sessions} sessions x {args.turns} turns")
+    print(f"  requests         {engine['requests']} ({engine['errors']} errors)")
+    print(f"  throughput       {engine['throughput_rps']:.1f} req/s")
+    print(f"  TTFT p50/95/99   {format_ms(engine['ttft'])} ms")
+    print(f"  latency p50/95/99 {format_ms(engine['latency'])} ms")
+    print(f"  memory/session   {engine['memory_per_session'] / 1024:.1f} KiB")
+    if app:
+        print(f"\nStreamlit app (AppTest): {args.app_sessions} sessions x {args.turns} turns")
+        print(f"  rerun p50/95/99  {format_ms(app['rerun'])} ms")
+        print(f"  memory/session   {app['memory_per_session'] / 1024:.1f} KiB")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": config._asdict(), "engine": engine, "app": app}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+import re
+
+# Role flags, combined into one int per card
+WIN_CONDITION = 1
+AIR_DEFENSE = 2
+SPLASH = 4
+TANK = 8
+SWARM = 16
+SMALL_SPELL = 32
+BIG_SPELL = 64
+
+ROLE_FLAGS = {
+    "win": WIN_CONDITION,
+    "air": AIR_DEFENSE,
+    "splash": SPLASH,
+    "tank": TANK,
+    "swarm": SWARM,
+    "small_spell": SMALL_SPELL,
+    "big_spell": BIG_SPELL,
+}
+
+# name | elixir | rarity | type | roles
+CARD_TABLE = """
+Knight|3|Common|troop|tank
+Archers|3|Common|troop|air
+Goblins|2|Common|troop|swarm
+Spear Goblins|2|Common|troop|air,swarm
+Minions|3|Common|troop|air,swarm
+Minion Horde|5|Common|troop|air,swarm
+Skeletons|1|Common|troop|swarm
+Barbarians|5|Common|troop|swarm
+Bomber|2|Common|troop|splash
+Bats|2|Common|troop|air,swarm
+Ice Spirit|1|Common|troop|
+Fire Spirit|1|Common|troop|splash
+Electro Spirit|1|Common|troop|
+Goblin Gang|3|Common|troop|swarm
+Firecracker|3|Common|troop|air,splash
+Royal Giant|6|Common|troop|win,tank
+Elite Barbarians|6|Common|troop|
+Royal Recruits|7|Common|troop|tank
+Rascals|5|Common|troop|air
+Skeleton Barrel|3|Common|troop|win,swarm
+Skeleton Dragons|4|Common|troop|air,splash
+Giant|5|Rare|troop|win,tank
+Musketeer|4|Rare|troop|air
+Mini P.E.K.K.A|4|Rare|troop|
+Hog Rider|4|Rare|troop|win
+Valkyrie|4|Rare|troop|splash,tank
+Wizard|5|Rare|troop|air,splash
+Three Musketeers|9|Rare|troop|win,air
+Battle Ram|4|Rare|troop|win
+Ice Golem|2|Rare|troop|tank
+Mega Minion|3|Rare|troop|air
+Dart Goblin|3|Rare|troop|air
+Zappies|4|Rare|troop|air
+Flying Machine|4|Rare|troop|air
+Royal Hogs|5|Rare|troop|win
+Elixir Golem|3|Rare|troop|win,tank
+Battle Healer|4|Rare|troop|
+Heal Spirit|1|Rare|troop|
+Prince|5|Epic|troop|
+Dark Prince|4|Epic|troop|splash
+Baby Dragon|4|Epic|troop|air,splash
+Witch|5|Epic|troop|air,splash
+Skeleton Army|3|Epic|troop|swarm
+Guards|3|Epic|troop|swarm
+Balloon|5|Epic|troop|win
+P.E.K.K.A|7|Epic|troop|tank
+Golem|8|Epic|troop|win,tank
+Giant Skeleton|6|Epic|troop|tank,splash
+Bowler|5|Epic|troop|splash
+Executioner|5|Epic|troop|air,splash
+Hunter|4|Epic|troop|air
+Cannon Cart|5|Epic|troop|
+Wall Breakers|2|Epic|troop|win
+Goblin Giant|6|Epic|troop|win,tank
+Electro Dragon|5|Epic|troop|air
+Electro Giant|7|Epic|troop|win,tank
+Princess|3|Legendary|troop|air,splash
+Ice Wizard|3|Legendary|troop|air,splash
+Miner|3|Legendary|troop|win
+Lava Hound|7|Legendary|troop|win,tank
+Sparky|6|Legendary|troop|splash
+Lumberjack|4|Legendary|troop|
+Inferno Dragon|4|Legendary|troop|air
+Electro Wizard|4|Legendary|troop|air
+Night Witch|4|Legendary|troop|
+Bandit|3|Legendary|troop|
+Royal Ghost|3|Legendary|troop|splash
+Ram Rider|5|Legendary|troop|win
+Mega Knight|7|Legendary|troop|splash,tank
+Magic Archer|4|Legendary|troop|air
+Fisherman|3|Legendary|troop|
+Mother Witch|4|Legendary|troop|air
+Phoenix|4|Legendary|troop|air
+Golden Knight|4|Champion|troop|
+Archer Queen|5|Champion|troop|air
+Skeleton King|4|Champion|troop|splash,tank
+Mighty Miner|4|Champion|troop|
+Monk|5|Champion|troop|
+Little Prince|3|Champion|troop|air
+Zap|2|Common|spell|small_spell
+Arrows|3|Common|spell|small_spell
+Giant Snowball|2|Common|spell|small_spell
+Royal Delivery|3|Common|spell|small_spell
+Fireball|4|Rare|spell|big_spell
+Rocket|6|Rare|spell|big_spell
+Earthquake|3|Rare|spell|big_spell
+Poison|4|Epic|spell|big_spell
+Lightning|6|Epic|spell|big_spell
+Void|3|Epic|spell|big_spell
+Freeze|4|Epic|spell|
+Rage|2|Epic|spell|
+Clone|3|Epic|spell|
+Tornado|3|Epic|spell|
+Goblin Barrel|3|Epic|spell|win
+Barbarian Barrel|2|Epic|spell|small_spell
+Graveyard|5|Legendary|spell|win
+The Log|2|Legendary|spell|small_spell
+Cannon|3|Common|building|
+Mortar|4|Common|building|win
+Tesla|4|Common|building|air
+Inferno Tower|5|Rare|building|air
+Bomb Tower|4|Rare|building|splash
+Tombstone|3|Rare|building|
+Goblin Hut|5|Rare|building|
+Furnace|4|Rare|building|splash
+Goblin Cage|4|Rare|building|
+Barbarian Hut|7|Rare|building|
+Elixir Collector|6|Rare|building|
+X-Bow|6|Epic|building|win
+Goblin Drill|4|Epic|building|win
+"""
+
+# Common player shorthand for card names
+CARD_ALIASES = {
+    "hog": "Hog Rider",
+    "log": "The Log",
+    "pekka": "P.E.K.K.A",
+    "mini pekka": "Mini P.E.K.K.A",
+    "mp": "Mini P.E.K.K.A",
+    "ewiz": "Electro Wizard",
+    "e wiz": "Electro Wizard",
+    "edrag": "Electro Dragon",
+    "e drag": "Electro Dragon",
+    "egiant": "Electro Giant",
+    "e giant": "Electro Giant",
+    "mk": "Mega Knight",
+    "musk": "Musketeer",
+    "3m": "Three Musketeers",
+    "xbow": "X-Bow",
+    "snowball": "Giant Snowball",
+    "barb barrel": "Barbarian Barrel",
+    "gob barrel": "Goblin Barrel",
+    "gy": "Graveyard",
+    "rg": "Royal Giant",
+    "lava": "Lava Hound",
+    "inferno": "Inferno Tower",
+    "skarmy": "Skeleton Army",
+    "gob gang": "Goblin Gang",
+    "dart gob": "Dart Goblin",
+    "nw": "Night Witch",
+    "ij": "Inferno Dragon",
+    "ice wiz": "Ice Wizard",
+    "barbs": "Barbarians",
+    "ebarbs": "Elite Barbarians",
+    "e barbs": "Elite Barbarians",
+    "collector": "Elixir Collector",
+    "pump": "Elixir Collector",
+    "loon": "Balloon",
+    "skelly barrel": "Skeleton Barrel",
+    "mm": "Mega Minion",
+}
+
+
+class Card:
+    """One row of the card table"""
+
+    __slots__ = ("name", "elixir", "rarity", "kind", "roles")
+
+    def __init__(self, name, elixir, rarity, kind, roles):
+        self.name = name
+        self.elixir = elixir
+        self.rarity = rarity
+        self.kind = kind
+        self.roles = roles
+
+    def has(self, role):
+        """Check a role flag"""
+        return bool(self.roles & role)
+
+    def __repr__(self):
+        return f"Card({self.name!r}, {self.elixir})"
+
+
+def normalize_card_text(text):
+    """Lowercase and drop dots/hyphens so "P.E.K.K.A" and "X-Bow" match "pekka" and "x bow" """
+    return " ".join(text.lower().replace(".", "").replace("-", " ").split())
+
+
+def load_cards(table=CARD_TABLE):
+    """Parse the card table into Card records keyed by normalized name"""
+    cards = {}
+    for row in table.strip().splitlines():
+        name, elixir, rarity, kind, roles = row.split("|")
+        flags = 0
+        for role in filter(None, roles.split(",")):
+            flags |= ROLE_FLAGS[role]
+        cards[normalize_card_text(name)] = Card(name, int(elixir), rarity, kind, flags)
+    return cards
+
+
+CARDS = load_cards()
+_lookup = dict(CARDS)
+_lookup.update({normalize_card_text(alias): CARDS[normalize_card_text(name)] for alias, name in CARD_ALIASES.items()})
+
+# Longest names first so "giant snowball" wins over "giant"
+_card_pattern = re.compile(r"\b(" + "|".join(
+    re.escape(name) for name in sorted(_lookup, key=len, reverse=True)
+) + r")\b")
+
+
+def get_card(name):
+    """Look up a card by name or alias"""
+    return _lookup.get(normalize_card_text(name))
+
+
+def find_cards(text):
+    """Distinct cards mentioned in text, in order of first mention"""
+    found = []
+    for match in _card_pattern.finditer(normalize_card_text(text)):
+        card = _lookup[match.group(1)]
+        if card not in found:
+            found.append(card)
+    return found
+
+
+def strip_cards(text):
+    """Normalized text with every card name and alias removed"""
+    return _card_pattern.sub(" ", normalize_card_text(text))
@@ -0,0 +1,626 @@
+import os
+import threading
+import time
+from lazy_imports import lazy_import
+from personas import DEFAULT_PERSONA, get_system_prompt
+from conversation_store import ConversationCache, get_conversation_cache
+from context_cache import get_context_cache
+from response_cache import get_response_cache, is_standalone_question, normalize_question
+from single_flight import get_single_flight
+from model_backend import get_model_backend
+from model_pool import get_model_pool
+from metrics import BLOCKED, TurnTrace
+from async_backend import async_backend_enabled, iterate_sync, request_slot
+from history import content_text, estimate_tokens, get_history_manager, get_transcript_archive
+from knowledge_index import retrieval_enabled, retrieve_context
+from admission import AdmissionTimeout, get_admission_controller
+from popular_topics import get_topic_answers
+from resilience import CircuitOpenError, call_with_retry, call_with_retry_async, get_circuit_breaker
+from intent_router import get_intent_stats, route_prompt
+from generation_policy import default_plan, get_generation_policy
+
+# Imported on first use, see lazy_imports
+genai = lazy_import("google.generativeai")
+genai_types = lazy_import("google.generativeai.types")
+
+# Default Gemini model used for chat
+MODEL_NAME = "gemini-2.5-flash"
+
+# Safety settings sent with every request
+SAFETY_SETTINGS = [
+    {
+        "category": "HARM_CATEGORY_HARASSMENT",
+        "threshold": "BLOCK_NONE"
+    },
+    {
+        "category": "HARM_CATEGORY_HATE_SPEECH",
+        "threshold": "BLOCK_NONE"
+    },
+    {
+        "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+        "threshold": "BLOCK_NONE"
+    },
+    {
+        "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
+        "threshold": "BLOCK_NONE"
+    }
+]
+
+# Generation settings for normal chat turns and for the blocked-response retry
+GENERATION_CONFIG = {
+    "temperature": 0.8,
+    "max_output_tokens": 2048,
+    "top_p": 0.95,
+}
+RETRY_GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "max_output_tokens": 2048,
+}
+# Shown when both the question and its simplified retry come back without an answer
+BLOCKED_MESSAGE = "The response was blocked by the model's safety filters. Try rephrasing your question."
+
+
+def build_cached_model(cached_content, generation_config=GENERATION_CONFIG):
+    """Create a Gemini model that references a persona's cached system prompt"""
+    return get_model_backend().create_cached_model(
+        cached_content,
+        generation_config=generation_config,
+        safety_settings=SAFETY_SETTINGS
+    )
+
+
+def build_model(personality, model_name=MODEL_NAME, generation_config=GENERATION_CONFIG):
+    """Create a Gemini model with the persona's system prompt as its system instruction"""
+    compact = retrieval_enabled()
+    backend = get_model_backend()
+    pool = get_model_pool()
+    # Cached content belongs to one model and key, so a pool always sends the prompt inline
+    context_cache = get_context_cache() if pool is None else None
+    if context_cache is not None and not compact:
+        try:
+            return build_cached_model(context_cache.get(personality, model_name), generation_config)
+        except Exception:
+            # Fall back to sending the prompt inline if it can't be cached
+            pass
+    model = backend.create_model(
+        model_name,
+        system_instruction=get_system_prompt(personality, compact),
+        generation_config=generation_config,
+        safety_settings=SAFETY_SETTINGS
+    )
+    return pool.attach(model) if pool is not None else model
+
+
+def refresh_chat_model(chat, personality):
+    """Point the chat at the persona's current cached content before sending a turn"""
+    context_cache = get_context_cache()
+    if context_cache is None or chat.model.cached_content is None:
+        return
+    try:
+        cached_content = context_cache.get(personality, chat.model.model_name)
+    except Exception:
+        chat.model = build_model(personality)
+        return
+    if cached_content.name != chat.model.cached_content:
+        chat.model = build_cached_model(cached_content)
+
+
+def to_gemini_history(messages):
+    """Convert chat messages into Gemini content entries"""
+    history = []
+    for msg in messages:
+        if msg["role"] == "user":
+            history.append({"role": "user", "parts": [msg["content"]]})
+        elif msg["role"] == "assistant":
+            history.append({"role": "model", "parts": [msg["content"]]})
+    return history
+
+
+def start_chat(model, messages=()):
+    """Start a chat session seeded with any existing chat messages"""
+    chat = model.start_chat(history=to_gemini_history(messages))
+    get_history_manager().trim(chat)
+    return chat
+
+
+def record_exchange(chat, prompt, text):
+    """Append a user/model exchange that was answered outside send_message"""
+    chat.history.extend([
+        genai.protos.Content(role="user", parts=[genai.protos.Part(text=prompt)]),
+        genai.protos.Content(role="model", parts=[genai.protos.Part(text=text)]),
+    ])
+
+
+def build_message(prompt, top_k=None):
+    """Add the knowledge sections relevant to the prompt when retrieval is enabled"""
+    if not retrieval_enabled():
+        return prompt
+    context = retrieve_context(prompt, top_k)
+    if not context:
+        return prompt
+    return f"Relevant Clash Royale knowledge:\n{context}\n\nQuestion: {prompt}"
+
+
+class BlockedResponseError(Exception):
+    """Raised when the simplified retry of a blocked prompt is blocked too"""
+
+
+class ErrorAnswer(str):
+    """The "Error: ..." text yielded in place of an answer, carrying the exception behind it"""
+
+    def __new__(cls, error):
+        answer = super().__new__(cls, f"Error: {str(error)}")
+        answer.error = error
+        return answer
+
+
+def commit_exchange(chat, prompt):
+    """Commit a streamed exchange to the history, keeping only the plain question"""
+    # Reading the history commits the streamed exchange to the session
+    history = chat.history
+    if history[-2].parts[0].text != prompt:
+        # Retrieved knowledge is only needed for this turn, so don't carry it forward
+        history[-2] = genai.protos.Content(role="user", parts=[genai.protos.Part(text=prompt)])
+
+
+def discard_last_exchange(chat):
+    """Drop a pending exchange left behind by a blocked or failed response"""
+    if chat.last is not None:
+        try:
+            chat.rewind()
+        except genai_types.IncompleteIterationError:
+            # A stream abandoned midway can't be rewound; drop the pending exchange directly
+            chat._last_sent = chat._last_received = None
+
+
+# Estimate what a turn costs against the token rate limits
+def estimate_request_tokens(chat, prompt, plan):
+    """Rough upper bound of the tokens a turn uses: the prompt, the chat history and the longest allowed answer"""
+    history = sum(estimate_tokens(content_text(content)) for content in chat.history)
+    return estimate_tokens(prompt) + history + plan.max_output_tokens
+
+
+# Stream response text from a Gemini response as chunks arrive
+def stream_response_text(response):
+    """Yield text from each streamed chunk, skipping chunks without content"""
+    for chunk in response:
+        if chunk.candidates and chunk.candidates[0].content.parts:
+            yield chunk.text
+
+
+# Bookkeeping shared by the sync and async model streams, which only differ in how they call the model
+class ModelExchange:
+    """One prompt sent to the model: its chunks, usage, history and the simplified retry after a block"""
+
+    def __init__(self, chat, prompt, plan=None, trace=None):
+        self.chat = chat
+        self.prompt = prompt
+        self.plan = plan or default_plan()
+        self.trace = trace or TurnTrace()
+        self.received = []
+        self.upstream = None
+
+    def message(self):
+        """The prompt with retrieved knowledge; starts timing the upstream call"""
+        started, started_ns = time.perf_counter(), time.time_ns()
+        message = build_message(self.prompt, self.plan.top_k)
+        self.trace.prompt_built(started, started_ns)
+        self.upstream = self.trace.upstream(self.chat.model.model_name)
+        return message
+
+    def chunk(self, text):
+        """Note a chunk of the answer and return it"""
+        self.upstream.chunk()
+        self.received.append(text)
+        return text
+
+    def record_answer(self, response):
+        """Record the finished response; returns False if it was empty and needs the retry"""
+        self.upstream.finish(response)
+        get_generation_policy().record(self.plan, response)
+        if not self.received:
+            return False
+        self.trace.truncated = self.upstream.blocked
+        commit_exchange(self.chat, self.prompt)
+        return True
+
+    def record_block(self, error):
+        """Record a blocked response; returns False if nothing arrived and it needs the retry"""
+        # A stream that finished blocked was already counted by its finish reason
+        if self.upstream is None or not self.upstream.blocked:
+            BLOCKED.inc(reason=type(error).__name__)
+        discard_last_exchange(self.chat)
+        if not self.received:
+            return False
+        self.trace.truncated = True
+        record_exchange(self.chat, self.prompt, "".join(self.received))
+        return True
+
+    def retry_prompt(self):
+        """The simplified one-off prompt to retry with; starts timing its upstream call"""
+        discard_last_exchange(self.chat)
+        self.upstream = self.trace.upstream(self.chat.model.model_name)
+        return f"As a Clash Royale game expert, answer this question about the mobile game: {self.prompt}"
+
+    def record_retry(self, response):
+        """Keep the retry's answer in the history"""
+        self.upstream.finish(response)
+        if not self.received:
+            # An empty model turn would make every later request in this chat fail
+            raise BlockedResponseError(BLOCKED_MESSAGE)
+        record_exchange(self.chat, self.prompt, "".join(self.received))
+
+
+# Stream model output, retrying with a simplified prompt if the first one is blocked
+def stream_model_response(chat, prompt, plan=None, trace=None):
+    """Send the prompt through the chat session and yield text chunks as they arrive
+
+    The generation plan sets the answer length, stop sequences and how much
+    knowledge is retrieved; the output tokens used are recorded against it.
+    Transient upstream errors are retried with backoff before the first chunk
+    arrives. Errors other than blocked responses are raised to the caller.
+    """
+    exchange = ModelExchange(chat, prompt, plan, trace)
+    try:
+        message = exchange.message()
+        response = call_with_retry(lambda: chat.send_message(
+            message,
+            generation_config=exchange.plan.generation_config,
+            stream=True
+        ))
+        for text in stream_response_text(response):
+            yield exchange.chunk(text)
+        if exchange.record_answer(response):
+            return
+    except (genai_types.BlockedPromptException, genai_types.StopCandidateException, genai_types.BrokenResponseError) as e:
+        if exchange.record_block(e):
+            return
+
+    # If blocked, try with a simplified one-off prompt and keep it in the history
+    simple_prompt = exchange.retry_prompt()
+    retry_response = call_with_retry(lambda: chat.model.generate_content(
+        simple_prompt,
+        generation_config=RETRY_GENERATION_CONFIG,
+        stream=True
+    ))
+    for text in stream_response_text(retry_response):
+        yield exchange.chunk(text)
+    exchange.record_retry(retry_response)
+
+
+# Async version of stream_response_text
+async def stream_response_text_async(response):
+    """Yield text from each chunk of an async streamed response"""
+    async for chunk in response:
+        if chunk.candidates and chunk.candidates[0].content.parts:
+            yield chunk.text
+
+
+# Async version of stream_model_response, holding a request slot for the whole call
+async def stream_model_response_async(chat, prompt, plan=None, trace=None):
+    """Send the prompt with generate_content_async and yield text chunks as they arrive
+
+    At most MAX_CONCURRENT_REQUESTS calls run at once per process; the rest wait
+    for a free slot. Errors other than blocked responses are raised to the caller.
+    """
+    # Fail fast without queueing for a slot while the circuit breaker is open
+    get_circuit_breaker().peek()
+    exchange = ModelExchange(chat, prompt, plan, trace)
+    async with request_slot():
+        try:
+            message = exchange.message()
+            response = await call_with_retry_async(lambda: chat.send_message_async(
+                message,
+                generation_config=exchange.plan.generation_config,
+                stream=True
+            ))
+            async for text in stream_response_text_async(response):
+                yield exchange.chunk(text)
+            if exchange.record_answer(response):
+                return
+        except (genai_types.BlockedPromptException, genai_types.StopCandidateException, genai_types.BrokenResponseError) as e:
+            if exchange.record_block(e):
+                return
+
+        # If blocked, try with a simplified one-off prompt and keep it in the history
+        simple_prompt = exchange.retry_prompt()
+        retry_response = await call_with_retry_async(lambda: chat.model.generate_content_async(
+            simple_prompt,
+            generation_config=RETRY_GENERATION_CONFIG,
+            stream=True
+        ))
+        async for text in stream_response_text_async(retry_response):
+            yield exchange.chunk(text)
+        exchange.record_retry(retry_response)
+
+
+# Stream model chunks through the async backend when it is enabled
+def stream_model_chunks(chat, prompt, plan, trace=None, cancellation=None):
+    """Yield the model's answer to a prompt as text chunks
+
+    cancellation aborts the call at once on the async backend; the sync
+    backend can't interrupt a read, so its callers stop at the next chunk.
+    """
+    if async_backend_enabled():
+        return iterate_sync(stream_model_response_async(chat, prompt, plan, trace), cancellation)
+    return stream_model_response(chat, prompt, plan, trace)
+
+
+# Stream model chunks for a request shared by several sessions
+def stream_shared_response(chat, prompt, plan, trace=None, cancellation=None):
+    """Yield the model's answer, cleaning up the starting session's pending exchange itself
+
+    The call runs on a single-flight worker thread, so the session that started it
+    may have stopped reading by the time an error arrives.
+    """
+    try:
+        yield from stream_model_chunks(chat, prompt, plan, trace, cancellation)
+    except BaseException:
+        discard_last_exchange(chat)
+        raise
+
+
+# Stream AI response and keep the chat history within its token budget
+def stream_ai_response(chat, prompt, personality=None, route=None, session_id=None, on_queued=None, plan=None):
+    """Yield the answer to a prompt, then fold old turns into the rolling summary"""
+    yield from stream_answer(chat, prompt, personality, route, session_id, on_queued, plan)
+    get_history_manager().trim(chat)
+
+
+# Stream an answer, serving trivial intents locally and repeated questions from the response cache
+def stream_answer(chat, prompt, personality=None, route=None, session_id=None, on_queued=None, plan=None):
+    """Yield the answer to a prompt, from the intent router, popular topics or response cache when possible
+
+    Identical standalone questions asked at the same time share one model call.
+    Requests that would go to the model pass admission control first, see
+    get_ai_response for session_id, on_queued and plan.
+    """
+    route = route or route_prompt(prompt)
+    trace = TurnTrace(route.intent)
+    if route.answer is not None:
+        record_exchange(chat, prompt, route.answer)
+        trace.finish("local")
+        yield route.answer
+        return
+
+    standalone = personality is not None and is_standalone_question(prompt, bool(chat.history))
+    # The sidebar's popular topics are answered ahead of time in every persona
+    topic_answers = get_topic_answers() if standalone else None
+    precomputed = topic_answers.get(personality, prompt) if topic_answers is not None else None
+    if precomputed is not None:
+        get_intent_stats().record_cache_hit()
+        record_exchange(chat, prompt, precomputed)
+        trace.finish("precomputed")
+        yield precomputed
+        return
+
+    response_cache = get_response_cache() if personality else None
+    cacheable = response_cache is not None and standalone
+    if cacheable:
+        cached = response_cache.get(personality, prompt)
+        if cached is not None:
+            get_intent_stats().record_cache_hit()
+            record_exchange(chat, prompt, cached)
+            trace.finish("cache")
+            yield cached
+            return
+
+    plan = plan or get_generation_policy().plan(prompt, route, personality, chat.model.model_name)
+    # Sessions over their rate limits wait in a fair queue; only requests that reach the model count
+    admission = get_admission_controller()
+    grant = None
+    if admission is not None:
+        try:
+            grant = admission.acquire(session_id, estimate_request_tokens(chat, prompt, plan), on_wait=on_queued)
+        except AdmissionTimeout as e:
+            trace.finish("throttled", e)
+            yield ErrorAnswer(e)
+            return
+
+    single_flight = get_single_flight() if standalone else None
+    if single_flight is not None:
+        key = (personality, normalize_question(prompt))
+        model_chunks, leader = single_flight.stream(key, lambda cancellation: stream_shared_response(chat, prompt, plan, trace, cancellation))
+        if not leader:
+            get_intent_stats().record_shared()
+            if grant is not None:
+                admission.release(grant)
+    else:
+        model_chunks, leader = stream_model_chunks(chat, prompt, plan, trace), True
+
+    received = []
+    try:
+        for text in model_chunks:
+            received.append(text)
+            yield text
+    except GeneratorExit:
+        # The caller stopped reading; drop the unfinished exchange so the chat stays usable
+        model_chunks.close()
+        if single_flight is None:
+            discard_last_exchange(chat)
+        trace.finish("cancelled")
+        raise
+    except CircuitOpenError as e:
+        # While the API is failing, fall back to any cached answer for this question
+        cached = None
+        if response_cache is not None and not cacheable:
+            # Standalone questions were already looked up above
+            cached = response_cache.get(personality, prompt)
+        if cached is not None:
+            get_intent_stats().record_cache_hit()
+            record_exchange(chat, prompt, cached)
+            trace.finish("cache")
+            yield cached
+        else:
+            trace.finish("error", e)
+            yield ErrorAnswer(e)
+        return
+    except Exception as e:
+        if single_flight is None:
+            discard_last_exchange(chat)
+        trace.finish("error", e)
+        yield ErrorAnswer(e)
+        return
+    trace.finish("model" if leader else "shared")
+
+    if not leader:
+        # The starting session's chat recorded the exchange; copy it into this one
+        record_exchange(chat, prompt, "".join(received))
+    elif cacheable and received and not trace.truncated:
+        # An answer cut short by a block is shown once but never served again
+        response_cache.put(personality, prompt, "".join(received))
+
+
+# Function to get AI response
+def get_ai_response(chat, prompt, personality=None, stream=False, route=None, session_id=None, on_queued=None, plan=None):
+    """Get response from the persona's Gemini chat session
+
+    Passing the personality enables the shared response cache and precomputed
+    popular-topic answers for standalone questions.
+    Pass a route from route_prompt if the prompt was already classified.
+    session_id applies that session's rate limits, and on_queued(position, eta)
+    is called while the request waits in the admission queue. plan is the
+    GenerationPlan to use, by default the generation policy's choice for the prompt.
+    With stream=True a generator of text chunks is returned instead of the full text.
+    """
+    chunks = stream_ai_response(chat, prompt, personality, route, session_id, on_queued, plan)
+    if stream:
+        return chunks
+    return "".join(chunks)
+
+
+# Headless engine shared by the Streamlit app and the HTTP API
+class ChatEngine:
+    """Answers chat turns per session, independent of any UI
+
+    Persona models are built once, conversations come from the conversation
+    store (or an in-memory cache without one) and old messages are paged out
+    to the transcript archive after each turn. The client library is only
+    imported and configured when the first model is built, so constructing
+    the engine stays cheap.
+    """
+
+    def __init__(self, api_key=None, model_name=MODEL_NAME, generation_config=GENERATION_CONFIG):
+        if get_model_backend().requires_api_key and not api_key:
+            raise ValueError("GEMINI_API_KEY not found in environment variables!")
+        self.api_key = api_key
+        self.model_name = model_name
+        self.generation_config = generation_config
+        cache = get_conversation_cache()
+        # An empty cache is falsy (it has __len__), so test for None explicitly
+        self.conversations = cache if cache is not None else ConversationCache(None)
+        self._configured = False
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def get_model(self, personality, model_name=None):
+        """The persona's model, or its variant on model_name, built on first use"""
+        key = (personality, model_name or self.model_name)
+        with self._lock:
+            if not self._configured:
+                get_model_backend().configure(self.api_key)
+                self._configured = True
+            model = self._models.get(key)
+            if model is None:
+                model = self._models[key] = build_model(personality, key[1], self.generation_config)
+            return model
+
+    def get_conversation(self, session_id):
+        """A session's conversation, rehydrated from the store if it was evicted"""
+        archive = get_transcript_archive()
+        archived_count = archive.count(session_id) if archive is not None else 0
+        return self.conversations.get(session_id, archived_count)
+
+    def get_chat_session(self, conversation, personality, model_name=None):
+        """Reuse the conversation's Gemini chat, switching its model when the personality or model changes"""
+        model = self.get_model(personality, model_name)
+        if conversation.chat is None:
+            # Seed the new session from the visible transcript once; later turns are appended incrementally
+            conversation.chat = start_chat(model, conversation.messages)
+        elif conversation.chat_personality != personality or conversation.chat.model.model_name != model.model_name:
+            # Keep the windowed history and summary, only the system instruction or model changes
+            conversation.chat.model = model
+        else:
+            refresh_chat_model(conversation.chat, personality)
+        conversation.chat_personality = personality
+        return conversation.chat
+
+    def page_out(self, conversation):
+        """Move messages beyond the in-memory limit into the session's transcript archive"""
+        archive = get_transcript_archive()
+        if archive is not None:
+            count = len(conversation.messages)
+            conversation.messages = archive.page_out(conversation.session_id, conversation.messages)
+            conversation.archived_count += count - len(conversation.messages)
+
+    def load_messages(self, conversation, start=0, stop=None):
+        """Messages at absolute positions [start, stop) as dicts, reading paged-out ones from disk"""
+        archived = conversation.archived_count
+        if stop is None:
+            stop = archived + len(conversation.messages)
+        messages = []
+        if start < archived:
+            messages = get_transcript_archive().load(conversation.session_id, start, min(stop, archived))
+        return messages + [dict(message) for message in conversation.messages[max(0, start - archived):max(0, stop - archived)]]
+
+    def clear(self, conversation):
+        """Reset the conversation, its chat session and its paged-out transcript"""
+        with conversation.lock:
+            conversation.clear()
+            if get_transcript_archive() is not None:
+                get_transcript_archive().delete(conversation.session_id)
+
+    def stream_turn(self, conversation, prompt, personality=DEFAULT_PERSONA, route=None, on_queued=None, raise_errors=False):
+        """Yield the answer to prompt in text chunks, recording both messages in the conversation
+
+        Turns on one conversation are serialized; a "clear" command resets it
+        instead. A turn the caller stops reading early is forgotten. on_queued
+        is passed on to get_ai_response. A failed turn answers with an
+        ErrorAnswer, or with raise_errors forgets the turn and raises the error.
+        """
+        route = route or route_prompt(prompt)
+        with conversation.lock:
+            if route.intent == "clear":
+                self.clear(conversation)
+                yield route.answer
+                return
+            # The plan may pick a lighter model, so make it before getting the chat session
+            plan = get_generation_policy().plan(prompt, route, personality, self.model_name)
+            # Get the chat session before the new message is added to the transcript
+            chat = self.get_chat_session(conversation, personality, plan.model_name)
+            conversation.add("user", prompt)
+            answer = get_ai_response(chat, prompt, personality, stream=True, route=route,
+                                     session_id=conversation.session_id, on_queued=on_queued, plan=plan)
+            chunks = []
+            try:
+                for text in answer:
+                    if raise_errors and isinstance(text, ErrorAnswer):
+                        answer.close()
+                        conversation.pop()
+                        raise text.error
+                    chunks.append(text)
+                    yield text
+            except GeneratorExit:
+                answer.close()
+                conversation.pop()
+                raise
+            conversation.add("assistant", "".join(chunks))
+            self.page_out(conversation)
+
+    def reply(self, conversation, prompt, personality=DEFAULT_PERSONA, route=None, on_queued=None, raise_errors=False):
+        """The whole answer to prompt, recorded in the conversation"""
+        return "".join(self.stream_turn(conversation, prompt, personality, route, on_queued, raise_errors))
+
+
+# Process-wide chat engine, configured from the environment
+_chat_engine = None
+_chat_engine_lock = threading.Lock()
+
+
+def get_chat_engine():
+    """Get the shared chat engine, configured with GEMINI_API_KEY"""
+    global _chat_engine
+    with _chat_engine_lock:
+        if _chat_engine is None:
+            _chat_engine = ChatEngine(os.getenv("GEMINI_API_KEY"))
+        return _chat_engine
@@ -0,0 +1,35 @@
+from functools import lru_cache
+
+# Headings used when earlier messages are collapsed into a single markdown block
+ROLE_LABELS = {
+    "user": "🧑 **You**",
+    "assistant": "👑 **Clash Royale AI**",
+}
+
+
+def page_bounds(hidden_count, pages_loaded, page_size):
+    """Absolute [start, stop) range of earlier messages to show, aligned to whole pages"""
+    if pages_loaded <= 0:
+        return hidden_count, hidden_count
+    start = max(0, hidden_count - pages_loaded * page_size)
+    return start // page_size * page_size, hidden_count
+
+
+def split_pages(messages, first_index, page_size):
+    """Split earlier messages into pages aligned to absolute message positions"""
+    pages = []
+    index = first_index
+    while index - first_index < len(messages):
+        page_end = (index // page_size + 1) * page_size
+        pages.append(tuple(
+            (message["role"], message["content"])
+            for message in messages[index - first_index:page_end - first_index]
+        ))
+        index = page_end
+    return pages
+
+
+@lru_cache(maxsize=512)
+def page_markdown(page):
+    """Markdown for a page of earlier (role, content) pairs, built once per page and reused across reruns"""
+    return "\n\n---\n\n".join(f"{ROLE_LABELS.get(role, role)}\n\n{content}" for role, content in page)
@@ -0,0 +1,104 @@
+import os
+import threading
+import time
+from personas import get_system_prompt
+from lazy_imports import lazy_import
+from model_backend import get_model_backend
+
+# Imported on first use, see lazy_imports
+genai = lazy_import("google.generativeai")
+
+# Default lifetime of a cached persona prompt and how early to extend it
+DEFAULT_TTL_SECONDS = 3600
+REFRESH_MARGIN_SECONDS = 300
+
+
+class CachedPrompt:
+    """A persona's cached-content object and when it expires"""
+
+    def __init__(self, cached_content, expires_at):
+        self.cached_content = cached_content
+        self.expires_at = expires_at
+
+    @property
+    def name(self):
+        return self.cached_content.name
+
+
+class ContextCache:
+    """Uploads each persona's system prompt once as cached content and keeps it alive
+
+    client is anything with the genai.caching.CachedContent interface: a create()
+    classmethod returning objects with name and model attributes, update(ttl=...)
+    and delete().
+    A FakeCacheService (fake_model) can be passed in to exercise the cache
+    without network access; the fake backend does this.
+    """
+
+    def __init__(self, client=None, ttl=DEFAULT_TTL_SECONDS, refresh_margin=REFRESH_MARGIN_SECONDS, clock=time.time):
+        self.client = client or genai.caching.CachedContent
+        self.ttl = ttl
+        self.refresh_margin = min(refresh_margin, ttl / 2)
+        self.clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, personality, model_name):
+        """Return the live cached content for a persona, creating or extending it as needed"""
+        if "/" not in model_name:
+            model_name = "models/" + model_name
+        key = (personality, model_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            now = self.clock()
+            if entry is None or entry.expires_at <= now:
+                entry = self._create(personality, model_name, now)
+                self._entries[key] = entry
+            elif entry.expires_at - now <= self.refresh_margin:
+                entry = self._refresh(entry, personality, model_name, now)
+                self._entries[key] = entry
+            return entry.cached_content
+
+    def clear(self):
+        """Delete every cached persona prompt"""
+        with self._lock:
+            entries, self._entries = list(self._entries.values()), {}
+        for entry in entries:
+            try:
+                entry.cached_content.delete()
+            except Exception:
+                pass
+
+    def _create(self, personality, model_name, now):
+        cached_content = self.client.create(
+            model=model_name,
+            display_name=f"clash-royale-{personality.lower()}",
+            system_instruction=get_system_prompt(personality),
+            ttl=self.ttl,
+        )
+        return CachedPrompt(cached_content, now + self.ttl)
+
+    def _refresh(self, entry, personality, model_name, now):
+        # Extend the TTL in place; if the cache is gone upstream, upload it again
+        try:
+            entry.cached_content.update(ttl=self.ttl)
+            return CachedPrompt(entry.cached_content, now + self.ttl)
+        except Exception:
+            return self._create(personality, model_name, now)
+
+
+# Process-wide context cache, created on first use when enabled
+_context_cache = None
+_context_cache_lock = threading.Lock()
+
+
+def get_context_cache():
+    """Get the shared context cache, or None when GEMINI_CONTEXT_CACHE is not enabled"""
+    global _context_cache
+    if os.getenv("GEMINI_CONTEXT_CACHE", "false").lower() not in ("1", "true", "yes"):
+        return None
+    with _context_cache_lock:
+        if _context_cache is None:
+            ttl = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", DEFAULT_TTL_SECONDS))
+            _context_cache = ContextCache(client=get_model_backend().cache_client(), ttl=ttl)
+        return _context_cache
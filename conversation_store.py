@@ -0,0 +1,268 @@
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from message_store import Message, as_message, compress_older, visible_window
+
+# Store settings used unless overridden in the environment
+DEFAULT_DB_PATH = "conversations.db"
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_FLUSH_INTERVAL = 0.5
+DEFAULT_IDLE_SECONDS = 900
+DEFAULT_SWEEP_INTERVAL = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (session_id, position)
+) WITHOUT ROWID
+"""
+
+# Statements run by the writer thread for each kind of queued write
+WRITE_STATEMENTS = {
+    "append": "INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?)",
+    "delete": "DELETE FROM messages WHERE session_id = ?",
+    "truncate": "DELETE FROM messages WHERE session_id = ? AND position >= ?",
+}
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationStore:
+    """Persists chat messages per session in SQLite (WAL mode)
+
+    Writes are queued and committed by a background thread in batches, so
+    appending a message never waits on the disk. Reads use their own
+    connection and see everything committed so far; call flush() first to
+    include writes still in the queue, or flush(session_id) to wait only for
+    that session's.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.batches_written = 0
+        self._writes = queue.Queue()
+        # Queued but uncommitted writes per session
+        self._pending = {}
+        self._pending_changed = threading.Condition()
+        with self.connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(SCHEMA)
+        threading.Thread(target=self._write_forever, name="conversation-writer", daemon=True).start()
+
+    def connect(self):
+        connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def append(self, session_id, position, message):
+        """Queue a message for writing at an absolute position in the session"""
+        self._queue("append", (session_id, position, message["role"], message["content"], time.time()))
+
+    def delete(self, session_id):
+        """Queue removal of all of a session's messages"""
+        self._queue("delete", (session_id,))
+
+    def truncate(self, session_id, position):
+        """Queue removal of a session's messages from position on"""
+        self._queue("truncate", (session_id, position))
+
+    def _queue(self, operation, params):
+        with self._pending_changed:
+            self._pending[params[0]] = self._pending.get(params[0], 0) + 1
+        self._writes.put((operation, params))
+
+    def flush(self, session_id=None):
+        """Wait until every queued write, or every queued write for session_id, has been committed"""
+        if session_id is None:
+            self._writes.join()
+            return
+        with self._pending_changed:
+            self._pending_changed.wait_for(lambda: session_id not in self._pending)
+
+    def count(self, session_id):
+        """Number of stored messages for a session"""
+        with self.connect() as connection:
+            return connection.execute("SELECT COUNT(*) FROM messages WHERE session_id = ?", (session_id,)).fetchone()[0]
+
+    def load(self, session_id, start=0, stop=None):
+        """Stored messages at positions [start, stop) of a session, oldest first"""
+        with self.connect() as connection:
+            rows = connection.execute(
+                "SELECT role, content FROM messages WHERE session_id = ? AND position >= ? AND position < ? ORDER BY position",
+                (session_id, start, stop if stop is not None else 2 ** 62),
+            ).fetchall()
+        return [{"role": role, "content": content} for role, content in rows]
+
+    def _next_batch(self):
+        """Block for the first write, then gather more until the batch is full or flush_interval passes"""
+        batch = [self._writes.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._writes.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_forever(self):
+        connection = self.connect()
+        while True:
+            batch = self._next_batch()
+            try:
+                with connection:
+                    for operation, params in batch:
+                        connection.execute(WRITE_STATEMENTS[operation], params)
+                self.batches_written += 1
+            except sqlite3.Error:
+                logger.exception("Failed to write %d conversation updates", len(batch))
+            finally:
+                with self._pending_changed:
+                    for _, params in batch:
+                        self._pending[params[0]] -= 1
+                        if not self._pending[params[0]]:
+                            del self._pending[params[0]]
+                    self._pending_changed.notify_all()
+                for _ in batch:
+                    self._writes.task_done()
+
+
+class Conversation:
+    """One session's messages and Gemini chat session
+
+    messages holds the in-memory tail of the conversation as Message
+    records; the first archived_count messages were paged out to the
+    transcript archive. Answers older than the visible window are kept
+    compressed.
+    """
+
+    __slots__ = ("session_id", "messages", "archived_count", "chat", "chat_personality", "store", "last_used", "lock")
+
+    def __init__(self, session_id, messages=None, archived_count=0, store=None):
+        self.session_id = session_id
+        self.messages = [as_message(message) for message in messages] if messages else []
+        compress_older(self.messages)
+        self.archived_count = archived_count
+        self.chat = None
+        self.chat_personality = None
+        self.store = store
+        self.last_used = time.monotonic()
+        # Held for a whole turn so concurrent requests for one session don't interleave
+        self.lock = threading.RLock()
+
+    def add(self, role, content):
+        """Append a message, persisting it in the background when there is a store"""
+        message = Message(role, content)
+        if self.store is not None:
+            self.store.append(self.session_id, self.archived_count + len(self.messages), message)
+        self.messages.append(message)
+        # The message that just scrolled out of view is only read again to start a chat or page back
+        window = visible_window()
+        if 0 < window < len(self.messages):
+            self.messages[-window - 1].compress()
+
+    def pop(self):
+        """Remove and return the last message, e.g. the question of an abandoned turn"""
+        message = self.messages.pop()
+        if self.store is not None:
+            self.store.truncate(self.session_id, self.archived_count + len(self.messages))
+        return message
+
+    def clear(self):
+        """Forget every message and the chat session"""
+        self.messages = []
+        self.archived_count = 0
+        self.chat = None
+        self.chat_personality = None
+        if self.store is not None:
+            self.store.delete(self.session_id)
+
+
+class ConversationCache:
+    """Keeps active conversations in memory, evicting idle ones and rehydrating them from the store on next use
+
+    Without a store, evicted conversations are simply forgotten.
+    """
+
+    def __init__(self, store, idle_seconds=DEFAULT_IDLE_SECONDS, sweep_interval=DEFAULT_SWEEP_INTERVAL, clock=time.monotonic):
+        self.store = store
+        self.idle_seconds = idle_seconds
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        self.evictions = 0
+        self.rehydrations = 0
+        self._conversations = {}
+        self._last_sweep = clock()
+        self._lock = threading.Lock()
+
+    def get(self, session_id, archived_count=0):
+        """A session's conversation, loading messages after archived_count from the store if it isn't in memory"""
+        now = self.clock()
+        with self._lock:
+            conversation = self._conversations.get(session_id)
+            if now - self._last_sweep >= self.sweep_interval:
+                self._evict_idle(now)
+        if conversation is None:
+            messages = []
+            if self.store is not None:
+                # Include this session's writes from before an eviction that may still be queued
+                self.store.flush(session_id)
+                messages = self.store.load(session_id, archived_count)
+            conversation = Conversation(session_id, messages, archived_count, self.store)
+            with self._lock:
+                conversation = self._conversations.setdefault(session_id, conversation)
+                if messages:
+                    self.rehydrations += 1
+        conversation.last_used = now
+        return conversation
+
+    def evict_idle(self):
+        """Drop conversations unused for idle_seconds; returns how many were evicted"""
+        with self._lock:
+            return self._evict_idle(self.clock())
+
+    def _evict_idle(self, now):
+        self._last_sweep = now
+        idle = [key for key, conversation in self._conversations.items() if now - conversation.last_used >= self.idle_seconds]
+        for key in idle:
+            del self._conversations[key]
+        self.evictions += len(idle)
+        return len(idle)
+
+    def __len__(self):
+        return len(self._conversations)
+
+
+# Process-wide store and conversation cache, configured from the environment
+_conversation_cache = None
+_conversation_cache_lock = threading.Lock()
+
+
+def get_conversation_cache():
+    """Get the shared conversation cache, or None when CONVERSATION_STORE is "none" """
+    global _conversation_cache
+    if os.getenv("CONVERSATION_STORE", "sqlite").lower() in ("none", "memory", "false"):
+        return None
+    with _conversation_cache_lock:
+        if _conversation_cache is None:
+            store = ConversationStore(
+                os.getenv("CONVERSATION_DB", DEFAULT_DB_PATH),
+                batch_size=int(os.getenv("CONVERSATION_BATCH_SIZE", DEFAULT_BATCH_SIZE)),
+                flush_interval=float(os.getenv("CONVERSATION_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL)),
+            )
+            _conversation_cache = ConversationCache(
+                store,
+                idle_seconds=float(os.getenv("SESSION_IDLE_SECONDS", DEFAULT_IDLE_SECONDS)),
+            )
+        return _conversation_cache
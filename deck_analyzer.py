@@ -0,0 +1,148 @@
+import re
+from card_db import (
+    AIR_DEFENSE, BIG_SPELL, SMALL_SPELL, SPLASH, TANK, WIN_CONDITION,
+    find_cards, strip_cards,
+)
+
+DECK_SIZE = 8
+
+# Words that mark a question about deck stats rather than open-ended advice,
+# matched whole outside card names ("rate" in "strategy", "elixir" in "Elixir Golem")
+DECK_STAT_PATTERN = re.compile(
+    r"\b(average|avg|elixir|cycle|analy[sz]e|analysis|rate|rating|missing|archetype|stats|what kind|what type|check|review)\b"
+)
+# Words that ask for advice or a matchup verdict about the deck, which only the model can give
+# ("how much" still asks for a stat)
+DECK_ADVICE_PATTERN = re.compile(
+    r"\b(replac\w*|swap\w*|substitut\w*|strateg\w*|play\w*|improv\w*|better|instead"
+    r"|good|bad|vs|versus|against|why|how(?! much)|should|counter\w*)\b"
+)
+
+# Win conditions that decide the archetype, checked in order
+ARCHETYPE_WIN_CONDITIONS = (
+    ("Siege", {"X-Bow", "Mortar"}),
+    ("Bait", {"Goblin Barrel", "Goblin Drill", "Skeleton Barrel"}),
+    ("Beatdown", {"Golem", "Lava Hound", "Giant", "Electro Giant", "Goblin Giant", "Royal Giant", "Elixir Golem", "Three Musketeers"}),
+    ("Bridge Spam", {"Battle Ram", "Ram Rider"}),
+)
+
+# Average elixir bands from the deck building guidelines
+ELIXIR_BANDS = (
+    (2.6, "Ultra-fast cycle"),
+    (3.3, "Fast cycle"),
+    (3.9, "Balanced"),
+    (4.6, "Beatdown"),
+)
+
+
+class DeckAnalysis:
+    """Computed stats for an 8-card deck"""
+
+    __slots__ = ("cards", "average_elixir", "cycle_cost", "cycle_cards", "archetype", "win_conditions", "missing", "warnings")
+
+    def __init__(self, cards):
+        self.cards = cards
+        self.average_elixir = sum(card.elixir for card in cards) / len(cards)
+        self.cycle_cards = sorted(cards, key=lambda card: card.elixir)[:4]
+        self.cycle_cost = sum(card.elixir for card in self.cycle_cards)
+        self.win_conditions = [card for card in cards if card.has(WIN_CONDITION)]
+        self.archetype = classify_archetype(cards, self.win_conditions, self.average_elixir)
+        self.missing, self.warnings = find_missing_roles(cards)
+
+
+def elixir_band(average):
+    """Name of the elixir band an average falls in"""
+    for limit, label in ELIXIR_BANDS:
+        if round(average, 1) < limit:
+            return label
+    return "Very heavy"
+
+
+def classify_archetype(cards, win_conditions, average):
+    """Classify a deck from its win conditions and average elixir"""
+    names = {card.name for card in cards}
+    for archetype, win_names in ARCHETYPE_WIN_CONDITIONS:
+        if names & win_names:
+            return archetype
+    if not win_conditions:
+        return "Unclear (no win condition)"
+    if {"Graveyard", "Miner"} & names and "Poison" in names and average >= 3.3:
+        return "Control"
+    if round(average, 1) <= 3.2:
+        return "Cycle"
+    return "Control"
+
+
+def find_missing_roles(cards):
+    """Roles from the deck building checklist that the deck lacks or is thin on"""
+    def count(role):
+        return sum(1 for card in cards if card.has(role))
+
+    missing, warnings = [], []
+    if not count(WIN_CONDITION):
+        missing.append("Win condition")
+    air = count(AIR_DEFENSE)
+    if not air:
+        missing.append("Air defense")
+    elif air == 1:
+        warnings.append("Only one air defender, so Balloon and Lava Hound will be hard to stop")
+    if not count(SMALL_SPELL):
+        missing.append("Small spell (Log, Zap, Arrows, Snowball)")
+    if not count(BIG_SPELL):
+        missing.append("Medium/heavy spell (Fireball, Poison, Rocket, Lightning)")
+    if not count(SPLASH):
+        warnings.append("No splash troop; swarms like Skeleton Army rely on your spells")
+    if not any(card.kind == "building" for card in cards):
+        warnings.append("No defensive building (optional, but it helps pull Hog Rider, Giant and Royal Giant)")
+    if not count(TANK) and not any(card.kind == "building" for card in cards):
+        warnings.append("No tank or mini-tank to lead pushes or soak damage")
+    return missing, warnings
+
+
+def analyze_deck(cards):
+    """Analyze a list of 8 cards"""
+    if len(cards) != DECK_SIZE:
+        raise ValueError(f"A deck needs exactly {DECK_SIZE} cards, got {len(cards)}")
+    return DeckAnalysis(cards)
+
+
+def format_analysis(analysis):
+    """Markdown summary of a deck analysis"""
+    names = ", ".join(f"{card.name} ({card.elixir})" for card in analysis.cards)
+    cycle = ", ".join(card.name for card in analysis.cycle_cards)
+    wins = ", ".join(card.name for card in analysis.win_conditions) or "none"
+    lines = [
+        f"**Deck analysis:** {names}",
+        "",
+        f"- ⚗️ **Average elixir:** {analysis.average_elixir:.1f} ({elixir_band(analysis.average_elixir)})",
+        f"- 🔄 **4-card cycle:** {analysis.cycle_cost} elixir ({cycle})",
+        f"- 🏷️ **Archetype:** {analysis.archetype} (win condition: {wins})",
+    ]
+    if analysis.missing:
+        lines.append(f"- ⚠️ **Missing:** {'; '.join(analysis.missing)}")
+    else:
+        lines.append("- ✅ **Core roles covered:** win condition, air defense, small spell and big spell")
+    for warning in analysis.warnings:
+        lines.append(f"- 💡 {warning}")
+    return "\n".join(lines)
+
+
+def is_deck_stat_question(text, cards):
+    """Check whether text is a pasted deck asking for stats rather than open-ended advice"""
+    if len(cards) != DECK_SIZE:
+        return False
+    remainder = strip_cards(text)
+    if DECK_ADVICE_PATTERN.search(remainder):
+        return False
+    if DECK_STAT_PATTERN.search(remainder):
+        return True
+    # A bare list of cards with little else around it
+    return len(re.findall(r"[a-z]{3,}", remainder)) <= 4
+
+
+def answer_deck_question(text):
+    """Answer a deck-stats question locally, or return None if it needs the model"""
+    cards = find_cards(text)
+    if not is_deck_stat_question(text, cards):
+        return None
+    return format_analysis(analyze_deck(cards))
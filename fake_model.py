@@ -0,0 +1,233 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import NamedTuple
+from google.api_core import exceptions as api_exceptions
+from google.generativeai import protos
+
+# Words the fake answers are made of
+FILLER_WORDS = (
+    "Hog", "Rider", "cycle", "elixir", "counter", "push", "defend", "Log", "Fireball", "tower",
+    "bridge", "tank", "support", "splash", "swarm", "trade", "positive", "lane", "king", "princess",
+)
+
+
+class FakeModelConfig(NamedTuple):
+    """How the fake model behaves; rates are probabilities per request"""
+    ttft: float = 0.3
+    tokens_per_second: float = 80.0
+    response_tokens: int = 120
+    chunk_tokens: int = 8
+    block_rate: float = 0.0
+    error_rate: float = 0.0
+    seed: int = 0
+
+
+def fake_config_from_env():
+    """Fake model settings from FAKE_MODEL_* environment variables"""
+    defaults = FakeModelConfig()
+    return FakeModelConfig(
+        ttft=float(os.getenv("FAKE_MODEL_TTFT", defaults.ttft)),
+        tokens_per_second=float(os.getenv("FAKE_MODEL_TOKENS_PER_SECOND", defaults.tokens_per_second)),
+        response_tokens=int(os.getenv("FAKE_MODEL_RESPONSE_TOKENS", defaults.response_tokens)),
+        chunk_tokens=int(os.getenv("FAKE_MODEL_CHUNK_TOKENS", defaults.chunk_tokens)),
+        block_rate=float(os.getenv("FAKE_MODEL_BLOCK_RATE", defaults.block_rate)),
+        error_rate=float(os.getenv("FAKE_MODEL_ERROR_RATE", defaults.error_rate)),
+        seed=int(os.getenv("FAKE_MODEL_SEED", defaults.seed)),
+    )
+
+
+def request_text(request):
+    """Text of the last user turn in a GenerateContentRequest"""
+    if not request.contents:
+        return ""
+    return " ".join(part.text for part in request.contents[-1].parts if part.text)
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token)"""
+    return len(text) // 4 + 1
+
+
+def prompt_tokens(request):
+    """Estimated input tokens of a request, system instruction and history included"""
+    contents = list(request.contents) + [request.system_instruction]
+    return sum(estimate_tokens(part.text) for content in contents for part in content.parts)
+
+
+def output_limit(request):
+    """The request's max_output_tokens, or no limit when it doesn't set one"""
+    return request.generation_config.max_output_tokens or float("inf")
+
+
+class FakeClient:
+    """Stands in for the generative service client, answering every request locally
+
+    Each request waits ttft seconds, then streams response_tokens words in
+    chunk_tokens-sized chunks at tokens_per_second, cut short with a
+    MAX_TOKENS finish reason if the request allows fewer. A block_rate share of
+    requests end with a SAFETY-blocked candidate, and an error_rate share
+    fail with ServiceUnavailable before the first chunk.
+    """
+
+    def __init__(self, config=FakeModelConfig()):
+        self.config = config
+        self.requests = 0
+        self._random = random.Random(config.seed)
+        self._lock = threading.Lock()
+
+    def plan(self, request):
+        """Decide the outcome of a request: (answer words, blocked), or raise its simulated error"""
+        with self._lock:
+            self.requests += 1
+            roll = self._random.random()
+            words = [self._random.choice(FILLER_WORDS) for _ in range(min(self.config.response_tokens, output_limit(request)))]
+        if roll < self.config.error_rate:
+            raise api_exceptions.ServiceUnavailable("Fake model is overloaded")
+        blocked = roll < self.config.error_rate + self.config.block_rate
+        question = request_text(request)
+        return [f"Fake answer to: {question}\n\n"] + [f"{word} " for word in words], blocked
+
+    def finish_reason(self, request):
+        """MAX_TOKENS if the answer doesn't fit the request's output limit, otherwise STOP"""
+        if output_limit(request) < self.config.response_tokens:
+            return protos.Candidate.FinishReason.MAX_TOKENS
+        return protos.Candidate.FinishReason.STOP
+
+    def chunks(self, request, words, blocked):
+        """GenerateContentResponse chunks and the delay before each one"""
+        size = max(1, self.config.chunk_tokens)
+        delay = size / self.config.tokens_per_second if self.config.tokens_per_second else 0
+        input_tokens = prompt_tokens(request)
+        stop = self.finish_reason(request)
+        if blocked:
+            yield self.config.ttft, make_response("", protos.Candidate.FinishReason.SAFETY, input_tokens, 0)
+            return
+        for start in range(0, len(words), size):
+            last = start + size >= len(words)
+            finish = stop if last else protos.Candidate.FinishReason.FINISH_REASON_UNSPECIFIED
+            wait = self.config.ttft if start == 0 else delay
+            yield wait, make_response("".join(words[start:start + size]), finish, input_tokens, min(start + size, len(words)))
+
+    def whole(self, request, words, blocked):
+        """A non-streamed response and the total time it takes"""
+        total = sum(wait for wait, _ in self.chunks(request, words, blocked))
+        finish = protos.Candidate.FinishReason.SAFETY if blocked else self.finish_reason(request)
+        text = "" if blocked else "".join(words)
+        return total, make_response(text, finish, prompt_tokens(request), 0 if blocked else len(words))
+
+    def generate_content(self, request, **kwargs):
+        wait, response = self.whole(request, *self.plan(request))
+        time.sleep(wait)
+        return response
+
+    def stream_generate_content(self, request, **kwargs):
+        words, blocked = self.plan(request)
+
+        def stream():
+            for wait, response in self.chunks(request, words, blocked):
+                time.sleep(wait)
+                yield response
+
+        return stream()
+
+
+class FakeCachedContent:
+    """Stands in for a genai.caching.CachedContent kept by a FakeCacheService"""
+
+    def __init__(self, service, name, model, display_name, system_instruction):
+        self.service = service
+        self.name = name
+        self.model = model
+        self.display_name = display_name
+        self.system_instruction = system_instruction
+
+    def update(self, ttl=None):
+        self.service.update(self.name, ttl)
+
+    def delete(self):
+        self.service.delete(self.name)
+
+
+class FakeCacheService:
+    """Stands in for the cached-content API, with contents that expire on clock
+
+    create() has the signature of genai.caching.CachedContent.create, so this
+    can be passed to ContextCache as its client. Updating or deleting content
+    that has expired or was deleted raises NotFound, like the live API.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.created = 0
+        self.updated = 0
+        self._expires_at = {}
+        self._lock = threading.Lock()
+
+    def create(self, model, *, display_name=None, system_instruction=None, ttl=3600):
+        with self._lock:
+            self.created += 1
+            name = f"cachedContents/fake-{self.created}"
+            self._expires_at[name] = self.clock() + ttl
+        return FakeCachedContent(self, name, model, display_name, system_instruction)
+
+    def update(self, name, ttl):
+        with self._lock:
+            self._check(name)
+            self.updated += 1
+            self._expires_at[name] = self.clock() + ttl
+
+    def delete(self, name):
+        with self._lock:
+            self._check(name)
+            del self._expires_at[name]
+
+    def live(self):
+        """Names of the contents that have not expired or been deleted"""
+        with self._lock:
+            return [name for name, expires_at in self._expires_at.items() if expires_at > self.clock()]
+
+    def _check(self, name):
+        if self._expires_at.get(name, 0) <= self.clock():
+            self._expires_at.pop(name, None)
+            raise api_exceptions.NotFound(f"{name} not found")
+
+
+class FakeAsyncClient:
+    """Async counterpart of FakeClient, sharing its settings and request count"""
+
+    def __init__(self, client):
+        self.client = client
+
+    async def generate_content(self, request, **kwargs):
+        wait, response = self.client.whole(request, *self.client.plan(request))
+        await asyncio.sleep(wait)
+        return response
+
+    async def stream_generate_content(self, request, **kwargs):
+        words, blocked = self.client.plan(request)
+
+        async def stream():
+            for wait, response in self.client.chunks(request, words, blocked):
+                await asyncio.sleep(wait)
+                yield response
+
+        return stream()
+
+
+def make_response(text, finish_reason, input_tokens, output_tokens):
+    """A GenerateContentResponse with one candidate and usage metadata"""
+    parts = [protos.Part(text=text)] if text else []
+    return protos.GenerateContentResponse(
+        candidates=[protos.Candidate(
+            content=protos.Content(role="model", parts=parts),
+            finish_reason=finish_reason,
+        )],
+        usage_metadata=protos.GenerateContentResponse.UsageMetadata(
+            prompt_token_count=input_tokens,
+            candidates_token_count=output_tokens,
+            total_token_count=input_tokens + output_tokens,
+        ),
+    )
@@ -0,0 +1,184 @@
+import math
+import os
+import re
+import threading
+from collections import deque
+from typing import NamedTuple, Optional
+from intent_router import INTENT_PROFILES
+from metrics import OUTPUT_TOKENS, TRUNCATED
+
+# Output budget bounds; the upper one matches the models' generation config
+MIN_OUTPUT_TOKENS = 256
+MAX_OUTPUT_TOKENS = 2048
+# Caps are rounded up to a multiple of this, so the report groups similar requests
+TOKEN_STEP = 64
+
+# Questions this short get half their intent's budget unless they ask for depth
+SHORT_QUESTION_WORDS = 8
+LONG_ANSWER_PATTERN = re.compile(r"\b(guide|full|detailed|in depth|in-depth|step by step|explain|everything|complete|walk me through)\b", re.IGNORECASE)
+
+# How long each persona's answers tend to run, relative to the intent's budget
+PERSONA_TOKEN_SCALE = {
+    "Professional": 1.25,
+    "Humorous": 0.75,
+}
+
+# Models that spend part of max_output_tokens on thinking, which google-generativeai
+# 0.8.6 can't turn off or budget (no thinking_config); smaller caps often come back
+# empty or cut off, so budgets for these models never go below the floor
+THINKING_MODEL_PATTERN = re.compile(r"gemini-2\.5-(pro|flash)(?!-lite)")
+THINKING_MIN_OUTPUT_TOKENS = 1024
+
+# Short answers end before the sign-off; the model treats these as hard stops
+SHORT_ANSWER_MAX_TOKENS = 512
+SHORT_ANSWER_STOP_SEQUENCES = ("\n\nLet me know", "\n\nWant me to", "\n\nWould you like")
+
+# Realized output tokens kept per intent for the tuning report
+USAGE_WINDOW = 500
+
+
+class GenerationPlan(NamedTuple):
+    """How one request is sent to the model"""
+    intent: str
+    max_output_tokens: int
+    top_k: int
+    stop_sequences: tuple = ()
+    model_name: Optional[str] = None
+
+    @property
+    def generation_config(self):
+        """Per-request overrides of the model's generation config"""
+        config = {"max_output_tokens": self.max_output_tokens}
+        if self.stop_sequences:
+            config["stop_sequences"] = list(self.stop_sequences)
+        return config
+
+
+class IntentUsage:
+    """Recent output token counts and truncations for one intent"""
+
+    def __init__(self, window=USAGE_WINDOW):
+        self.requests = 0
+        self.truncated = 0
+        self.output_tokens = deque(maxlen=window)
+        self.caps = deque(maxlen=window)
+
+    def report(self):
+        tokens = sorted(self.output_tokens)
+        p95 = tokens[min(len(tokens) - 1, math.ceil(len(tokens) * 0.95) - 1)] if tokens else 0
+        truncated_share = self.truncated / self.requests if self.requests else 0.0
+        # Enough room for nearly every answer, or more room if answers are being cut off
+        suggested = round_tokens(max(self.caps) * 1.5) if truncated_share > 0.05 else round_tokens(p95 * 1.25)
+        return {
+            "requests": self.requests,
+            "mean_output_tokens": round(sum(tokens) / len(tokens)) if tokens else 0,
+            "p95_output_tokens": p95,
+            "mean_cap": round(sum(self.caps) / len(self.caps)) if self.caps else 0,
+            "truncated_share": round(truncated_share, 3),
+            "suggested_cap": suggested,
+        }
+
+
+# Round a token budget to the policy's step and bounds
+def round_tokens(tokens):
+    """tokens rounded up to TOKEN_STEP, within MIN_OUTPUT_TOKENS and MAX_OUTPUT_TOKENS"""
+    tokens = math.ceil(tokens / TOKEN_STEP) * TOKEN_STEP
+    return max(MIN_OUTPUT_TOKENS, min(MAX_OUTPUT_TOKENS, tokens))
+
+
+class GenerationPolicy:
+    """Picks the output budget, stop sequences and model for each request, and records what was used
+
+    The budget starts from the intent's profile, is halved for short questions
+    and raised to the maximum for ones asking for a guide or a detailed
+    explanation, then scaled by how long the persona's answers run. Short
+    answers get stop sequences that cut off chatty sign-offs, and can go to a
+    lighter model. Budgets below THINKING_MIN_OUTPUT_TOKENS only apply to
+    models that don't think (see is_thinking_model), so in practice they
+    need a non-thinking light model. Realized output tokens, thinking
+    included, are recorded per intent from usage_metadata, and report()
+    suggests caps to tune the profiles with.
+    """
+
+    def __init__(self, light_model=None, light_max_tokens=SHORT_ANSWER_MAX_TOKENS):
+        self.light_model = light_model
+        self.light_max_tokens = light_max_tokens
+        self._usage = {}
+        self._lock = threading.Lock()
+
+    def plan(self, prompt, route, personality=None, model_name=None):
+        """The GenerationPlan for a prompt classified as route, for a request that would otherwise go to model_name"""
+        profile = route.profile
+        tokens = profile.max_output_tokens
+        if LONG_ANSWER_PATTERN.search(prompt):
+            tokens = MAX_OUTPUT_TOKENS
+        elif len(prompt.split()) <= SHORT_QUESTION_WORDS:
+            tokens = tokens / 2
+        tokens = round_tokens(tokens * PERSONA_TOKEN_SCALE.get(personality, 1.0))
+        short = tokens <= SHORT_ANSWER_MAX_TOKENS
+        light_model = self.light_model if self.light_model and tokens <= self.light_max_tokens else None
+        if is_thinking_model(light_model or model_name):
+            tokens = max(tokens, THINKING_MIN_OUTPUT_TOKENS)
+        return GenerationPlan(
+            intent=route.intent,
+            max_output_tokens=tokens,
+            top_k=profile.top_k,
+            stop_sequences=SHORT_ANSWER_STOP_SEQUENCES if short else (),
+            model_name=light_model,
+        )
+
+    def record(self, plan, response):
+        """Record the output tokens and finish reason a response reported for plan"""
+        usage = getattr(response, "usage_metadata", None)
+        if usage is None:
+            return
+        candidates = getattr(response, "candidates", None)
+        truncated = bool(candidates) and candidates[0].finish_reason.name == "MAX_TOKENS"
+        # The library's usage_metadata has no thoughts_token_count, but the total includes thinking
+        output_tokens = max(usage.candidates_token_count, usage.total_token_count - usage.prompt_token_count)
+        OUTPUT_TOKENS.observe(output_tokens, intent=plan.intent)
+        if truncated:
+            TRUNCATED.inc(intent=plan.intent)
+        with self._lock:
+            stats = self._usage.get(plan.intent)
+            if stats is None:
+                stats = self._usage[plan.intent] = IntentUsage()
+            stats.requests += 1
+            stats.truncated += truncated
+            stats.output_tokens.append(output_tokens)
+            stats.caps.append(plan.max_output_tokens)
+
+    def report(self):
+        """Realized output tokens, truncations and a suggested cap per intent"""
+        with self._lock:
+            return {intent: stats.report() for intent, stats in self._usage.items()}
+
+
+# Process-wide policy, configured from the environment
+_generation_policy = None
+_generation_policy_lock = threading.Lock()
+
+
+def get_generation_policy():
+    """Get the shared generation policy, with GENERATION_LIGHT_MODEL for short answers if set"""
+    global _generation_policy
+    with _generation_policy_lock:
+        if _generation_policy is None:
+            _generation_policy = GenerationPolicy(
+                light_model=os.getenv("GENERATION_LIGHT_MODEL") or None,
+                light_max_tokens=int(os.getenv("GENERATION_LIGHT_MAX_TOKENS", SHORT_ANSWER_MAX_TOKENS)),
+            )
+        return _generation_policy
+
+
+# Model names may carry the "models/" prefix; an unknown model is assumed to think, like the default one
+def is_thinking_model(model_name):
+    """Whether model_name counts thinking tokens against max_output_tokens"""
+    return model_name is None or THINKING_MODEL_PATTERN.search(model_name) is not None
+
+
+# Plan for callers that don't size requests by prompt
+def default_plan(intent="general"):
+    """A GenerationPlan with the intent profile's budget and no adjustments"""
+    profile = INTENT_PROFILES.get(intent, INTENT_PROFILES["general"])
+    return GenerationPlan(intent, profile.max_output_tokens, profile.top_k)
@@ -0,0 +1,207 @@
+import json
+import os
+import re
+import threading
+from lazy_imports import lazy_import
+
+# Imported on first use, see lazy_imports
+genai = lazy_import("google.generativeai")
+
+# History limits used unless overridden in the environment
+DEFAULT_MAX_TOKENS = 6000
+DEFAULT_KEEP_TURNS = 6
+DEFAULT_SUMMARY_TOKENS = 600
+DEFAULT_MAX_MESSAGES = 200
+
+# Marks the synthetic exchange that carries the rolling summary
+SUMMARY_PREFIX = "Summary of our conversation so far:\n"
+SUMMARY_ACK = "Got it, I'll keep that context in mind."
+
+# Session IDs name transcript files, so keep them to a safe alphabet
+SESSION_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+def estimate_tokens(text):
+    """Rough token count for budgeting (about four characters per token)"""
+    return len(text) // 4 + 1
+
+
+def valid_session_id(session_id):
+    """Whether session_id is safe to use as a transcript file name"""
+    return isinstance(session_id, str) and SESSION_ID_PATTERN.fullmatch(session_id) is not None
+
+
+def content_text(content):
+    """Join the text parts of a Gemini content entry"""
+    return " ".join(part.text for part in content.parts if part.text)
+
+
+def first_sentence(text, limit=160):
+    """First sentence of a message, shortened for the summary"""
+    text = " ".join(text.split())
+    sentence = re.split(r"(?<=[.!?])\s", text, maxsplit=1)[0]
+    return sentence if len(sentence) <= limit else sentence[:limit - 3] + "..."
+
+
+def summarize_locally(previous_summary, contents, max_tokens=DEFAULT_SUMMARY_TOKENS):
+    """Fold old turns into the summary as one short line each, keeping the newest lines within budget"""
+    lines = previous_summary.splitlines() if previous_summary else []
+    for content in contents:
+        speaker = "User asked" if content.role == "user" else "Assistant answered"
+        lines.append(f"- {speaker}: {first_sentence(content_text(content))}")
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def summarize_with_model(model, previous_summary, contents, max_tokens=DEFAULT_SUMMARY_TOKENS):
+    """Ask the model to merge old turns into the running summary"""
+    transcript = "\n".join(f"{content.role}: {content_text(content)}" for content in contents)
+    prompt = (
+        f"Update this summary of a Clash Royale coaching chat in at most {max_tokens * 3 // 4} words. "
+        f"Keep decks, cards, trophy range and goals the user mentioned.\n\n"
+        f"Current summary:\n{previous_summary or '(none)'}\n\nNew turns:\n{transcript}"
+    )
+    response = model.generate_content(prompt, generation_config={"temperature": 0.2, "max_output_tokens": max_tokens})
+    return response.text.strip()
+
+
+class HistoryManager:
+    """Keeps a chat session's history within a token budget
+
+    Turns beyond the last keep_turns exchanges, or beyond max_tokens, are folded
+    into a rolling summary that rides along as the first exchange of the history.
+    """
+
+    def __init__(self, max_tokens=DEFAULT_MAX_TOKENS, keep_turns=DEFAULT_KEEP_TURNS,
+                 summary_tokens=DEFAULT_SUMMARY_TOKENS, use_model=False):
+        self.max_tokens = max_tokens
+        self.keep_turns = keep_turns
+        self.summary_tokens = summary_tokens
+        self.use_model = use_model
+
+    def split_summary(self, history):
+        """Separate the summary text from the real turns of a history"""
+        if len(history) >= 2 and history[0].role == "user" and content_text(history[0]).startswith(SUMMARY_PREFIX):
+            return content_text(history[0])[len(SUMMARY_PREFIX):], history[2:]
+        return "", history
+
+    def trim(self, chat):
+        """Fold old turns of a chat session into the summary; returns True if anything changed"""
+        summary, turns = self.split_summary(chat.history)
+        tokens = [estimate_tokens(content_text(content)) for content in turns]
+        keep = min(len(turns), self.keep_turns * 2)
+        budget = self.max_tokens - estimate_tokens(summary)
+        if len(turns) <= keep and sum(tokens) <= budget:
+            return False
+
+        # Keep whole exchanges, dropping the oldest until the recent window fits
+        start = len(turns) - keep
+        while start < len(turns) - 2 and sum(tokens[start:]) > self.max_tokens - self.summary_tokens:
+            start += 2
+        folded, recent = turns[:start], turns[start:]
+        if not folded:
+            return False
+
+        summary = self.summarize(chat.model, summary, folded)
+        chat.history = [
+            genai.protos.Content(role="user", parts=[genai.protos.Part(text=SUMMARY_PREFIX + summary)]),
+            genai.protos.Content(role="model", parts=[genai.protos.Part(text=SUMMARY_ACK)]),
+        ] + list(recent)
+        return True
+
+    def summarize(self, model, previous_summary, contents):
+        if self.use_model:
+            try:
+                return summarize_with_model(model, previous_summary, contents, self.summary_tokens)
+            except Exception:
+                pass
+        return summarize_locally(previous_summary, contents, self.summary_tokens)
+
+
+class TranscriptArchive:
+    """Pages old chat messages out of memory into one JSONL file per session"""
+
+    def __init__(self, directory, max_messages=DEFAULT_MAX_MESSAGES):
+        self.directory = directory
+        self.max_messages = max_messages
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, session_id):
+        if not valid_session_id(session_id):
+            raise ValueError(f"Invalid session ID: {session_id!r}")
+        return os.path.join(self.directory, f"{session_id}.jsonl")
+
+    def page_out(self, session_id, messages):
+        """Write messages beyond max_messages to disk and return the ones to keep in memory"""
+        overflow = len(messages) - self.max_messages
+        if overflow <= 0:
+            return messages
+        with open(self.path(session_id), "a", encoding="utf-8") as f:
+            for message in messages[:overflow]:
+                f.write(json.dumps(dict(message), ensure_ascii=False) + "\n")
+        return messages[overflow:]
+
+    def count(self, session_id):
+        """Number of messages paged out for a session"""
+        try:
+            with open(self.path(session_id), encoding="utf-8") as f:
+                return sum(1 for _ in f)
+        except FileNotFoundError:
+            return 0
+
+    def load(self, session_id, start=0, stop=None):
+        """Read paged-out messages for a session, oldest first"""
+        messages = []
+        try:
+            with open(self.path(session_id), encoding="utf-8") as f:
+                for index, line in enumerate(f):
+                    if stop is not None and index >= stop:
+                        break
+                    if index >= start:
+                        messages.append(json.loads(line))
+        except FileNotFoundError:
+            pass
+        return messages
+
+    def delete(self, session_id):
+        """Remove a session's paged-out messages"""
+        try:
+            os.remove(self.path(session_id))
+        except FileNotFoundError:
+            pass
+
+
+# Process-wide history manager and transcript archive, configured from the environment
+_history_manager = None
+_transcript_archive = None
+_history_lock = threading.Lock()
+
+
+def get_history_manager():
+    """Get the shared history manager"""
+    global _history_manager
+    with _history_lock:
+        if _history_manager is None:
+            _history_manager = HistoryManager(
+                max_tokens=int(os.getenv("HISTORY_MAX_TOKENS", DEFAULT_MAX_TOKENS)),
+                keep_turns=int(os.getenv("HISTORY_KEEP_TURNS", DEFAULT_KEEP_TURNS)),
+                summary_tokens=int(os.getenv("HISTORY_SUMMARY_TOKENS", DEFAULT_SUMMARY_TOKENS)),
+                use_model=os.getenv("HISTORY_SUMMARY", "local").lower() == "model",
+            )
+        return _history_manager
+
+
+def get_transcript_archive():
+    """Get the shared transcript archive, or None when TRANSCRIPT_ARCHIVE_DIR is not set"""
+    global _transcript_archive
+    directory = os.getenv("TRANSCRIPT_ARCHIVE_DIR")
+    if not directory:
+        return None
+    with _history_lock:
+        if _transcript_archive is None:
+            _transcript_archive = TranscriptArchive(
+                directory,
+                max_messages=int(os.getenv("TRANSCRIPT_MAX_MESSAGES", DEFAULT_MAX_MESSAGES)),
+            )
+        return _transcript_archive
@@ -0,0 +1,197 @@
+import os
+import re
+import threading
+from collections import Counter
+from typing import NamedTuple, Optional
+from card_db import find_cards, strip_cards
+from deck_analyzer import answer_deck_question
+
+
+class IntentProfile(NamedTuple):
+    """How much output and retrieved knowledge a model intent gets"""
+    max_output_tokens: int
+    top_k: int
+
+
+# Intents that go to the model, sized by how long a good answer usually is
+INTENT_PROFILES = {
+    "card_info": IntentProfile(max_output_tokens=512, top_k=2),
+    "counter": IntentProfile(max_output_tokens=1024, top_k=3),
+    "strategy": IntentProfile(max_output_tokens=1536, top_k=4),
+    "deck_building": IntentProfile(max_output_tokens=2048, top_k=4),
+    "general": IntentProfile(max_output_tokens=2048, top_k=4),
+}
+
+# Keyword rules, checked in order; the first match wins
+GREETING_PATTERN = re.compile(r"^(hi|hello|hey|hiya|howdy|yo|sup|good (morning|afternoon|evening))( there| bot)?[\s!.]*$")
+THANKS_PATTERN = re.compile(r"^(thanks|thank you|thx|ty|cheers|appreciate it|great|cool|ok|okay|nice)( so much| a lot)?[\s!.]*$")
+HELP_PATTERN = re.compile(r"^(/?help|what can you do|what can i ask|how do i use this|\?)[\s?!.]*$")
+CLEAR_PATTERN = re.compile(r"^/?(clear|reset|start over|new chat)( chat| history| the chat)?[\s!.]*$")
+CARD_LOOKUP_PATTERN = re.compile(r"\b(how much (elixir|does)|elixir cost|cost of|how many elixir|what rarity|rarity of|how rare)\b")
+# A card lookup must ask about elixir cost or rarity, and not about upgrades, damage or gold
+CARD_LOOKUP_TOPIC_PATTERN = re.compile(r"\b(elixir|costs?|rare|rarity)\b")
+CARD_LOOKUP_EXCLUDE_PATTERN = re.compile(r"\b(upgrade\w*|level\w*|damage\w*|dps|hit ?points|hp|gold|gems?|coins?|wild cards?|shards?|evolution\w*|evo)\b")
+MODEL_INTENT_PATTERNS = (
+    ("counter", re.compile(r"\b(counter|counters|beat|stop|against|deal with|lose to)\b")),
+    ("deck_building", re.compile(r"\b(deck|decks|build|replace|swap|synergy|synergies|lineup)\b")),
+    ("strategy", re.compile(r"\b(push|trophy|trophies|ladder|strategy|tips?|improve|defend|defense|attack|elixir|tilt)\b")),
+)
+
+GREETING_ANSWER = (
+    "Hey there, challenger! 👑 Ask me about decks, counters, strategies or any card. "
+    "You can also paste your 8 cards and I'll check the deck's stats instantly."
+)
+THANKS_ANSWER = "Happy to help! 🏆 Ask me anything else about Clash Royale whenever you're ready."
+HELP_ANSWER = """Here's what I can help with:
+
+- 🃏 **Decks**: paste 8 cards to get average elixir, cycle cost, archetype and missing roles
+- 🎯 **Counters**: "How do I counter Hog Rider?"
+- 🏰 **Strategy**: pushing trophies, elixir management, defending
+- 💎 **Cards**: "How much elixir does Sparky cost?"
+
+Type **clear** to start a new conversation."""
+CLEAR_ANSWER = "🗑️ Chat cleared."
+
+
+class Route(NamedTuple):
+    """The classified intent of a prompt, with its answer when it can be answered locally"""
+    intent: str
+    answer: Optional[str] = None
+
+    @property
+    def profile(self):
+        return INTENT_PROFILES.get(self.intent, INTENT_PROFILES["general"])
+
+
+def normalize_prompt(text):
+    return " ".join(text.lower().split())
+
+
+def with_article(word):
+    """word preceded by "a" or "an" ("an Epic", "a Legendary")"""
+    return f"{'an' if word[:1].lower() in 'aeiou' else 'a'} {word}"
+
+
+def answer_card_lookup(text, normalized):
+    """Answer "how much elixir is X" style questions from the card database"""
+    if not CARD_LOOKUP_PATTERN.search(normalized) or not CARD_LOOKUP_TOPIC_PATTERN.search(normalized):
+        return None
+    if CARD_LOOKUP_EXCLUDE_PATTERN.search(normalized):
+        return None
+    cards = find_cards(text)
+    if len(cards) != 1 or len(re.findall(r"[a-z]{3,}", strip_cards(text))) > 8:
+        return None
+    card = cards[0]
+    return f"**{card.name}** costs **{card.elixir} elixir**. It's {with_article(card.rarity)} {card.kind}."
+
+
+def classify(text):
+    """Classify a prompt and answer it locally when the intent is trivial or deterministic"""
+    normalized = normalize_prompt(text)
+    if GREETING_PATTERN.match(normalized):
+        return Route("greeting", GREETING_ANSWER)
+    if THANKS_PATTERN.match(normalized):
+        return Route("thanks", THANKS_ANSWER)
+    if HELP_PATTERN.match(normalized):
+        return Route("help", HELP_ANSWER)
+    if CLEAR_PATTERN.match(normalized):
+        return Route("clear", CLEAR_ANSWER)
+    deck_answer = answer_deck_question(text)
+    if deck_answer is not None:
+        return Route("deck_stats", deck_answer)
+    card_answer = answer_card_lookup(text, normalized)
+    if card_answer is not None:
+        return Route("card_lookup", card_answer)
+
+    for intent, pattern in MODEL_INTENT_PATTERNS:
+        if pattern.search(normalized):
+            return Route(intent)
+    if find_cards(text):
+        return Route("card_info")
+    return Route("general")
+
+
+class IntentStats:
+    """Counts routed prompts per intent and how many of them reached the API"""
+
+    def __init__(self):
+        self.intents = Counter()
+        self.cache_hits = 0
+        self.shared = 0
+        self._lock = threading.Lock()
+
+    def record(self, route):
+        with self._lock:
+            self.intents[route.intent] += 1
+
+    def record_cache_hit(self):
+        with self._lock:
+            self.cache_hits += 1
+
+    def record_shared(self):
+        with self._lock:
+            self.shared += 1
+
+    def report(self):
+        """Traffic distribution: totals plus (intent, count, share, handled locally) rows, largest first"""
+        with self._lock:
+            intents = dict(self.intents)
+            cache_hits = self.cache_hits
+            shared = self.shared
+        total = sum(intents.values())
+        local = sum(count for intent, count in intents.items() if intent not in INTENT_PROFILES)
+        share = (lambda count: count / total) if total else (lambda count: 0.0)
+        return {
+            "total": total,
+            "local": local,
+            "cached": cache_hits,
+            "shared": shared,
+            "api": total - local - cache_hits - shared,
+            "avoided_share": share(local + cache_hits + shared),
+            "intents": [
+                (intent, count, share(count), intent not in INTENT_PROFILES)
+                for intent, count in sorted(intents.items(), key=lambda item: item[1], reverse=True)
+            ],
+        }
+
+    def clear(self):
+        with self._lock:
+            self.intents.clear()
+            self.cache_hits = 0
+            self.shared = 0
+
+
+def format_report(report):
+    """Markdown table of a traffic report"""
+    lines = [
+        f"**{report['avoided_share']:.0%}** of {report['total']} prompts never reached the API "
+        f"({report['local']} answered locally, {report['cached']} from cache, "
+        f"{report['shared']} shared an in-flight request)",
+        "",
+        "| Intent | Prompts | Share | Handled |",
+        "|---|---:|---:|---|",
+    ]
+    for intent, count, share, local in report["intents"]:
+        lines.append(f"| {intent} | {count} | {share:.0%} | {'locally' if local else 'model'} |")
+    return "\n".join(lines)
+
+
+# Process-wide traffic counters
+_intent_stats = IntentStats()
+
+
+def router_enabled():
+    """Check whether prompts go through the local intent router before the model"""
+    return os.getenv("INTENT_ROUTER", "true").lower() in ("1", "true", "yes")
+
+
+def get_intent_stats():
+    """Get the shared traffic counters"""
+    return _intent_stats
+
+
+def route_prompt(text):
+    """Classify a prompt and count it in the traffic report"""
+    route = classify(text) if router_enabled() else Route("general")
+    _intent_stats.record(route)
+    return route
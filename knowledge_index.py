@@ -0,0 +1,135 @@
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import NamedTuple
+from personas import CLASH_ROYALE_CONTEXT
+
+# Retrieval settings used unless overridden in the environment
+DEFAULT_TOP_K = 4
+DEFAULT_TOKEN_BUDGET = 1200
+MAX_CHUNK_CHARS = 1200
+
+# Top-level headings look like "GAME MODES (DETAILED):"
+HEADING_PATTERN = re.compile(r"^[A-Z][A-Z0-9 &()'/,.-]*:\s*$")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "best", "by", "can", "do", "for", "from", "how", "i", "in",
+    "is", "it", "me", "my", "of", "on", "or", "should", "the", "to", "what", "when", "which", "with", "you",
+}
+
+
+class Chunk(NamedTuple):
+    """An addressable piece of the knowledge base"""
+    section: str
+    text: str
+    tokens: int
+
+
+def tokenize(text):
+    """Lowercase words with stopwords removed and plural 's' stripped"""
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    return [word[:-1] if len(word) > 3 and word.endswith("s") else word for word in words if word not in STOPWORDS]
+
+
+def estimate_tokens(text):
+    """Rough token count for budgeting (about four characters per token)"""
+    return len(text) // 4 + 1
+
+
+def split_sections(text=CLASH_ROYALE_CONTEXT, max_chars=MAX_CHUNK_CHARS):
+    """Split the knowledge base into chunks by heading, packing paragraphs up to max_chars"""
+    sections = []
+    title, lines = None, []
+    for line in text.splitlines():
+        if HEADING_PATTERN.match(line):
+            sections.append((title, lines))
+            title, lines = line.rstrip(":").strip(), []
+        else:
+            lines.append(line)
+    sections.append((title, lines))
+
+    chunks = []
+    for title, lines in sections:
+        if title is None:
+            continue
+        paragraphs = [p.strip("\n") for p in "\n".join(lines).split("\n\n") if p.strip()]
+        current = ""
+        for paragraph in paragraphs:
+            if current and len(current) + len(paragraph) > max_chars:
+                chunks.append(make_chunk(title, current))
+                current = ""
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+        if current:
+            chunks.append(make_chunk(title, current))
+    return chunks
+
+
+def make_chunk(section, body):
+    text = f"{section}:\n{body}"
+    return Chunk(section, text, estimate_tokens(text))
+
+
+class BM25Index:
+    """Okapi BM25 ranking over knowledge chunks"""
+
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.term_counts = [Counter(tokenize(chunk.text)) for chunk in chunks]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.average_length = sum(self.lengths) / len(self.lengths) if chunks else 0
+        document_frequency = Counter(term for counts in self.term_counts for term in counts)
+        self.idf = {
+            term: math.log(1 + (len(chunks) - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+
+    def search(self, query, top_k=DEFAULT_TOP_K):
+        """Return up to top_k (score, chunk) pairs, best first"""
+        terms = [term for term in set(tokenize(query)) if term in self.idf]
+        scored = []
+        for index, counts in enumerate(self.term_counts):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * self.lengths[index] / self.average_length)
+            for term in terms:
+                tf = counts.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            if score > 0:
+                scored.append((score, self.chunks[index]))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return scored[:top_k]
+
+
+# Process-wide index, built once on first use
+_knowledge_index = None
+_knowledge_index_lock = threading.Lock()
+
+
+def retrieval_enabled():
+    """Check whether prompts should carry retrieved sections instead of the full knowledge base"""
+    return os.getenv("KNOWLEDGE_RETRIEVAL", "false").lower() in ("1", "true", "yes")
+
+
+def get_knowledge_index():
+    """Get the shared BM25 index over the knowledge base"""
+    global _knowledge_index
+    with _knowledge_index_lock:
+        if _knowledge_index is None:
+            _knowledge_index = BM25Index(split_sections())
+        return _knowledge_index
+
+
+def retrieve_context(question, top_k=None, token_budget=None):
+    """Join the most relevant knowledge chunks for a question within a token budget"""
+    top_k = top_k or int(os.getenv("KNOWLEDGE_TOP_K", DEFAULT_TOP_K))
+    token_budget = token_budget or int(os.getenv("KNOWLEDGE_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET))
+    selected, used = [], 0
+    for _, chunk in get_knowledge_index().search(question, top_k):
+        if used + chunk.tokens > token_budget:
+            continue
+        selected.append(chunk.text)
+        used += chunk.tokens
+    return "\n\n".join(selected)
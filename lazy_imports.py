@@ -0,0 +1,36 @@
+import importlib
+import sys
+
+
+class LazyModule:
+    """Stands in for a module, importing it on first attribute access
+
+    The Gemini client library pulls in gRPC and protobuf and takes about a
+    second to import, so modules refer to it through a LazyModule and the cost
+    lands on the first model call (or the background warm-up) instead of on
+    every process start.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute):
+        if self._module is None:
+            # The import system's own locks make concurrent first uses safe
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
+
+    def __repr__(self):
+        state = "loaded" if self._name in sys.modules else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name):
+    """A LazyModule for the module called name"""
+    return LazyModule(name)
+
+
+def is_loaded(name):
+    """Check whether a module has been imported yet"""
+    return name in sys.modules
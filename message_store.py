@@ -0,0 +1,101 @@
+import os
+import sys
+import zlib
+
+# Messages rendered live in the chat, as in app.py; older answers are compressed
+DEFAULT_VISIBLE_WINDOW = 20
+# Shorter messages (most questions) cost more to compress than they save
+MIN_COMPRESS_BYTES = 512
+COMPRESS_LEVEL = 6
+
+# Fields a message exposes, in the order of the {"role", "content"} dicts it replaces
+MESSAGE_KEYS = ("role", "content")
+
+
+class Message:
+    """One chat message, stored compactly and read like a {"role", "content"} dict
+
+    The role is interned, so every session shares the same few strings. Once
+    compress() is called, long content is kept as zlib-compressed UTF-8 and
+    decompressed on every read; compressed messages are the ones outside the
+    visible window, which are only read to start a chat session or to page
+    through history.
+    """
+
+    __slots__ = ("role", "_text", "_packed")
+
+    def __init__(self, role, content):
+        self.role = sys.intern(role)
+        self._text = content
+        self._packed = None
+
+    @property
+    def content(self):
+        text = self._text
+        if text is not None:
+            return text
+        return zlib.decompress(self._packed).decode("utf-8")
+
+    @property
+    def compressed(self):
+        return self._text is None
+
+    def compress(self):
+        """Keep the content compressed if it is long enough for that to save memory"""
+        text = self._text
+        if text is None:
+            return
+        encoded = text.encode("utf-8")
+        if len(encoded) < MIN_COMPRESS_BYTES:
+            return
+        packed = zlib.compress(encoded, COMPRESS_LEVEL)
+        # Non-ASCII text takes more bytes than characters, so compare like with like
+        if len(packed) < len(encoded):
+            # Set before dropping the text, so a concurrent read always finds one of them
+            self._packed = packed
+            self._text = None
+
+    def __getitem__(self, key):
+        if key == "role":
+            return self.role
+        if key == "content":
+            return self.content
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        return self[key] if key in MESSAGE_KEYS else default
+
+    def keys(self):
+        return MESSAGE_KEYS
+
+    def __eq__(self, other):
+        if isinstance(other, (Message, dict)):
+            return self.role == other["role"] and self.content == other["content"]
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Message(role={self.role!r}, compressed={self.compressed})"
+
+
+# Accept messages from stores, archives and callers that still build plain dicts
+def as_message(message):
+    """message as a Message"""
+    if isinstance(message, Message):
+        return message
+    return Message(message["role"], message["content"])
+
+
+# Read on every call, so .env values loaded after import still apply
+def visible_window():
+    """Number of most recent messages kept as text; 0 when CHAT_RENDER_WINDOW renders everything"""
+    return max(0, int(os.getenv("CHAT_RENDER_WINDOW", DEFAULT_VISIBLE_WINDOW)))
+
+
+# Compress everything that has scrolled out of the visible window
+def compress_older(messages, window=None):
+    """Compress the content of every message before the last window ones"""
+    window = visible_window() if window is None else window
+    if window <= 0:
+        return
+    for message in messages[:max(0, len(messages) - window)]:
+        message.compress()
@@ -0,0 +1,317 @@
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+# Histogram buckets in seconds, from a cached answer up to a slow long answer
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+# Histogram buckets in tokens, around the output caps the generation policy hands out
+TOKEN_BUCKETS = (64, 128, 256, 384, 512, 768, 1024, 1536, 2048, 4096)
+DEFAULT_FILE_INTERVAL = 15
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(pairs):
+    """Prometheus label set, e.g. {intent="counter",outcome="model"}"""
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in pairs) + "}"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base for labelled metrics; values are kept per tuple of label values"""
+
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def render(self):
+        """Text exposition lines for this metric"""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            values = {key: self.copy(value) for key, value in self._values.items()}
+        for key, value in sorted(values.items()):
+            lines.extend(self.samples(list(zip(self.labels, key)), value))
+        return lines
+
+
+class Counter(Metric):
+    """A monotonically increasing Prometheus counter"""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self.key(labels), 0)
+
+    def copy(self, value):
+        return value
+
+    def samples(self, pairs, value):
+        yield f"{self.name}{format_labels(pairs)} {format_value(value)}"
+
+
+class Histogram(Metric):
+    """A Prometheus histogram with cumulative buckets"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][index] += 1
+            entry[1] += value
+
+    def count(self, **labels):
+        with self._lock:
+            entry = self._values.get(self.key(labels))
+            return entry[0][-1] if entry else 0
+
+    def copy(self, value):
+        return [list(value[0]), value[1]]
+
+    def samples(self, pairs, value):
+        counts, total = value
+        for bound, count in zip(self.buckets, counts):
+            yield f"{self.name}_bucket{format_labels(pairs + [('le', format_value(float(bound)))])} {count}"
+        yield f"{self.name}_sum{format_labels(pairs)} {format_value(total)}"
+        yield f"{self.name}_count{format_labels(pairs)} {counts[-1]}"
+
+
+class Registry:
+    """The set of metrics exported by this process"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        return "\n".join(line for metric in self.metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+# Chat turns, from the Streamlit rerun down to the upstream call
+CLIENT_INIT_SECONDS = REGISTRY.histogram("chat_client_init_seconds", "Time spent in init_gemini_client per rerun")
+RERUN_SECONDS = REGISTRY.histogram("chat_rerun_seconds", "Streamlit script run time, including any model call", ["turn"])
+TURNS = REGISTRY.counter("chat_turns_total", "Chat turns by intent and how they were answered", ["intent", "outcome"])
+TURN_SECONDS = REGISTRY.histogram("chat_turn_seconds", "Time to produce the whole answer to a turn", ["outcome"])
+PROMPT_BUILD_SECONDS = REGISTRY.histogram("chat_prompt_build_seconds", "Time to build the message sent upstream")
+UPSTREAM_SECONDS = REGISTRY.histogram("gemini_request_seconds", "Upstream call time until the last chunk", ["model"])
+FIRST_TOKEN_SECONDS = REGISTRY.histogram("gemini_time_to_first_token_seconds", "Upstream call time until the first chunk", ["model"])
+TOKENS = REGISTRY.counter("gemini_tokens_total", "Tokens reported in usage_metadata", ["model", "type"])
+RETRIES = REGISTRY.counter("gemini_retries_total", "Upstream calls retried after a transient error", ["error"])
+BLOCKED = REGISTRY.counter("gemini_blocked_total", "Responses blocked by safety filters", ["reason"])
+ERRORS = REGISTRY.counter("gemini_errors_total", "Turns that ended in an error", ["error"])
+
+# Generation policy tuning
+OUTPUT_TOKENS = REGISTRY.histogram("gemini_output_tokens", "Output tokens per response, thinking included, from usage_metadata", ["intent"], buckets=TOKEN_BUCKETS)
+TRUNCATED = REGISTRY.counter("gemini_truncated_total", "Responses cut off at their max_output_tokens", ["intent"])
+
+# Admission control
+ADMISSION_WAIT_SECONDS = REGISTRY.histogram("chat_admission_wait_seconds", "Time requests over a rate limit spent queued", ["outcome"])
+
+# Process start-up
+WARMUP_SECONDS = REGISTRY.histogram("chat_warmup_seconds", "Time spent on each background warm-up step", ["step"])
+
+# Model pool routing
+POOL_REQUESTS = REGISTRY.counter("model_pool_requests_total", "Requests sent to each model pool endpoint by outcome", ["endpoint", "outcome"])
+POOL_FAILOVERS = REGISTRY.counter("model_pool_failovers_total", "Requests moved to another endpoint after a transient error")
+
+
+def tracing_enabled():
+    """Check whether turns are exported as OpenTelemetry spans (needs the opentelemetry package)"""
+    return otel_trace is not None and os.getenv("OTEL_TRACING", "false").lower() in ("1", "true", "yes")
+
+
+class UpstreamCall:
+    """Times one upstream model call and records its token usage"""
+
+    def __init__(self, trace, model):
+        self.trace = trace
+        self.model = model
+        self.started = time.perf_counter()
+        self.started_ns = time.time_ns()
+        self.first_chunk = None
+        # Whether finish() counted the response as blocked
+        self.blocked = False
+
+    def chunk(self):
+        """Note that a chunk arrived"""
+        if self.first_chunk is None:
+            self.first_chunk = time.perf_counter() - self.started
+            FIRST_TOKEN_SECONDS.observe(self.first_chunk, model=self.model)
+
+    def finish(self, response=None):
+        """Record latency and the usage_metadata of a finished response"""
+        UPSTREAM_SECONDS.observe(time.perf_counter() - self.started, model=self.model)
+        attributes = {"gen_ai.request.model": self.model}
+        candidates = getattr(response, "candidates", None)
+        if candidates:
+            finish_reason = candidates[0].finish_reason.name
+            attributes["gen_ai.response.finish_reasons"] = [finish_reason]
+            if finish_reason not in ("STOP", "MAX_TOKENS", "FINISH_REASON_UNSPECIFIED"):
+                # Streamed candidates can end blocked without raising
+                BLOCKED.inc(reason=finish_reason)
+                self.blocked = True
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            for kind, value in (
+                ("prompt", usage.prompt_token_count),
+                ("output", usage.candidates_token_count),
+                ("cached", usage.cached_content_token_count),
+            ):
+                if value:
+                    TOKENS.inc(value, model=self.model, type=kind)
+            attributes["gen_ai.usage.input_tokens"] = usage.prompt_token_count
+            attributes["gen_ai.usage.output_tokens"] = usage.candidates_token_count
+        if self.first_chunk is not None:
+            attributes["time_to_first_token_s"] = self.first_chunk
+        if self.trace is not None:
+            self.trace.stage("gemini.generate", self.started_ns, time.time_ns(), attributes)
+
+
+class TurnTrace:
+    """Timings of one chat turn, exported as metrics and, when enabled, OpenTelemetry spans
+
+    Stages are collected with their wall-clock bounds and turned into spans when
+    the turn finishes, so they can be recorded from any thread.
+    """
+
+    def __init__(self, intent="general"):
+        self.intent = intent
+        self.started = time.perf_counter()
+        self.started_ns = time.time_ns()
+        self.stages = []
+        # Whether a blocked response cut the answer short
+        self.truncated = False
+
+    def stage(self, name, start_ns, end_ns, attributes=None):
+        self.stages.append((name, start_ns, end_ns, attributes or {}))
+
+    def upstream(self, model):
+        """Start timing an upstream call made for this turn"""
+        return UpstreamCall(self, model)
+
+    def prompt_built(self, started, started_ns):
+        PROMPT_BUILD_SECONDS.observe(time.perf_counter() - started)
+        self.stage("chat.prompt_build", started_ns, time.time_ns())
+
+    def finish(self, outcome, error=None):
+        """Record the turn's outcome and duration, and export spans"""
+        TURNS.inc(intent=self.intent, outcome=outcome)
+        TURN_SECONDS.observe(time.perf_counter() - self.started, outcome=outcome)
+        if error is not None:
+            ERRORS.inc(error=type(error).__name__)
+        if tracing_enabled():
+            self.export_spans(outcome, error)
+
+    def export_spans(self, outcome, error):
+        tracer = otel_trace.get_tracer("clash-royale-chat")
+        root = tracer.start_span("chat.turn", start_time=self.started_ns,
+                                 attributes={"chat.intent": self.intent, "chat.outcome": outcome})
+        if error is not None:
+            root.record_exception(error)
+            root.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR, str(error)))
+        context = otel_trace.set_span_in_context(root)
+        for name, start_ns, end_ns, attributes in list(self.stages):
+            tracer.start_span(name, context=context, start_time=start_ns, attributes=attributes).end(end_time=end_ns)
+        root.end()
+
+
+# Exporters, started once per process
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def write_metrics_file(path):
+    """Write all metrics to path atomically, for node_exporter's textfile collector or CI artifacts"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(REGISTRY.render())
+    os.replace(temp_path, path)
+
+
+def start_exporters():
+    """Serve /metrics on METRICS_PORT and/or rewrite METRICS_FILE periodically; safe to call on every rerun"""
+    global _exporters_started
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+        port = os.getenv("METRICS_PORT")
+        if port:
+            server = ThreadingHTTPServer((os.getenv("METRICS_HOST", "127.0.0.1"), int(port)), MetricsHandler)
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        path = os.getenv("METRICS_FILE")
+        if path:
+            interval = float(os.getenv("METRICS_FILE_INTERVAL", DEFAULT_FILE_INTERVAL))
+
+            def write_forever():
+                while True:
+                    time.sleep(interval)
+                    write_metrics_file(path)
+
+            threading.Thread(target=write_forever, name="metrics-file", daemon=True).start()
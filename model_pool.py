@@ -0,0 +1,310 @@
+import functools
+import itertools
+import os
+import re
+import threading
+import time
+from collections import deque
+from lazy_imports import lazy_import
+from model_backend import attach_clients, get_model_backend
+from resilience import is_transient, retry_after
+from metrics import POOL_FAILOVERS, POOL_REQUESTS
+
+# Imported on first use, see lazy_imports
+api_exceptions = lazy_import("google.api_core.exceptions")
+
+# Seconds an endpoint is skipped after a quota error (unless the server says otherwise) or another transient error
+DEFAULT_COOLDOWN = 60
+DEFAULT_ERROR_COOLDOWN = 5
+
+# Weight of each new observation in an endpoint's moving averages
+EWMA_ALPHA = 0.2
+# How much an endpoint that always fails has its latency inflated when ranking
+ERROR_PENALTY = 4
+
+# MODEL_POOL entries: model[@KEY_VAR][:max_output_tokens][/requests_per_minute]
+ENDPOINT_PATTERN = re.compile(r"(?P<model>(?:models/)?[\w.\-]+)(?:@(?P<key>\w+))?(?::(?P<max_tokens>\d+))?(?:/(?P<rpm>\d+))?")
+DEFAULT_KEY_VAR = "GEMINI_API_KEY"
+
+
+# Errors meaning the key or model is out of quota rather than briefly unavailable
+@functools.cache
+def quota_errors():
+    """Exception types for exhausted quotas, resolved on first use"""
+    return api_exceptions.TooManyRequests, api_exceptions.ResourceExhausted
+
+
+class Endpoint:
+    """One model on one API key, with the health the pool routes by"""
+
+    def __init__(self, model_name, key_name=DEFAULT_KEY_VAR, api_key=None, max_output_tokens=None, rpm=None,
+                 client=None, async_client=None):
+        self.model_name = model_name if model_name.startswith("models/") else f"models/{model_name}"
+        self.name = f"{model_name}@{key_name}"
+        self.api_key = api_key
+        self.max_output_tokens = max_output_tokens
+        self.rpm = rpm
+        self.latency = None
+        self.error_rate = 0.0
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.started = deque()
+        self._client = client
+        self._async_client = async_client
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = get_model_backend().create_client(self.api_key)
+            return self._client
+
+    @property
+    def async_client(self):
+        # Created on first use so it binds to the event loop that calls it
+        with self._lock:
+            if self._async_client is None:
+                self._async_client = get_model_backend().create_async_client(self.api_key)
+            return self._async_client
+
+    def accepts(self, max_output_tokens):
+        """Check whether a request for max_output_tokens fits this endpoint's cap"""
+        return self.max_output_tokens is None or 0 < max_output_tokens <= self.max_output_tokens
+
+    def remaining(self, now):
+        """Requests left in the current minute, or None without a known quota"""
+        if not self.rpm:
+            return None
+        while self.started and now - self.started[0] >= 60:
+            self.started.popleft()
+        return self.rpm - len(self.started)
+
+    def available(self, now):
+        remaining = self.remaining(now)
+        return now >= self.cooldown_until and (remaining is None or remaining > 0)
+
+    def score(self):
+        """Expected wait for a response; untried endpoints score 0 so each one gets explored"""
+        return (self.latency or 0.0) * (1 + self.in_flight) * (1 + ERROR_PENALTY * self.error_rate)
+
+
+class ModelPool:
+    """Routes each model request to the healthiest endpoint, failing over on rate limits and outages
+
+    Endpoints are ranked by their moving average time to first response,
+    inflated by requests in flight and recent errors. Endpoints cooling down
+    after an error, or out of their per-minute quota, are only tried once
+    every other endpoint has failed. An endpoint with a max_output_tokens cap,
+    such as a lighter model for short answers, only takes requests asking for
+    at most that many tokens.
+    """
+
+    def __init__(self, endpoints, cooldown=DEFAULT_COOLDOWN, error_cooldown=DEFAULT_ERROR_COOLDOWN, clock=time.monotonic):
+        if not endpoints:
+            raise ValueError("A model pool needs at least one endpoint")
+        self.endpoints = list(endpoints)
+        self.cooldown = cooldown
+        self.error_cooldown = error_cooldown
+        self.clock = clock
+        self.client = PooledClient(self)
+        self.async_client = PooledAsyncClient(self)
+        self._lock = threading.Lock()
+
+    def attach(self, model):
+        """Send a GenerativeModel's requests through the pool"""
+        return attach_clients(model, self.client, self.async_client)
+
+    def rank(self, request):
+        """Endpoints to try for a request, best first"""
+        max_output_tokens = request.generation_config.max_output_tokens
+        now = self.clock()
+        with self._lock:
+            eligible = [endpoint for endpoint in self.endpoints if endpoint.accepts(max_output_tokens)] or self.endpoints
+            ready = sorted((endpoint for endpoint in eligible if endpoint.available(now)), key=Endpoint.score)
+            # As a last resort, try the endpoints that recover soonest
+            waiting = sorted((endpoint for endpoint in eligible if not endpoint.available(now)), key=lambda e: e.cooldown_until)
+        return ready + waiting
+
+    def start(self, endpoint, request):
+        request.model = endpoint.model_name
+        with self._lock:
+            endpoint.in_flight += 1
+            endpoint.started.append(self.clock())
+
+    def succeeded(self, endpoint, latency):
+        with self._lock:
+            endpoint.in_flight -= 1
+            endpoint.latency = latency if endpoint.latency is None else endpoint.latency + EWMA_ALPHA * (latency - endpoint.latency)
+            endpoint.error_rate -= EWMA_ALPHA * endpoint.error_rate
+        POOL_REQUESTS.inc(endpoint=endpoint.name, outcome="ok")
+
+    def failed(self, endpoint, error):
+        """Record an error; returns whether the request should move on to the next endpoint"""
+        transient = is_transient(error)
+        with self._lock:
+            endpoint.in_flight -= 1
+            if transient:
+                endpoint.error_rate += EWMA_ALPHA * (1 - endpoint.error_rate)
+                if isinstance(error, quota_errors()):
+                    cooldown = retry_after(error) or self.cooldown
+                else:
+                    cooldown = self.error_cooldown
+                endpoint.cooldown_until = max(endpoint.cooldown_until, self.clock() + cooldown)
+        outcome = "throttled" if isinstance(error, quota_errors()) else "error"
+        POOL_REQUESTS.inc(endpoint=endpoint.name, outcome=outcome if transient else "rejected")
+        return transient
+
+    def call(self, request, send):
+        """Return send(endpoint, request) from the best endpoint that doesn't fail with a transient error"""
+        error = None
+        for attempt, endpoint in enumerate(self.rank(request)):
+            if attempt:
+                POOL_FAILOVERS.inc()
+            self.start(endpoint, request)
+            started = time.perf_counter()
+            try:
+                result = send(endpoint, request)
+            except Exception as e:
+                if not self.failed(endpoint, e):
+                    raise
+                error = e
+                continue
+            self.succeeded(endpoint, time.perf_counter() - started)
+            return result
+        raise error
+
+    async def call_async(self, request, send):
+        """Async version of call, with send returning an awaitable"""
+        error = None
+        for attempt, endpoint in enumerate(self.rank(request)):
+            if attempt:
+                POOL_FAILOVERS.inc()
+            self.start(endpoint, request)
+            started = time.perf_counter()
+            try:
+                result = await send(endpoint, request)
+            except Exception as e:
+                if not self.failed(endpoint, e):
+                    raise
+                error = e
+                continue
+            self.succeeded(endpoint, time.perf_counter() - started)
+            return result
+        raise error
+
+    def report(self):
+        """Current health of every endpoint"""
+        now = self.clock()
+        with self._lock:
+            return [{
+                "endpoint": endpoint.name,
+                "latency": endpoint.latency,
+                "error_rate": round(endpoint.error_rate, 3),
+                "in_flight": endpoint.in_flight,
+                "remaining": endpoint.remaining(now),
+                "cooldown": max(0.0, round(endpoint.cooldown_until - now, 1)),
+            } for endpoint in self.endpoints]
+
+
+def peek(iterator):
+    """Fetch the first chunk of a stream now, so errors surface while failover is still possible"""
+    first = next(iterator, None)
+    if first is None:
+        return iter(())
+    return itertools.chain([first], iterator)
+
+
+async def peek_async(iterator):
+    """Async version of peek"""
+    try:
+        first = await iterator.__anext__()
+    except StopAsyncIteration:
+        first = None
+
+    async def stream():
+        if first is None:
+            return
+        yield first
+        async for chunk in iterator:
+            yield chunk
+
+    return stream()
+
+
+class PooledClient:
+    """Stands in for the generative service client, sending each request through the pool"""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def generate_content(self, request, **kwargs):
+        return self.pool.call(request, lambda endpoint, request: endpoint.client.generate_content(request, **kwargs))
+
+    def stream_generate_content(self, request, **kwargs):
+        return self.pool.call(request, lambda endpoint, request: peek(endpoint.client.stream_generate_content(request, **kwargs)))
+
+    def __getattr__(self, name):
+        # Anything else, e.g. count_tokens, goes to the first endpoint
+        return getattr(self.pool.endpoints[0].client, name)
+
+
+class PooledAsyncClient:
+    """Async counterpart of PooledClient"""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def generate_content(self, request, **kwargs):
+        return await self.pool.call_async(request, lambda endpoint, request: endpoint.async_client.generate_content(request, **kwargs))
+
+    async def stream_generate_content(self, request, **kwargs):
+        async def send(endpoint, request):
+            return await peek_async(await endpoint.async_client.stream_generate_content(request, **kwargs))
+
+        return await self.pool.call_async(request, send)
+
+    def __getattr__(self, name):
+        return getattr(self.pool.endpoints[0].async_client, name)
+
+
+def parse_endpoints(spec, requires_api_key=True):
+    """Endpoints from a MODEL_POOL value, e.g. "gemini-2.5-flash,gemini-2.5-flash@GEMINI_API_KEY_2/10" """
+    endpoints = []
+    for entry in filter(None, (entry.strip() for entry in spec.split(","))):
+        match = ENDPOINT_PATTERN.fullmatch(entry)
+        if match is None:
+            raise ValueError(f"Invalid MODEL_POOL entry {entry!r}; expected model[@KEY_VAR][:max_output_tokens][/rpm]")
+        key_name = match["key"] or DEFAULT_KEY_VAR
+        api_key = os.getenv(key_name)
+        if requires_api_key and not api_key:
+            raise ValueError(f"{key_name} for MODEL_POOL entry {entry!r} not found in environment variables!")
+        endpoints.append(Endpoint(
+            match["model"],
+            key_name,
+            api_key,
+            max_output_tokens=int(match["max_tokens"]) if match["max_tokens"] else None,
+            rpm=int(match["rpm"]) if match["rpm"] else None,
+        ))
+    return endpoints
+
+
+# Process-wide model pool, configured from the environment
+_model_pool = None
+_model_pool_lock = threading.Lock()
+
+
+def get_model_pool():
+    """Get the shared model pool, or None when MODEL_POOL is not set"""
+    global _model_pool
+    spec = os.getenv("MODEL_POOL")
+    if not spec:
+        return None
+    with _model_pool_lock:
+        if _model_pool is None:
+            _model_pool = ModelPool(
+                parse_endpoints(spec, get_model_backend().requires_api_key),
+                cooldown=float(os.getenv("MODEL_POOL_COOLDOWN", DEFAULT_COOLDOWN)),
+                error_cooldown=float(os.getenv("MODEL_POOL_ERROR_COOLDOWN", DEFAULT_ERROR_COOLDOWN)),
+            )
+        return _model_pool
@@ -0,0 +1,205 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import NamedTuple
+from personas import PERSONAS
+from response_cache import normalize_question
+from intent_router import classify
+from generation_policy import get_generation_policy
+
+logger = logging.getLogger(__name__)
+
+# Refresh settings used unless overridden in the environment
+DEFAULT_REFRESH_SECONDS = 6 * 3600
+DEFAULT_FILE = "popular_topics.json"
+# Seconds to wait before retrying a refresh where some answers failed
+RETRY_SECONDS = 300
+# Seconds between answers, so a refresh is a trickle of calls rather than a burst at startup
+DEFAULT_SPACING_SECONDS = 15
+
+
+class Topic(NamedTuple):
+    """A sidebar topic and the question it asks"""
+    label: str
+    question: str
+
+
+# Topics advertised in the sidebar, which are also the most common first questions
+POPULAR_TOPICS = (
+    Topic("🃏 Best decks for different arenas", "What are the best decks for different arenas?"),
+    Topic("🏰 Attack and defense strategies", "What are the best attack and defense strategies?"),
+    Topic("📈 How to push trophies on ladder", "How do I push trophies on ladder?"),
+    Topic("⚡ Current meta and card tier lists", "What is the current meta and card tier list?"),
+    Topic("🎯 Card counters and synergies", "What are the best card counters and synergies?"),
+    Topic("💎 Elixir management tips", "What are your best elixir management tips?"),
+    Topic("🌟 Deck building guides for beginners", "How should a beginner build a deck?"),
+    Topic("🏆 Win condition recommendations", "Which win conditions do you recommend?"),
+)
+
+
+# Answer a topic in a fresh chat, bypassing every cache so the answer really is new
+def generate_answer(personality, question):
+    """The persona's model answer to a standalone question"""
+    # Imported here because chat_engine looks answers up in this module
+    from chat_engine import get_ai_response, get_chat_engine, start_chat
+    # Not route_prompt, so background calls stay out of the sidebar's traffic report
+    route = classify(question)
+    engine = get_chat_engine()
+    plan = get_generation_policy().plan(question, route, personality, engine.model_name)
+    chat = start_chat(engine.get_model(personality, plan.model_name))
+    # No personality, so the lookup skips the response cache and these precomputed answers
+    return get_ai_response(chat, question, route=route, plan=plan)
+
+
+class TopicAnswers:
+    """Answers to the popular topics for every persona, regenerated in the background
+
+    A refresh asks the model every topic in every persona, one at a time and
+    spacing seconds apart, and swaps each answer in as soon as it is ready; a
+    failed answer keeps the previous one. Answers are saved to path, if given, so a restarted or new
+    process serves them immediately and only refreshes once they are due.
+    """
+
+    def __init__(self, topics=POPULAR_TOPICS, refresh_interval=DEFAULT_REFRESH_SECONDS, path=None,
+                 generate=generate_answer, clock=time.time, spacing=DEFAULT_SPACING_SECONDS):
+        self.topics = topics
+        self.refresh_interval = refresh_interval
+        self.spacing = spacing
+        self.path = path
+        self.generate = generate
+        self.clock = clock
+        self.refreshed_at = 0.0
+        self.refreshes = 0
+        self.failures = 0
+        self._answers = {}
+        self._questions = {normalize_question(topic.question) for topic in topics}
+        self._stopped = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def get(self, personality, question):
+        """The precomputed answer to question in personality, or None"""
+        normalized = normalize_question(question)
+        if normalized not in self._questions:
+            return None
+        with self._lock:
+            return self._answers.get((personality, normalized))
+
+    def missing(self):
+        """Number of topic and persona pairs without an answer"""
+        with self._lock:
+            return sum((personality, question) not in self._answers for personality in PERSONAS for question in self._questions)
+
+    def refresh(self, missing_only=False):
+        """Regenerate every answer, or only the missing ones; returns whether all of them succeeded"""
+        started = self.clock()
+        failed = 0
+        for personality in list(PERSONAS):
+            for topic in self.topics:
+                if missing_only and self.get(personality, topic.question) is not None:
+                    continue
+                if self._stopped.wait(self.spacing):
+                    return False
+                try:
+                    text = self.generate(personality, topic.question)
+                except Exception as e:
+                    text = f"Error: {str(e)}"
+                if text.startswith("Error:"):
+                    failed += 1
+                    logger.warning("Could not pre-generate %r for %s: %s", topic.question, personality, text)
+                    continue
+                with self._lock:
+                    self._answers[(personality, normalize_question(topic.question))] = text
+        self.refreshes += 1
+        self.failures += failed
+        if not missing_only:
+            self.refreshed_at = started
+        self.save()
+        return not failed
+
+    def save(self):
+        """Write the answers to path atomically"""
+        if self.path is None:
+            return
+        with self._lock:
+            answers = [{"personality": personality, "question": question, "answer": text}
+                       for (personality, question), text in self._answers.items()]
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"refreshed_at": self.refreshed_at, "answers": answers}, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+    def load(self):
+        """Read answers saved by an earlier process, keeping only current topics and personas"""
+        if self.path is None:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                saved = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        with self._lock:
+            for item in saved.get("answers", ()):
+                if item["personality"] in PERSONAS and item["question"] in self._questions:
+                    self._answers[(item["personality"], item["question"])] = item["answer"]
+        self.refreshed_at = saved.get("refreshed_at", 0.0)
+
+    def start(self):
+        """Load saved answers and start refreshing them on a background thread, unless already started"""
+        with self._lock:
+            if self._thread is not None:
+                return self
+            self._thread = threading.Thread(target=self.run, name="popular-topics", daemon=True)
+        self.load()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        # Saved answers that are still current only need any gaps filled in
+        missing_only = self.refreshed_at > 0 and self.missing() > 0
+        delay = 0.0 if missing_only else self.refreshed_at + self.refresh_interval - self.clock()
+        while not self._stopped.wait(max(0.0, delay)):
+            # After a partial failure, serve what we have and ask for the missing answers again soon
+            missing_only = not self.refresh(missing_only)
+            delay = RETRY_SECONDS if missing_only else self.refreshed_at + self.refresh_interval - self.clock()
+
+    def report(self):
+        """How many answers are ready and when they were last refreshed"""
+        with self._lock:
+            ready = len(self._answers)
+        return {
+            "ready": ready,
+            "total": len(self.topics) * len(PERSONAS),
+            "refreshed_at": self.refreshed_at,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+        }
+
+
+# Process-wide topic answers, configured from the environment
+_topic_answers = None
+_topic_answers_lock = threading.Lock()
+
+
+def get_topic_answers():
+    """Get the shared popular-topic answers, or None when POPULAR_TOPICS is disabled
+
+    Answers are only loaded and generated once start() is called, which the
+    app and the API do at startup.
+    """
+    global _topic_answers
+    if os.getenv("POPULAR_TOPICS", "true").lower() in ("0", "false", "no"):
+        return None
+    with _topic_answers_lock:
+        if _topic_answers is None:
+            _topic_answers = TopicAnswers(
+                refresh_interval=float(os.getenv("POPULAR_TOPICS_REFRESH_SECONDS", DEFAULT_REFRESH_SECONDS)),
+                path=os.getenv("POPULAR_TOPICS_FILE", DEFAULT_FILE) or None,
+                spacing=float(os.getenv("POPULAR_TOPICS_SPACING_SECONDS", DEFAULT_SPACING_SECONDS)),
+            )
+        return _topic_answers
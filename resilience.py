@@ -0,0 +1,222 @@
+import asyncio
+import functools
+import os
+import random
+import re
+import threading
+import time
+from lazy_imports import lazy_import
+from metrics import RETRIES
+
+# Imported on first use, see lazy_imports
+api_exceptions = lazy_import("google.api_core.exceptions")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the model while the circuit breaker is open"""
+
+    def __init__(self, retry_in):
+        super().__init__(f"The AI service is busy right now. Please try again in {max(1, round(retry_in))} seconds.")
+        self.retry_in = retry_in
+
+
+# Upstream errors worth retrying: rate limits, timeouts and server-side failures
+@functools.cache
+def transient_errors():
+    """Exception types worth retrying, resolved on first use"""
+    return (
+        api_exceptions.TooManyRequests,
+        api_exceptions.ResourceExhausted,
+        api_exceptions.DeadlineExceeded,
+        api_exceptions.ServiceUnavailable,
+        api_exceptions.InternalServerError,
+        api_exceptions.BadGateway,
+        api_exceptions.GatewayTimeout,
+        api_exceptions.Aborted,
+        asyncio.TimeoutError,
+        ConnectionError,
+    )
+
+
+def is_transient(error):
+    """Check whether an upstream error is worth retrying"""
+    return isinstance(error, transient_errors())
+
+
+def retry_after(error):
+    """Seconds the server asked us to wait before retrying, if it said so"""
+    for detail in getattr(error, "details", None) or ():
+        delay = getattr(detail, "retry_delay", None)
+        if delay is not None:
+            return delay.seconds + delay.nanos / 1e9
+    match = re.search(r"retry in ([\d.]+)\s*s", str(error), re.IGNORECASE)
+    if match:
+        return float(match.group(1))
+    return None
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, never shorter than a retry-after hint
+
+    A hint longer than max_delay means retrying within this policy would only
+    fail again, so delay() returns None and the caller stops retrying.
+    """
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=8.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt, error=None):
+        """Seconds to wait before the next attempt, or None if the server asked for more than max_delay"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        hint = retry_after(error) if error is not None else None
+        if hint is not None:
+            if hint > self.max_delay:
+                return None
+            delay = max(delay, hint)
+        return delay
+
+
+class CircuitBreaker:
+    """Opens after repeated transient failures and lets one trial call through after a cool-down
+
+    While that trial call (the probe) runs, the breaker is half open and
+    every other call is rejected; the probe's success closes the breaker and
+    its failure opens it again. A probe that never reports back is replaced
+    after another reset_timeout.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = "closed"
+        self.failures = 0
+        self.open_until = 0.0
+        self.probe_started = 0.0
+        self._lock = threading.Lock()
+
+    def check(self):
+        """Raise CircuitOpenError unless a call may go ahead now; after the cool-down, the first caller becomes the probe"""
+        with self._lock:
+            now = self.clock()
+            self._raise_if_closed_to(now)
+            if self.state != "closed":
+                self.state = "half_open"
+                self.probe_started = now
+
+    def peek(self):
+        """Raise CircuitOpenError if a call now would be rejected, without becoming the probe"""
+        with self._lock:
+            self._raise_if_closed_to(self.clock())
+
+    def _raise_if_closed_to(self, now):
+        if self.state == "open" and now < self.open_until:
+            raise CircuitOpenError(self.open_until - now)
+        if self.state == "half_open" and now - self.probe_started < self.reset_timeout:
+            # Another caller's probe is deciding whether the service is back
+            raise CircuitOpenError(1.0)
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.open_until = max(self.open_until, self.clock() + self.reset_timeout)
+
+    def open_for(self, seconds):
+        """Reject calls for at least seconds, e.g. when the server asked for that long a pause"""
+        with self._lock:
+            self.state = "open"
+            self.open_until = max(self.open_until, self.clock() + seconds)
+
+
+def call_with_retry(make_call, policy=None, breaker=None):
+    """Call make_call(), retrying transient errors and reporting to the circuit breaker"""
+    policy = policy or get_retry_policy()
+    breaker = breaker or get_circuit_breaker()
+    for attempt in range(policy.max_attempts):
+        breaker.check()
+        try:
+            result = make_call()
+        except Exception as e:
+            if not is_transient(e):
+                # The service answered, so the failure is ours rather than an outage
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            delay = policy.delay(attempt, e)
+            if delay is None:
+                # Retrying sooner than the server asked would only fail again; hold every call until then
+                breaker.open_for(retry_after(e))
+                raise
+            if attempt + 1 >= policy.max_attempts:
+                raise
+            RETRIES.inc(error=type(e).__name__)
+            time.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
+
+
+async def call_with_retry_async(make_call, policy=None, breaker=None):
+    """Async version of call_with_retry; make_call() returns an awaitable"""
+    policy = policy or get_retry_policy()
+    breaker = breaker or get_circuit_breaker()
+    for attempt in range(policy.max_attempts):
+        breaker.check()
+        try:
+            result = await make_call()
+        except Exception as e:
+            if not is_transient(e):
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            delay = policy.delay(attempt, e)
+            if delay is None:
+                breaker.open_for(retry_after(e))
+                raise
+            if attempt + 1 >= policy.max_attempts:
+                raise
+            RETRIES.inc(error=type(e).__name__)
+            await asyncio.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
+
+
+# Process-wide retry policy and circuit breaker, configured from the environment
+_retry_policy = None
+_circuit_breaker = None
+_resilience_lock = threading.Lock()
+
+
+def get_retry_policy():
+    """Get the shared retry policy"""
+    global _retry_policy
+    with _resilience_lock:
+        if _retry_policy is None:
+            _retry_policy = RetryPolicy(
+                max_attempts=int(os.getenv("RETRY_MAX_ATTEMPTS", 3)),
+                base_delay=float(os.getenv("RETRY_BASE_DELAY", 0.5)),
+                max_delay=float(os.getenv("RETRY_MAX_DELAY", 8.0)),
+            )
+        return _retry_policy
+
+
+def get_circuit_breaker():
+    """Get the shared circuit breaker"""
+    global _circuit_breaker
+    with _resilience_lock:
+        if _circuit_breaker is None:
+            _circuit_breaker = CircuitBreaker(
+                failure_threshold=int(os.getenv("BREAKER_FAILURE_THRESHOLD", 5)),
+                reset_timeout=float(os.getenv("BREAKER_RESET_SECONDS", 30)),
+            )
+        return _circuit_breaker
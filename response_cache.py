@@ -0,0 +1,235 @@
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from lazy_imports import lazy_import
+
+# Imported on first use, see lazy_imports
+genai = lazy_import("google.generativeai")
+
+# Cache limits used unless overridden in the environment
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 6 * 3600
+DEFAULT_SIMILARITY_THRESHOLD = 0.92
+# Shorter questions ("hog counters") match too loosely to be worth an embedding call
+DEFAULT_MIN_SEMANTIC_WORDS = 4
+EMBEDDING_MODEL = "models/text-embedding-004"
+
+# Words that usually point back at earlier turns, so the answer depends on history
+FOLLOW_UP_WORDS = {"it", "its", "that", "this", "these", "those", "them", "they", "he", "she", "why", "more", "else", "also", "instead"}
+
+
+def normalize_question(text):
+    """Lowercase a question and strip punctuation and extra whitespace"""
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+
+def is_standalone_question(question, has_history):
+    """Check whether a question can be answered without the earlier conversation"""
+    words = normalize_question(question).split()
+    if not words:
+        return False
+    if not has_history:
+        return True
+    return len(words) >= 3 and not FOLLOW_UP_WORDS.intersection(words)
+
+
+def unit_vector(vector):
+    """vector scaled to length 1, so cosine similarity is a plain dot product; None for a zero vector"""
+    norm = math.sqrt(sum(x * x for x in vector))
+    return tuple(x / norm for x in vector) if norm else None
+
+
+def dot(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+
+def gemini_embedding(text):
+    """Embed a question with the Gemini embedding model"""
+    result = genai.embed_content(model=EMBEDDING_MODEL, content=text, task_type="semantic_similarity")
+    return result["embedding"]
+
+
+class CacheEntry:
+    """A cached answer with its size, creation time and optional unit-length embedding"""
+
+    __slots__ = ("text", "created_at", "size", "embedding")
+
+    def __init__(self, text, created_at, size, embedding=None):
+        self.text = text
+        self.created_at = created_at
+        self.size = size
+        self.embedding = embedding
+
+
+class ResponseCache:
+    """LRU/TTL cache of answers keyed by persona and normalized question
+
+    An exact-match lookup always runs first. When embed_fn is given, a miss on a
+    question of at least min_semantic_words words falls back to the most similar
+    cached question for the same persona, if it is above similarity_threshold.
+    Embeddings are computed and compared outside the lock, against an index of
+    the persona's embedded entries only.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, ttl=DEFAULT_TTL_SECONDS, embed_fn=None,
+                 similarity_threshold=DEFAULT_SIMILARITY_THRESHOLD, min_semantic_words=DEFAULT_MIN_SEMANTIC_WORDS,
+                 clock=time.time):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.embed_fn = embed_fn
+        self.similarity_threshold = similarity_threshold
+        self.min_semantic_words = min_semantic_words
+        self.clock = clock
+        self.size = 0
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        # Keys of the entries with an embedding, per persona
+        self._embedded = {}
+        self._lock = threading.Lock()
+
+    def get(self, personality, question):
+        """Return the cached answer for a question, or None on a miss"""
+        key = (personality, normalize_question(question))
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                self.hits += 1
+                return entry.text
+
+        if self._semantic(key[1]):
+            text = self._semantic_lookup(personality, key[1])
+            if text is not None:
+                return text
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, personality, question, text):
+        """Store an answer, evicting the least recently used entries past the byte cap"""
+        key = (personality, normalize_question(question))
+        embedding = None
+        if self._semantic(key[1]):
+            try:
+                embedding = unit_vector(self.embed_fn(key[1]))
+            except Exception:
+                embedding = None
+        size = len(text.encode("utf-8")) + len(key[1]) + 8 * len(embedding or ())
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = CacheEntry(text, self.clock(), size, embedding)
+            self.size += size
+            if embedding is not None:
+                self._embedded.setdefault(personality, {})[key] = None
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        """Remove every cached answer"""
+        with self._lock:
+            self._entries.clear()
+            self._embedded.clear()
+            self.size = 0
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _semantic(self, question):
+        # Whether a question is long enough for the semantic tier
+        return self.embed_fn is not None and len(question.split()) >= self.min_semantic_words
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.size -= entry.size
+        if entry.embedding is not None:
+            embedded = self._embedded[key[0]]
+            del embedded[key]
+            if not embedded:
+                del self._embedded[key[0]]
+
+    def _lookup(self, key):
+        # Exact lookup; expired entries are dropped on access
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self.clock() - entry.created_at > self.ttl:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _semantic_lookup(self, personality, question):
+        try:
+            embedding = unit_vector(self.embed_fn(question))
+        except Exception:
+            return None
+        if embedding is None:
+            return None
+
+        with self._lock:
+            now = self.clock()
+            candidates = []
+            for key in self._embedded.get(personality, ()):
+                entry = self._entries[key]
+                if now - entry.created_at <= self.ttl:
+                    candidates.append((key, entry.embedding))
+        # Compare without the lock, so other sessions' lookups and stores aren't held up
+        best_key, best_score = None, self.similarity_threshold
+        for key, vector in candidates:
+            score = dot(embedding, vector)
+            if score >= best_score:
+                best_key, best_score = key, score
+        if best_key is None:
+            return None
+
+        with self._lock:
+            # The entry may have been evicted or replaced meanwhile
+            entry = self._lookup(best_key)
+            if entry is None:
+                return None
+            self.semantic_hits += 1
+            return entry.text
+
+
+# Process-wide response cache, created on first use
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Get the shared response cache, or None when RESPONSE_CACHE is disabled"""
+    global _response_cache
+    if os.getenv("RESPONSE_CACHE", "true").lower() in ("0", "false", "no"):
+        return None
+    with _response_cache_lock:
+        if _response_cache is None:
+            semantic = os.getenv("RESPONSE_CACHE_SEMANTIC", "false").lower() in ("1", "true", "yes")
+            _response_cache = ResponseCache(
+                max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+                ttl=int(os.getenv("RESPONSE_CACHE_TTL", DEFAULT_TTL_SECONDS)),
+                embed_fn=gemini_embedding if semantic else None,
+                similarity_threshold=float(os.getenv("RESPONSE_CACHE_SIMILARITY", DEFAULT_SIMILARITY_THRESHOLD)),
+                min_semantic_words=int(os.getenv("RESPONSE_CACHE_SEMANTIC_MIN_WORDS", DEFAULT_MIN_SEMANTIC_WORDS)),
+            )
+        return _response_cache
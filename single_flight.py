@@ -0,0 +1,157 @@
+import os
+import threading
+
+# Seconds a subscriber waits for the next chunk before giving up
+DEFAULT_WAIT_TIMEOUT = 60
+
+
+class Cancellation:
+    """Set when nobody is reading a flight any more; producers register callbacks to stop early"""
+
+    def __init__(self):
+        self.cancelled = False
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def add_callback(self, callback):
+        """Call callback on cancel(), or right away if already cancelled"""
+        with self._lock:
+            if not self.cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def cancel(self):
+        with self._lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+
+class Flight:
+    """One upstream call and the chunks it has produced so far"""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.condition = threading.Condition()
+        self.cancellation = Cancellation()
+
+
+class SingleFlight:
+    """Shares one streamed upstream call between concurrent identical requests
+
+    The first caller for a key starts the call on a worker thread. Everyone who
+    asks for the same key while it runs replays the chunks produced so far and
+    then follows along live. An upstream error is raised in every subscriber.
+    When every subscriber has stopped reading, the flight's Cancellation is
+    set so the producer can abort the call at once, and the worker closes it
+    after the next chunk otherwise. A leader that stops reading waits for the
+    worker to finish, since the call may use state the leader owns.
+    """
+
+    def __init__(self, timeout=DEFAULT_WAIT_TIMEOUT):
+        self.timeout = timeout
+        self.started = 0
+        self.shared = 0
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def stream(self, key, produce):
+        """Return (chunks, leader): an iterator over the shared call for key, and whether this caller started it
+
+        produce is called with the flight's Cancellation on the worker thread and must return an iterator of chunks.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            # A cancelled call is still shutting down; don't join it
+            leader = flight is None or flight.cancellation.cancelled
+            if leader:
+                flight = self._flights[key] = Flight()
+                self.started += 1
+            else:
+                self.shared += 1
+            with flight.condition:
+                flight.subscribers += 1
+        if leader:
+            threading.Thread(target=self._run, args=(key, flight, produce), name="single-flight", daemon=True).start()
+        return self._follow(flight, leader), leader
+
+    def in_flight(self):
+        """Number of upstream calls currently running"""
+        with self._lock:
+            return len(self._flights)
+
+    def _run(self, key, flight, produce):
+        error = None
+        chunks = None
+        try:
+            chunks = produce(flight.cancellation)
+            for chunk in chunks:
+                with flight.condition:
+                    flight.chunks.append(chunk)
+                    flight.condition.notify_all()
+                    if not flight.subscribers:
+                        break
+        except Exception as e:
+            error = e
+        finally:
+            # Later callers start a fresh call instead of joining a finished one
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            try:
+                if hasattr(chunks, "close"):
+                    chunks.close()
+            finally:
+                with flight.condition:
+                    flight.done = True
+                    flight.error = error
+                    flight.condition.notify_all()
+
+    def _follow(self, flight, leader=False):
+        index = 0
+        try:
+            while True:
+                with flight.condition:
+                    ready = flight.condition.wait_for(lambda: index < len(flight.chunks) or flight.done, self.timeout)
+                    if not ready:
+                        raise TimeoutError(f"No response from the shared request within {self.timeout:g}s")
+                    chunks = flight.chunks[index:]
+                    done, error = flight.done, flight.error
+                index += len(chunks)
+                yield from chunks
+                if done:
+                    if error is not None:
+                        raise error
+                    return
+        finally:
+            with flight.condition:
+                flight.subscribers -= 1
+                abandoned = not flight.subscribers and not flight.done
+            if abandoned:
+                flight.cancellation.cancel()
+            if leader:
+                with flight.condition:
+                    flight.condition.wait_for(lambda: flight.done, self.timeout)
+
+
+# Process-wide single-flight group, configured from the environment
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight():
+    """Get the shared single-flight group, or None when SINGLE_FLIGHT is disabled"""
+    global _single_flight
+    if os.getenv("SINGLE_FLIGHT", "true").lower() in ("0", "false", "no"):
+        return None
+    with _single_flight_lock:
+        if _single_flight is None:
+            _single_flight = SingleFlight(timeout=float(os.getenv("SINGLE_FLIGHT_TIMEOUT", DEFAULT_WAIT_TIMEOUT)))
+        return _single_flight
@@ -0,0 +1,55 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import admission
+import chat_engine
+import context_cache
+import conversation_store
+import generation_policy
+import history
+import model_backend
+import popular_topics
+import resilience
+import response_cache
+import single_flight
+import warmup
+
+# Process-wide singletons, reset so each test reads its own environment
+SINGLETONS = (
+    (admission, "_admission_controller"),
+    (admission, "_admission_configured"),
+    (chat_engine, "_chat_engine"),
+    (context_cache, "_context_cache"),
+    (conversation_store, "_conversation_cache"),
+    (generation_policy, "_generation_policy"),
+    (history, "_history_manager"),
+    (history, "_transcript_archive"),
+    (model_backend, "_model_backend"),
+    (popular_topics, "_topic_answers"),
+    (resilience, "_circuit_breaker"),
+    (resilience, "_retry_policy"),
+    (response_cache, "_response_cache"),
+    (single_flight, "_single_flight"),
+    (warmup, "_warmup"),
+)
+
+
+@pytest.fixture(autouse=True)
+def fake_env(monkeypatch, tmp_path):
+    """Answer every request with an instant fake model, storing conversations under tmp_path"""
+    monkeypatch.setenv("MODEL_BACKEND", "fake")
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    monkeypatch.setenv("FAKE_MODEL_TTFT", "0")
+    monkeypatch.setenv("FAKE_MODEL_TOKENS_PER_SECOND", "0")
+    monkeypatch.setenv("CONVERSATION_DB", str(tmp_path / "conversations.db"))
+    monkeypatch.setenv("POPULAR_TOPICS", "false")
+    monkeypatch.setenv("WARMUP", "false")
+    monkeypatch.setenv("RESPONSE_CACHE", "false")
+    for module, name in SINGLETONS:
+        monkeypatch.setattr(module, name, None)
+    return tmp_path
@@ -0,0 +1,124 @@
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, AdmissionTimeout, get_admission_controller, load_settings
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def advance(controller, clock, seconds):
+    """Move the clock on and wake the queued requests to notice"""
+    clock.now += seconds
+    with controller._condition:
+        controller._condition.notify_all()
+
+
+def queue(controller, session_id, admitted, tokens=100, on_wait=None):
+    """Start a thread acquiring for session_id and wait until it is queued"""
+    waiting = controller.waiting()
+
+    def run():
+        try:
+            controller.acquire(session_id, tokens, on_wait=on_wait)
+            admitted.append(session_id)
+        except AdmissionTimeout as e:
+            admitted.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    wait_until(lambda: controller.waiting() == waiting + 1)
+    return thread
+
+
+def test_session_over_its_limit_does_not_hold_up_others():
+    controller = AdmissionController(session_requests_per_minute=1, session_tokens_per_minute=0, max_wait=0)
+    controller.acquire("a", 100)
+    with pytest.raises(AdmissionTimeout):
+        controller.acquire("a", 100)
+    controller.acquire("b", 100)
+    assert (controller.admitted, controller.timed_out) == (2, 1)
+
+
+def test_queue_is_fair_across_sessions():
+    clock = Clock()
+    controller = AdmissionController(session_requests_per_minute=0, session_tokens_per_minute=0,
+                                     global_requests_per_minute=1, max_wait=1000, clock=clock)
+    controller.acquire("a", 100)
+    admitted = []
+    threads = [queue(controller, "a", admitted), queue(controller, "a", admitted), queue(controller, "b", admitted)]
+    for count in (1, 2, 3):
+        advance(controller, clock, 60)
+        wait_until(lambda: len(admitted) == count)
+    # b's first request goes ahead of a's second queued one
+    assert admitted == ["a", "b", "a"]
+    for thread in threads:
+        thread.join()
+
+
+def test_position_and_eta_callbacks():
+    clock = Clock()
+    controller = AdmissionController(session_requests_per_minute=0, session_tokens_per_minute=0,
+                                     global_requests_per_minute=1, max_wait=1000, clock=clock)
+    controller.acquire("a", 100)
+    admitted, first, second = [], [], []
+    queue(controller, "b", admitted, on_wait=lambda position, eta: first.append((position, eta)))
+    queue(controller, "c", admitted, on_wait=lambda position, eta: second.append((position, eta)))
+    advance(controller, clock, 0)
+    wait_until(lambda: first and second)
+    assert first[0] == (1, 60.0)
+    assert second[0] == (2, 120.0)
+    advance(controller, clock, 60)
+    wait_until(lambda: admitted == ["b"])
+    assert first[-1] == (None, 0)
+    advance(controller, clock, 0)
+    wait_until(lambda: second[-1] == (1, 60.0))
+
+
+def test_queued_request_times_out():
+    clock = Clock()
+    controller = AdmissionController(session_requests_per_minute=1, session_tokens_per_minute=0, max_wait=30, clock=clock)
+    controller.acquire("a", 100)
+    admitted = []
+    queue(controller, "a", admitted)
+    advance(controller, clock, 31)
+    wait_until(lambda: admitted)
+    assert isinstance(admitted[0], AdmissionTimeout)
+    assert admitted[0].waited == 31
+    assert controller.waiting() == 0
+    assert controller.timed_out == 1
+
+
+def test_environment_overrides_config(monkeypatch, tmp_path):
+    config = tmp_path / "config.toml"
+    config.write_text("[admission]\nsession_requests_per_minute = 5\nmax_wait = 30\n")
+    monkeypatch.setenv("ADMISSION_MAX_WAIT", "10")
+    assert load_settings(str(config)) == {"session_requests_per_minute": 5, "max_wait": "10"}
+    assert load_settings(str(tmp_path / "missing.toml")) == {"max_wait": "10"}
+
+
+def test_environment_configures_controller(monkeypatch):
+    monkeypatch.setenv("GLOBAL_REQUESTS_PER_MINUTE", "30")
+    monkeypatch.setenv("ADMISSION_MAX_WAIT", "10")
+    controller = get_admission_controller()
+    assert controller.max_wait == 10
+    assert controller.global_limits.buckets[0][0].capacity == 30
+
+
+def test_admission_can_be_disabled(monkeypatch):
+    monkeypatch.setenv("ADMISSION_CONTROL", "false")
+    assert get_admission_controller() is None
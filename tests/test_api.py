@@ -0,0 +1,91 @@
+import asyncio
+import json
+
+import admission
+from admission import AdmissionController
+from api import ChatApi
+from chat_engine import get_chat_engine
+from model_backend import get_model_backend
+from resilience import get_circuit_breaker
+
+QUESTION = "How do I defend against a Hog Rider push?"
+
+
+def call(path, payload=None, method="POST"):
+    """The status and body of one request to the API"""
+    body = json.dumps(payload).encode() if payload is not None else b""
+
+    async def run():
+        sent = []
+        requests = [{"type": "http.request", "body": body, "more_body": False}]
+
+        async def receive():
+            if requests:
+                return requests.pop()
+            # Stay connected until the response is finished
+            await asyncio.Event().wait()
+
+        async def send(message):
+            sent.append(message)
+
+        await ChatApi()({"type": "http", "method": method, "path": path}, receive, send)
+        return sent
+
+    sent = asyncio.run(run())
+    return sent[0]["status"], b"".join(message.get("body", b"") for message in sent[1:]).decode()
+
+
+def events(body):
+    """(event, data) pairs of a Server-Sent Events body"""
+    parsed = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        parsed.append((lines["event"], json.loads(lines["data"])))
+    return parsed
+
+
+def fail_upstream(monkeypatch):
+    monkeypatch.setenv("RETRY_MAX_ATTEMPTS", "1")
+    client = get_model_backend().client
+    client.config = client.config._replace(error_rate=1.0)
+
+
+def test_json_reply():
+    status, body = call("/v1/chat", {"message": QUESTION, "session_id": "api-ok", "stream": False})
+    assert status == 200
+    assert json.loads(body)["reply"].startswith("Fake answer")
+
+
+def test_upstream_error_is_bad_gateway(monkeypatch):
+    fail_upstream(monkeypatch)
+    status, body = call("/v1/chat", {"message": QUESTION, "session_id": "api-502", "stream": False})
+    assert status == 502
+    assert "overloaded" in json.loads(body)["error"]
+    # The failed turn is not recorded as an answer
+    assert get_chat_engine().get_conversation("api-502").messages == []
+
+
+def test_open_circuit_is_service_unavailable():
+    get_circuit_breaker().open_for(60)
+    status, body = call("/v1/chat", {"message": QUESTION, "session_id": "api-503", "stream": False})
+    assert status == 503
+    assert "busy" in json.loads(body)["error"]
+
+
+def test_admission_timeout_is_too_many_requests(monkeypatch):
+    monkeypatch.setattr(admission, "_admission_configured", True)
+    monkeypatch.setattr(admission, "_admission_controller", AdmissionController(session_requests_per_minute=1, max_wait=0))
+    payload = {"message": QUESTION, "session_id": "api-429", "stream": False}
+    assert call("/v1/chat", payload)[0] == 200
+    status, body = call("/v1/chat", dict(payload, message="Which cards counter Balloon?"))
+    assert status == 429
+    assert len(get_chat_engine().get_conversation("api-429").messages) == 2
+
+
+def test_stream_ends_with_error_event(monkeypatch):
+    fail_upstream(monkeypatch)
+    status, body = call("/v1/chat", {"message": QUESTION, "session_id": "api-sse"})
+    assert status == 200
+    sent = events(body)
+    assert [event for event, _ in sent] == ["start", "error"]
+    assert sent[-1][1]["status"] == 502
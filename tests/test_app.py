@@ -0,0 +1,51 @@
+import os
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from conftest import ROOT
+from model_backend import FakeBackend
+
+APP_PATH = os.path.join(ROOT, "app.py")
+
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    monkeypatch.setenv("TRANSCRIPT_ARCHIVE_DIR", str(tmp_path / "archive"))
+    return AppTest.from_file(APP_PATH, default_timeout=60)
+
+
+def test_unsafe_session_parameter_gets_a_new_session(app):
+    app.query_params["session"] = "../../outside"
+    app.run()
+    assert app.session_state["session_id"] != "../../outside"
+    assert len(app.session_state["session_id"]) == 32
+
+
+def test_session_parameter_reopens_the_session(app):
+    app.query_params["session"] = "my-session_1"
+    app.run()
+    assert app.session_state["session_id"] == "my-session_1"
+
+
+def test_models_are_built_once_across_reruns(app, monkeypatch):
+    built = []
+    create_model = FakeBackend.create_model
+
+    def counting_create_model(self, model_name, **kwargs):
+        built.append(model_name)
+        return create_model(self, model_name, **kwargs)
+
+    monkeypatch.setattr(FakeBackend, "create_model", counting_create_model)
+    app.run()
+    app.chat_input[0].set_value("How do I defend against a Hog Rider push?").run()
+    assert len(built) == 1
+    for _ in range(3):
+        app.run()
+    app.chat_input[0].set_value("What should I do when I'm behind on elixir?").run()
+    assert len(built) == 1
+    # A new persona builds its own model once
+    app.radio[0].set_value(next(option for option in app.radio[0].options if option.endswith("Professional"))).run()
+    app.chat_input[0].set_value("How do I defend against a Hog Rider push?").run()
+    app.run()
+    assert len(built) == 2
@@ -0,0 +1,48 @@
+import pytest
+
+from google.generativeai import protos
+
+from chat_engine import get_ai_response, get_chat_engine, start_chat, BLOCKED_MESSAGE
+from fake_model import FakeClient, make_response
+from metrics import BLOCKED
+from model_backend import get_model_backend
+
+
+@pytest.mark.parametrize("async_backend", ["true", "false"])
+def test_blocked_retry_is_not_recorded(monkeypatch, async_backend):
+    monkeypatch.setenv("ASYNC_BACKEND", async_backend)
+    monkeypatch.setenv("FAKE_MODEL_BLOCK_RATE", "1")
+    chat = start_chat(get_chat_engine().get_model("Friendly"))
+    answer = get_ai_response(chat, "How should I defend against a double push in overtime?")
+    assert answer == f"Error: {BLOCKED_MESSAGE}"
+    assert chat.history == []
+
+
+def test_blocked_retry_keeps_the_conversation_usable(monkeypatch):
+    monkeypatch.setenv("FAKE_MODEL_BLOCK_RATE", "1")
+    engine = get_chat_engine()
+    conversation = engine.get_conversation("blocked-test")
+    assert engine.reply(conversation, "How should I defend against a double push in overtime?").startswith("Error:")
+    client = get_model_backend().client
+    client.config = client.config._replace(block_rate=0.0)
+    answer = engine.reply(conversation, "How do I play a beatdown deck when I'm behind on elixir?")
+    assert answer.startswith("Fake answer")
+    assert all(content.parts and content.parts[0].text for content in conversation.chat.history)
+
+
+@pytest.mark.parametrize("async_backend", ["true", "false"])
+def test_stream_blocked_midway_is_counted_once(monkeypatch, async_backend):
+    monkeypatch.setenv("ASYNC_BACKEND", async_backend)
+
+    def chunks(self, request, words, blocked):
+        yield 0, make_response("Hog Rider is a ", protos.Candidate.FinishReason.FINISH_REASON_UNSPECIFIED, 10, 4)
+        yield 0, make_response("", protos.Candidate.FinishReason.SAFETY, 10, 4)
+
+    monkeypatch.setattr(FakeClient, "chunks", chunks)
+    before = {reason: BLOCKED.value(reason=reason) for reason in ("SAFETY", "BrokenResponseError", "StopCandidateException")}
+    chat = start_chat(get_chat_engine().get_model("Friendly"))
+    answer = get_ai_response(chat, "How should I defend against a double push in overtime?")
+    assert answer == "Hog Rider is a "
+    after = {reason: BLOCKED.value(reason=reason) for reason in before}
+    assert sum(after.values()) - sum(before.values()) == 1
+    assert [content.parts[0].text for content in chat.history] == ["How should I defend against a double push in overtime?", "Hog Rider is a "]
@@ -0,0 +1,76 @@
+from chat_engine import get_ai_response, get_chat_engine, start_chat
+from context_cache import ContextCache
+from fake_model import FakeCacheService
+from model_backend import get_model_backend
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(ttl=3600, refresh_margin=300):
+    clock = Clock()
+    service = FakeCacheService(clock)
+    return ContextCache(client=service, ttl=ttl, refresh_margin=refresh_margin, clock=clock), service, clock
+
+
+def test_prompt_is_uploaded_once_per_persona_and_model():
+    cache, service, clock = make_cache()
+    first = cache.get("Friendly", "gemini-2.5-flash")
+    clock.now += 1000
+    assert cache.get("Friendly", "models/gemini-2.5-flash") is first
+    assert first.model == "models/gemini-2.5-flash"
+    assert cache.get("Humorous", "gemini-2.5-flash") is not first
+    assert (service.created, service.updated) == (2, 0)
+
+
+def test_ttl_is_extended_within_the_refresh_margin():
+    cache, service, clock = make_cache()
+    first = cache.get("Friendly", "gemini-2.5-flash")
+    clock.now += 3600 - 200
+    assert cache.get("Friendly", "gemini-2.5-flash") is first
+    assert (service.created, service.updated) == (1, 1)
+    # The extended content outlives the original TTL
+    clock.now += 3000
+    assert cache.get("Friendly", "gemini-2.5-flash") is first
+    assert service.live() == [first.name]
+
+
+def test_expired_prompt_is_uploaded_again():
+    cache, service, clock = make_cache()
+    first = cache.get("Friendly", "gemini-2.5-flash")
+    clock.now += 3600
+    second = cache.get("Friendly", "gemini-2.5-flash")
+    assert second.name != first.name
+    assert (service.created, service.updated) == (2, 0)
+    assert service.live() == [second.name]
+
+
+def test_prompt_deleted_upstream_is_uploaded_again_on_refresh():
+    cache, service, clock = make_cache()
+    first = cache.get("Friendly", "gemini-2.5-flash")
+    service.delete(first.name)
+    clock.now += 3600 - 200
+    second = cache.get("Friendly", "gemini-2.5-flash")
+    assert second.name != first.name
+    assert service.live() == [second.name]
+
+
+def test_clear_deletes_every_prompt():
+    cache, service, clock = make_cache()
+    cache.get("Friendly", "gemini-2.5-flash")
+    cache.get("Professional", "gemini-2.5-flash")
+    cache.clear()
+    assert service.live() == []
+
+
+def test_engine_answers_from_cached_prompt(monkeypatch):
+    monkeypatch.setenv("GEMINI_CONTEXT_CACHE", "true")
+    model = get_chat_engine().get_model("Friendly")
+    assert model.cached_content in get_model_backend().cache_service.live()
+    answer = get_ai_response(start_chat(model), "How do I beat a Golem beatdown deck?")
+    assert answer.startswith("Fake answer")
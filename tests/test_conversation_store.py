@@ -0,0 +1,37 @@
+import time
+
+from chat_engine import get_chat_engine
+from conversation_store import ConversationStore, get_conversation_cache
+
+
+def test_turn_reaches_store():
+    engine = get_chat_engine()
+    assert engine.conversations is get_conversation_cache()
+    conversation = engine.get_conversation("store-test")
+    answer = "".join(engine.stream_turn(conversation, "How do I defend against a Hog Rider push?"))
+    store = engine.conversations.store
+    store.flush()
+    assert store.count("store-test") == 2
+    assert [message["content"] for message in store.load("store-test")] == ["How do I defend against a Hog Rider push?", answer]
+
+
+def test_evicted_conversation_is_rehydrated():
+    engine = get_chat_engine()
+    conversation = engine.get_conversation("evict-test")
+    "".join(engine.stream_turn(conversation, "Which cards counter Balloon?"))
+    engine.conversations.idle_seconds = 0
+    assert engine.conversations.evict_idle() == 1
+    rehydrated = engine.get_conversation("evict-test")
+    assert rehydrated is not conversation
+    assert [dict(message) for message in rehydrated.messages] == [dict(message) for message in conversation.messages]
+
+
+def test_flush_waits_only_for_the_session(tmp_path):
+    # The writer holds the first write for up to flush_interval while it gathers a batch
+    store = ConversationStore(str(tmp_path / "flush.db"), batch_size=1000, flush_interval=2.0)
+    store.append("busy", 0, {"role": "user", "content": "still queued"})
+    started = time.monotonic()
+    store.flush("idle")
+    assert time.monotonic() - started < 1.0
+    store.flush("busy")
+    assert store.count("busy") == 1
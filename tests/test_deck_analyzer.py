@@ -0,0 +1,30 @@
+import pytest
+
+from deck_analyzer import answer_deck_question
+
+DECK = "Hog Rider, Musketeer, Ice Spirit, Skeletons, Cannon, Fireball, The Log, Ice Golem"
+ELIXIR_DECK = "Elixir Golem, Elixir Collector, Battle Healer, Night Witch, Electro Dragon, Tornado, Zap, Barbarian Barrel"
+
+
+@pytest.mark.parametrize("question", [
+    f"Give me a strategy for {DECK}",
+    f"What should I replace in {DECK}?",
+    f"Can I swap something in {DECK} to improve it?",
+    f"How do I play {DECK}?",
+    f"Any tips for {ELIXIR_DECK} against air decks?",
+    f"{DECK.lower()} - is this deck good vs lavaloon?",
+    f"Why does {DECK} lose so much?",
+])
+def test_advice_questions_go_to_the_model(question):
+    assert answer_deck_question(question) is None
+
+
+@pytest.mark.parametrize("question", [
+    DECK,
+    f"Rate my deck: {DECK}",
+    f"What's the average elixir of {DECK}?",
+    f"What archetype is {ELIXIR_DECK}?",
+    f"How much elixir is {DECK}?",
+])
+def test_stat_questions_are_answered_locally(question):
+    assert answer_deck_question(question) is not None
@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+
+from generation_policy import GenerationPolicy, THINKING_MIN_OUTPUT_TOKENS, is_thinking_model
+from intent_router import classify
+
+
+def test_thinking_models():
+    assert is_thinking_model("gemini-2.5-flash")
+    assert is_thinking_model("models/gemini-2.5-pro")
+    assert is_thinking_model(None)
+    assert not is_thinking_model("gemini-2.5-flash-lite")
+    assert not is_thinking_model("models/gemini-2.0-flash")
+
+
+def test_thinking_model_budget_has_a_floor():
+    plan = GenerationPolicy().plan("Is Sparky good?", classify("Is Sparky good?"), "Humorous", "gemini-2.5-flash")
+    assert plan.max_output_tokens == THINKING_MIN_OUTPUT_TOKENS
+    assert plan.model_name is None
+
+
+def test_light_model_gets_the_small_budget():
+    policy = GenerationPolicy(light_model="gemini-2.5-flash-lite")
+    plan = policy.plan("Is Sparky good?", classify("Is Sparky good?"), "Humorous", "gemini-2.5-flash")
+    assert plan.max_output_tokens < THINKING_MIN_OUTPUT_TOKENS
+    assert plan.model_name == "gemini-2.5-flash-lite"
+    assert plan.stop_sequences
+
+
+def test_light_thinking_model_keeps_the_floor():
+    policy = GenerationPolicy(light_model="gemini-2.5-flash")
+    plan = policy.plan("Is Sparky good?", classify("Is Sparky good?"), None, "gemini-2.5-pro")
+    assert plan.max_output_tokens == THINKING_MIN_OUTPUT_TOKENS
+
+
+def test_record_counts_thinking_tokens():
+    policy = GenerationPolicy()
+    plan = policy.plan("Is Sparky good?", classify("Is Sparky good?"), None, "gemini-2.5-flash")
+    usage = SimpleNamespace(prompt_token_count=100, candidates_token_count=200, total_token_count=900)
+    finish = SimpleNamespace(finish_reason=SimpleNamespace(name="STOP"))
+    policy.record(plan, SimpleNamespace(usage_metadata=usage, candidates=[finish]))
+    assert policy.report()[plan.intent]["mean_output_tokens"] == 800
@@ -0,0 +1,19 @@
+import pytest
+
+from history import TranscriptArchive, valid_session_id
+
+
+@pytest.mark.parametrize("session_id", ["../../x", "a/b", "", "x" * 65, None, "..", "a.b"])
+def test_archive_rejects_unsafe_session_ids(tmp_path, session_id):
+    archive = TranscriptArchive(str(tmp_path / "archive"), max_messages=1)
+    assert not valid_session_id(session_id)
+    with pytest.raises(ValueError):
+        archive.page_out(session_id, [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}])
+
+
+def test_archive_pages_out_to_its_directory(tmp_path):
+    archive = TranscriptArchive(str(tmp_path / "archive"), max_messages=1)
+    kept = archive.page_out("abc-123_X", [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}])
+    assert kept == [{"role": "assistant", "content": "hello"}]
+    assert archive.load("abc-123_X", 0, 1) == [{"role": "user", "content": "hi"}]
+    assert (tmp_path / "archive" / "abc-123_X.jsonl").exists()
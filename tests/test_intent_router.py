@@ -0,0 +1,27 @@
+import pytest
+
+from intent_router import classify
+
+
+def test_card_lookup_uses_the_right_article():
+    assert classify("How much elixir is P.E.K.K.A?").answer.endswith("It's an Epic troop.")
+    assert classify("How much elixir does Miner cost?").answer.endswith("It's a Legendary troop.")
+    assert classify("What's the elixir cost of Fireball?").answer.endswith("It's a Rare spell.")
+
+
+@pytest.mark.parametrize("question", [
+    "How much does Miner damage the tower?",
+    "How much does it cost to upgrade Hog Rider to level 14?",
+    "How much gold does a Legendary like Miner need?",
+])
+def test_other_how_much_questions_go_to_the_model(question):
+    assert classify(question).answer is None
+
+
+@pytest.mark.parametrize("question", [
+    "How much does Sparky cost?",
+    "How rare is Miner?",
+    "What rarity is Mega Knight?",
+])
+def test_cost_and_rarity_questions_are_answered_locally(question):
+    assert classify(question).intent == "card_lookup"
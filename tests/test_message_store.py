@@ -0,0 +1,41 @@
+import zlib
+
+from conversation_store import Conversation
+from message_store import MIN_COMPRESS_BYTES, Message
+
+
+def test_compressed_message_reads_like_a_dict():
+    message = Message("assistant", "Hog Rider cycle " * 100)
+    message.compress()
+    assert message.compressed
+    assert message["role"] == "assistant"
+    assert dict(message) == {"role": "assistant", "content": "Hog Rider cycle " * 100}
+
+
+def test_short_text_in_bytes_is_compressed_by_its_encoded_size():
+    # Fewer characters than MIN_COMPRESS_BYTES, but more bytes
+    text = "🏰👑⚔️" * (MIN_COMPRESS_BYTES // 6)
+    assert len(text) < MIN_COMPRESS_BYTES <= len(text.encode("utf-8"))
+    message = Message("assistant", text)
+    message.compress()
+    assert message.compressed
+    assert message.content == text
+
+
+def test_non_ascii_text_is_compared_in_bytes():
+    # Compresses to more bytes than it has characters, but fewer than its UTF-8 size
+    text = "".join(chr(0x4E00 + (i * 7919) % 20000) for i in range(600))
+    assert len(text) < len(zlib.compress(text.encode("utf-8"))) < len(text.encode("utf-8"))
+    message = Message("assistant", text)
+    message.compress()
+    assert message.compressed
+    assert message.content == text
+
+
+def test_answers_outside_the_window_are_compressed(monkeypatch):
+    monkeypatch.setenv("CHAT_RENDER_WINDOW", "4")
+    conversation = Conversation("window-test")
+    for turn in range(5):
+        conversation.add("user", f"Question {turn}?")
+        conversation.add("assistant", f"Answer {turn}: " + "Use Log on Goblin Gang. " * 40)
+    assert [message.compressed for message in conversation.messages] == [False, True] * 3 + [False] * 4
@@ -0,0 +1,146 @@
+import asyncio
+
+from google.api_core import exceptions as api_exceptions
+from google.generativeai import protos
+
+from fake_model import FakeAsyncClient, FakeClient, FakeModelConfig
+from metrics import POOL_FAILOVERS
+from model_backend import get_model_backend
+from model_pool import Endpoint, ModelPool
+
+CONFIG = FakeModelConfig(ttft=0, tokens_per_second=0)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class DroppedStreams:
+    """A client whose streams fail before their first chunk, as a dropped connection does"""
+
+    def stream_generate_content(self, request, **kwargs):
+        def stream():
+            raise api_exceptions.ServiceUnavailable("Connection reset")
+            yield
+
+        return stream()
+
+
+class DroppedAsyncStreams:
+    """Async counterpart of DroppedStreams"""
+
+    async def stream_generate_content(self, request, **kwargs):
+        async def stream():
+            raise api_exceptions.ServiceUnavailable("Connection reset")
+            yield
+
+        return stream()
+
+
+def request(max_output_tokens=512):
+    return protos.GenerateContentRequest(generation_config=protos.GenerationConfig(max_output_tokens=max_output_tokens))
+
+
+def endpoint(name, max_output_tokens=None):
+    return Endpoint(name, max_output_tokens=max_output_tokens, client=FakeClient(CONFIG), async_client=FakeAsyncClient(FakeClient(CONFIG)))
+
+
+def make_pool(*names, clock=None):
+    endpoints = [endpoint(name) for name in names]
+    return ModelPool(endpoints, cooldown=60, error_cooldown=5, clock=clock or Clock())
+
+
+def ranked(pool, max_output_tokens=512):
+    return [endpoint.model_name for endpoint in pool.rank(request(max_output_tokens))]
+
+
+def test_ranking_follows_moving_average_latency():
+    pool = make_pool("fast", "slow", "new")
+    fast, slow, new = pool.endpoints
+    for endpoint, latency in ((fast, 1.0), (slow, 2.0)):
+        pool.start(endpoint, request())
+        pool.succeeded(endpoint, latency)
+    # Untried endpoints go first so each one gets measured
+    assert ranked(pool) == ["models/new", "models/fast", "models/slow"]
+    for latency in (4.0, 4.0):
+        pool.start(new, request())
+        pool.succeeded(new, latency)
+    assert new.latency == 4.0
+    # One slow response moves the average a fifth of the way
+    pool.start(fast, request())
+    pool.succeeded(fast, 11.0)
+    assert fast.latency == 3.0
+    assert ranked(pool) == ["models/slow", "models/fast", "models/new"]
+
+
+def test_failures_inflate_the_score():
+    pool = make_pool("flaky", "steady")
+    flaky, steady = pool.endpoints
+    for endpoint in pool.endpoints:
+        pool.start(endpoint, request())
+        pool.succeeded(endpoint, 1.0)
+    pool.start(flaky, request())
+    assert pool.failed(flaky, ValueError("Bad request")) is False
+    assert flaky.error_rate == 0.0
+    pool.start(flaky, request())
+    pool.failed(flaky, api_exceptions.InternalServerError("Oops"))
+    # Ranked by score again once the cooldown is over
+    pool.clock.now += 5
+    assert flaky.error_rate > 0
+    assert ranked(pool) == ["models/steady", "models/flaky"]
+
+
+def test_cooldown_after_quota_and_transient_errors():
+    clock = Clock()
+    pool = make_pool("primary", "backup", clock=clock)
+    primary, backup = pool.endpoints
+    pool.start(primary, request())
+    pool.failed(primary, api_exceptions.ResourceExhausted("Quota exceeded, retry in 30s"))
+    assert ranked(pool) == ["models/backup", "models/primary"]
+    clock.now += 30
+    assert primary.available(clock.now)
+    pool.start(backup, request())
+    pool.failed(backup, api_exceptions.ServiceUnavailable("Overloaded"))
+    assert ranked(pool)[0] == "models/primary"
+    clock.now += 5
+    assert backup.available(clock.now)
+    assert pool.report()[0]["cooldown"] == 0.0
+
+
+def test_capped_endpoints_only_take_short_requests():
+    pool = ModelPool([endpoint("light", max_output_tokens=256), endpoint("full")], clock=Clock())
+    assert ranked(pool, 128) == ["models/light", "models/full"]
+    assert ranked(pool, 1024) == ["models/full"]
+
+
+def test_stream_fails_over_on_first_chunk():
+    pool = make_pool("primary", "backup")
+    primary, backup = pool.endpoints
+    primary._client = DroppedStreams()
+    before = POOL_FAILOVERS.value()
+    model = pool.attach(get_model_backend().create_model("gemini-2.5-flash"))
+    response = model.generate_content("Which cards counter Balloon?", stream=True)
+    response.resolve()
+    assert response.text.startswith("Fake answer")
+    assert POOL_FAILOVERS.value() == before + 1
+    assert not primary.available(pool.clock())
+    assert backup.latency is not None
+
+
+def test_async_stream_fails_over_on_first_chunk():
+    pool = make_pool("primary", "backup")
+    primary, backup = pool.endpoints
+    primary._async_client = DroppedAsyncStreams()
+    model = pool.attach(get_model_backend().create_model("gemini-2.5-flash"))
+
+    async def answer():
+        response = await model.generate_content_async("Which cards counter Balloon?", stream=True)
+        await response.resolve()
+        return response.text
+
+    assert asyncio.run(answer()).startswith("Fake answer")
+    assert not primary.available(pool.clock())
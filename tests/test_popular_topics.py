@@ -0,0 +1,35 @@
+import threading
+import time
+
+from intent_router import get_intent_stats
+from popular_topics import POPULAR_TOPICS, TopicAnswers, generate_answer
+
+
+def test_background_answers_stay_out_of_the_traffic_report():
+    before = get_intent_stats().report()["total"]
+    answer = generate_answer("Friendly", POPULAR_TOPICS[0].question)
+    assert answer.startswith("Fake answer")
+    assert get_intent_stats().report()["total"] == before
+
+
+def test_refresh_spaces_out_model_calls():
+    calls = []
+
+    def generate(personality, question):
+        calls.append(time.monotonic())
+        return f"{personality}: {question}"
+
+    topics = TopicAnswers(topics=POPULAR_TOPICS[:2], generate=generate, spacing=0.05)
+    assert topics.refresh()
+    assert topics.missing() == 0
+    assert all(later - earlier >= 0.05 for earlier, later in zip(calls, calls[1:]))
+
+
+def test_stop_interrupts_the_spacing():
+    topics = TopicAnswers(generate=lambda personality, question: "answer", spacing=60)
+    result = []
+    thread = threading.Thread(target=lambda: result.append(topics.refresh()))
+    thread.start()
+    topics.stop()
+    thread.join(timeout=5)
+    assert result == [False]
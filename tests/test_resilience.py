@@ -0,0 +1,122 @@
+import pytest
+from google.api_core import exceptions as api_exceptions
+
+from resilience import CircuitBreaker, CircuitOpenError, RetryPolicy, call_with_retry
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def open_breaker(clock, reset_timeout=30):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=reset_timeout, clock=clock)
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+
+def test_breaker_opens_after_threshold():
+    clock = Clock()
+    breaker = open_breaker(clock)
+    with pytest.raises(CircuitOpenError) as raised:
+        breaker.check()
+    assert raised.value.retry_in == 30
+    clock.now += 10
+    with pytest.raises(CircuitOpenError):
+        breaker.peek()
+
+
+def test_half_open_lets_one_probe_through():
+    clock = Clock()
+    breaker = open_breaker(clock)
+    clock.now += 30
+    breaker.check()
+    assert breaker.state == "half_open"
+    for _ in range(3):
+        with pytest.raises(CircuitOpenError):
+            breaker.check()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.check()
+    breaker.check()
+
+
+def test_failed_probe_opens_the_breaker_again():
+    clock = Clock()
+    breaker = open_breaker(clock)
+    clock.now += 30
+    breaker.check()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock.now += 29
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    clock.now += 1
+    breaker.check()
+    assert breaker.state == "half_open"
+
+
+def test_peek_does_not_take_the_probe():
+    clock = Clock()
+    breaker = open_breaker(clock)
+    clock.now += 30
+    breaker.peek()
+    breaker.peek()
+    breaker.check()
+    with pytest.raises(CircuitOpenError):
+        breaker.peek()
+
+
+def test_probe_that_never_reports_is_replaced():
+    clock = Clock()
+    breaker = open_breaker(clock)
+    clock.now += 30
+    breaker.check()
+    clock.now += 30
+    breaker.check()
+    assert breaker.state == "half_open"
+
+
+def test_short_retry_after_hint_is_waited_out():
+    policy = RetryPolicy(max_attempts=3, base_delay=0.0, max_delay=8.0)
+    assert policy.delay(0, api_exceptions.ResourceExhausted("Quota exceeded. Please retry in 5s")) == 5.0
+
+
+def test_long_retry_after_hint_stops_retrying_and_opens_the_breaker():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=10, clock=clock)
+    policy = RetryPolicy(max_attempts=3, base_delay=0.0, max_delay=8.0)
+    calls = []
+
+    def make_call():
+        calls.append(clock.now)
+        raise api_exceptions.ResourceExhausted("Quota exceeded. Please retry in 30s")
+
+    assert policy.delay(0, api_exceptions.ResourceExhausted("Please retry in 30s")) is None
+    with pytest.raises(api_exceptions.ResourceExhausted):
+        call_with_retry(make_call, policy, breaker)
+    assert len(calls) == 1
+    clock.now += 29
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    clock.now += 1
+    breaker.check()
+
+
+def test_transient_errors_are_retried_until_success():
+    breaker = CircuitBreaker(clock=Clock())
+    policy = RetryPolicy(max_attempts=3, base_delay=0.0, max_delay=0.0)
+    results = iter([api_exceptions.ServiceUnavailable("down"), "answer"])
+
+    def make_call():
+        result = next(results)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    assert call_with_retry(make_call, policy, breaker) == "answer"
+    assert breaker.state == "closed" and breaker.failures == 0
@@ -0,0 +1,107 @@
+from google.generativeai import protos
+
+from chat_engine import get_ai_response, get_chat_engine, start_chat
+from fake_model import FakeClient, make_response
+from response_cache import ResponseCache, get_response_cache
+
+QUESTION = "How do I defend against a Hog Rider push?"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Embeddings:
+    """Embeds questions by keyword, counting the calls and checking the cache isn't locked meanwhile"""
+
+    def __init__(self):
+        self.calls = 0
+        self.cache = None
+
+    def __call__(self, text):
+        self.calls += 1
+        assert not self.cache._lock.locked()
+        return [1.0 if "hog" in text else 0.0, 1.0 if "balloon" in text else 0.0, 0.1]
+
+
+def test_hits_and_misses():
+    cache = ResponseCache(clock=Clock())
+    assert cache.get("Friendly", QUESTION) is None
+    cache.put("Friendly", QUESTION, "Use a Cannon.")
+    assert cache.get("Friendly", "how do i defend against a hog rider push") == "Use a Cannon."
+    assert cache.get("Professional", QUESTION) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 1)
+
+
+def test_entries_expire_after_ttl():
+    clock = Clock()
+    cache = ResponseCache(ttl=60, clock=clock)
+    cache.put("Friendly", QUESTION, "Use a Cannon.")
+    clock.now += 60
+    assert cache.get("Friendly", QUESTION) == "Use a Cannon."
+    clock.now += 1
+    assert cache.get("Friendly", QUESTION) is None
+    assert cache.stats()["bytes"] == 0
+
+
+def test_least_recently_used_is_evicted_past_byte_cap():
+    cache = ResponseCache(max_bytes=120, clock=Clock())
+    cache.put("Friendly", "first question", "a" * 40)
+    cache.put("Friendly", "second question", "b" * 40)
+    assert cache.get("Friendly", "first question") is not None
+    cache.put("Friendly", "third question", "c" * 40)
+    assert cache.get("Friendly", "second question") is None
+    assert cache.get("Friendly", "first question") is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] <= 120
+    # An answer larger than the whole cache is not stored
+    cache.put("Friendly", "huge question", "d" * 200)
+    assert cache.get("Friendly", "huge question") is None
+
+
+def test_semantic_match_per_persona():
+    embeddings = Embeddings()
+    cache = embeddings.cache = ResponseCache(embed_fn=embeddings, clock=Clock())
+    cache.put("Friendly", QUESTION, "Use a Cannon.")
+    assert cache.get("Friendly", "What stops a Hog Rider push best?") == "Use a Cannon."
+    assert cache.get("Friendly", "What stops a Balloon push best?") is None
+    assert cache.get("Professional", "What stops a Hog Rider push best?") is None
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_short_questions_skip_semantic_tier():
+    embeddings = Embeddings()
+    cache = embeddings.cache = ResponseCache(embed_fn=embeddings, clock=Clock())
+    cache.put("Friendly", "hog counters", "Use a Cannon.")
+    assert cache.get("Friendly", "hog rider counters") is None
+    assert embeddings.calls == 0
+
+
+def test_evicted_entries_leave_semantic_index():
+    clock = Clock()
+    embeddings = Embeddings()
+    cache = embeddings.cache = ResponseCache(ttl=60, embed_fn=embeddings, clock=clock)
+    cache.put("Friendly", QUESTION, "Use a Cannon.")
+    clock.now += 61
+    assert cache.get("Friendly", QUESTION) is None
+    assert cache.get("Friendly", "What stops a Hog Rider push best?") is None
+    cache.clear()
+    assert cache._embedded == {}
+
+
+def test_stream_blocked_midway_is_not_cached(monkeypatch):
+    monkeypatch.setenv("RESPONSE_CACHE", "true")
+
+    def chunks(self, request, words, blocked):
+        yield 0, make_response("Hog Rider is a ", protos.Candidate.FinishReason.FINISH_REASON_UNSPECIFIED, 10, 4)
+        yield 0, make_response("", protos.Candidate.FinishReason.SAFETY, 10, 4)
+
+    monkeypatch.setattr(FakeClient, "chunks", chunks)
+    chat = start_chat(get_chat_engine().get_model("Friendly"))
+    assert get_ai_response(chat, QUESTION, "Friendly") == "Hog Rider is a "
+    assert get_response_cache().get("Friendly", QUESTION) is None
@@ -0,0 +1,63 @@
+import threading
+import time
+
+from chat_engine import get_chat_engine
+from single_flight import SingleFlight, get_single_flight
+
+
+def test_abandoned_flight_is_cancelled_at_once():
+    group = SingleFlight(timeout=30)
+    unblock = threading.Event()
+
+    def produce(cancellation):
+        cancellation.add_callback(unblock.set)
+        yield "first"
+        # Stands in for a read that only the cancellation can interrupt
+        unblock.wait(30)
+        yield "second"
+
+    chunks, leader = group.stream("key", produce)
+    assert leader and next(chunks) == "first"
+    started = time.monotonic()
+    chunks.close()
+    assert time.monotonic() - started < 1.0
+    assert group.in_flight() == 0
+
+
+def test_flight_with_subscribers_left_is_not_cancelled():
+    group = SingleFlight(timeout=30)
+    cancelled = []
+    release = threading.Event()
+
+    def produce(cancellation):
+        cancellation.add_callback(lambda: cancelled.append(True))
+        yield "a"
+        release.wait(30)
+        yield "b"
+
+    leader_chunks, _ = group.stream("key", produce)
+    follower_chunks, leader = group.stream("key", produce)
+    assert not leader
+    assert next(leader_chunks) == "a"
+    release.set()
+    leader_chunks.close()
+    assert list(follower_chunks) == ["a", "b"]
+    assert not cancelled
+
+
+def test_cancelled_turn_returns_without_waiting_for_the_next_chunk(monkeypatch):
+    # Only the async backend can interrupt a read in progress
+    monkeypatch.setenv("ASYNC_BACKEND", "true")
+    monkeypatch.setenv("FAKE_MODEL_TOKENS_PER_SECOND", "2")
+    # Chunks arrive 2.5s apart, so waiting for the next one would show
+    monkeypatch.setenv("FAKE_MODEL_CHUNK_TOKENS", "5")
+    engine = get_chat_engine()
+    conversation = engine.get_conversation("cancel-test")
+    turn = engine.stream_turn(conversation, "How should I defend against a double push in overtime?")
+    assert next(turn).startswith("Fake answer")
+    started = time.monotonic()
+    turn.close()
+    assert time.monotonic() - started < 1.0
+    assert conversation.messages == []
+    assert conversation.chat.history == []
+    assert get_single_flight().in_flight() == 0
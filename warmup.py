@@ -0,0 +1,108 @@
+import logging
+import os
+import threading
+import time
+from personas import PERSONAS
+from model_backend import get_model_backend
+from model_pool import get_model_pool
+from knowledge_index import get_knowledge_index, retrieval_enabled
+from generation_policy import get_generation_policy
+from metrics import WARMUP_SECONDS
+from chat_engine import get_chat_engine
+
+logger = logging.getLogger(__name__)
+
+
+class Warmup:
+    """Builds what the first chat turn would otherwise wait for, on a background thread
+
+    Steps run in order: the chat engine, every persona's model (which imports
+    and configures the client library and converts each system prompt once),
+    the API client and its transport, and the knowledge index when retrieval
+    is on. A failed step is logged and skipped; the first turn simply does
+    that work itself.
+    """
+
+    def __init__(self):
+        self.steps = {}
+        self.errors = {}
+        self.done = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start warming up, unless it has already started"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+                self._thread.start()
+        return self
+
+    def run(self):
+        try:
+            engine = self.step("engine", get_chat_engine)
+            if engine is not None:
+                self.step("models", lambda: build_models(engine))
+                self.step("client", warm_up_clients)
+            if retrieval_enabled():
+                self.step("index", get_knowledge_index)
+        finally:
+            self.done.set()
+
+    def step(self, name, func):
+        """Run one warm-up step and record how long it took"""
+        started = time.perf_counter()
+        try:
+            return func()
+        except Exception as e:
+            self.errors[name] = str(e)
+            logger.warning("Warm-up step %s failed: %s", name, e)
+            return None
+        finally:
+            self.steps[name] = round(time.perf_counter() - started, 3)
+            WARMUP_SECONDS.observe(self.steps[name], step=name)
+
+    def wait(self, timeout=None):
+        """Block until warm-up has finished; returns whether it has"""
+        return self.done.wait(timeout)
+
+    def report(self):
+        """Whether warm-up has finished, with each step's duration and any errors"""
+        return {"ready": self.done.is_set(), "steps": dict(self.steps), "errors": dict(self.errors)}
+
+
+# Build every persona's model, including its light variant when the generation policy uses one
+def build_models(engine):
+    """Build and cache the models the engine will ask for"""
+    light_model = get_generation_policy().light_model
+    for name in PERSONAS:
+        engine.get_model(name)
+        if light_model:
+            engine.get_model(name, light_model)
+
+
+# Create the API clients now; their transports are otherwise built by the first request
+def warm_up_clients():
+    """Build the default client, or every model pool endpoint's client"""
+    pool = get_model_pool()
+    if pool is None:
+        get_model_backend().warm_up()
+        return
+    for endpoint in pool.endpoints:
+        endpoint.client
+
+
+# Process-wide warm-up, started on first use
+_warmup = None
+_warmup_lock = threading.Lock()
+
+
+def get_warmup():
+    """Get the shared warm-up, starting it if needed, or None when WARMUP is disabled"""
+    global _warmup
+    if os.getenv("WARMUP", "true").lower() in ("0", "false", "no"):
+        return None
+    with _warmup_lock:
+        if _warmup is None:
+            _warmup = Warmup().start()
+        return _warmup